@@ -3,23 +3,5 @@ chrome.runtime.onInstalled.addListener(() => {
   console.log('[D4T] Extension installed and enabled');
 });
 
-chrome.tabs.onUpdated.addListener((tabId, changeInfo, tab) => {
-  if (changeInfo.status === 'complete' && /^http/.test(tab.url)) {
-    chrome.storage.sync.get(['enabled'], function(result) {
-      if (result.enabled) {
-        if (chrome.scripting && chrome.scripting.executeScript) {
-          chrome.scripting.executeScript({
-            target: { tabId: tabId },
-            files: ['content.js']
-          }, () => {
-            if (chrome.runtime.lastError) {
-              console.error('[D4T] ' + chrome.runtime.lastError.message);
-            }
-          });
-        } else {
-          console.error('[D4T] chrome.scripting or chrome.scripting.executeScript is not available.');
-        }
-      }
-    });
-  }
-});
+// engine.js と content.js は manifest.json の content_scripts で対象サイトのページごとに1回だけ注入する
+// （タブの読み込み完了のたびに注入し直すと、変換処理と辞書が重複する）
@@ -1,257 +1,1192 @@
-// デバッグログの出力を切り替える変数
-const D4DEBUG_DISPLAY = false;
-// 初期化時変換をするまでのデバウンス待機時間(ms)
-const DEBOUNCE_DELAY_MS = 1000;
-// DOM変化時のデバウンス遅延時間を定義
-const DEBOUNCE_DOM_DELAY_MS = 100;
-// DOM変更に対するミューテーションの閾値を定義
-const DOM_CHANGE_MUTATION_THRESHOLD = 50;
-
-chrome.storage.sync.get(['enabled'], function(result) {
-  if (D4DEBUG_DISPLAY) console.log('[D4T] Loaded extension state:', result.enabled); // デバッグ用ログ
-  if (result.enabled) {
-    if (D4DEBUG_DISPLAY) console.log('[D4T] Content script loaded'); // デバッグ用ログ
-
-    let translationTable = {};
-    let compiledPatterns = null;    // 事前コンパイルされた正規表現パターンの配列
-
-    function loadTranslations() {
-      if (D4DEBUG_DISPLAY) console.log('[D4T] Loading translations...'); // デバッグ用ログ
-      const url = chrome.runtime.getURL('translations.json');
-      return fetch(url)
-          .then(response => {
-            if (!response.ok) {
-              throw new Error(`[D4T] Failed to load translations.json, status: ${response.status}`);
-            }
-            return response.json();
-          })
-          .then(data => {
-            translationTable = data;
-
-            // 事前コンパイルされた正規表現パターンの配列を初期化
-            compiledPatterns = [];
-
-            // キーの長さが長い順に並び替える（長いフレーズを優先的に処理）
-            const sortedKeys = Object.keys(translationTable).sort((a, b) => b.length - a.length);
-
-            // すべてのパターンを事前にコンパイル
-            sortedKeys.forEach(pattern => {
-              const replacement = translationTable[pattern];
-              const escapedPattern = pattern.replace(/['']/g, "['']");
-              
-              compiledPatterns.push({
-                regex: new RegExp(`\\b${escapedPattern}\\b`, 'gi'),
-                replacement,
-                minLength: pattern.length  // パターン自体の長さ
-              });
+// 翻訳処理（タブごとに1つだけ動かす。再注入された場合は既存のものをそのまま使う）
+(function(root) {
+  if (root.D4ContentScript) return;
+  root.D4ContentScript = true;
+
+  // デバッグログの出力を切り替える変数
+  const D4DEBUG_DISPLAY = false;
+  // 初期化時変換をするまでのデバウンス待機時間(ms)
+  const DEBOUNCE_DELAY_MS = 1000;
+  // DOM変化時のデバウンス遅延時間を定義
+  const DEBOUNCE_DOM_DELAY_MS = 100;
+  // DOM変更に対するミューテーションの閾値を定義
+  const DOM_CHANGE_MUTATION_THRESHOLD = 50;
+  // プロファイル（キーごとの置換回数と、正規表現キーごとの評価回数・処理時間）をまとめて保存するまでの待機時間(ms)
+  const HIT_PROFILE_SAVE_DELAY_MS = 2000;
+  // プロファイルの形式バージョン（tools/build_site_subsets.py の PROFILE_FORMAT_VERSION と合わせる）
+  const HIT_PROFILE_VERSION = 2;
+  // 性能の記録に残す変換の回数（古いものから捨てる）
+  const PERF_TRACE_SIZE = 200;
+  // 性能の記録の形式バージョン（tools/compare_traces.py の TRACE_FORMAT_VERSION と合わせる）
+  const PERF_TRACE_VERSION = 2;
+  // 変換結果のキャッシュに保持するテキストの数（0でキャッシュしない）
+  const TRANSLATION_CACHE_SIZE = 5000;
+  // 大量のテキストをワーカー（worker.js）で変換するか（ページのCSPなどでワーカーを起動できない場合はメインスレッドで変換）
+  const TRANSLATION_WORKER_ENABLED = true;
+  // ワーカーで変換するテキストの数の下限（これより少ない場合はメインスレッドで変換）
+  const WORKER_MIN_TEXTS = 200;
+  // ワーカーに一度に送るテキストの数
+  const WORKER_BATCH_SIZE = 500;
+  // メインスレッドで変換するとき、1つのスライスで使う時間(ms)（超えたらページの入力処理や描画に譲ってから続ける）
+  const TRANSLATION_SLICE_BUDGET_MS = 8;
+  // requestIdleCallback で次のスライスを待つ時間の上限(ms)
+  const TRANSLATION_IDLE_TIMEOUT_MS = 100;
+  // ページ全体を変換するとき、表示領域の近くにあるテキストから変換するか（IntersectionObserver がない場合は文書の順に変換）
+  const VIEWPORT_FIRST_ENABLED = true;
+  // 変換する属性（ツールチップ、読み上げ用のラベル、画像の代替テキスト、入力欄のプレースホルダー）
+  const TRANSLATED_ATTRIBUTES = ['title', 'aria-label', 'alt', 'placeholder'];
+  const TRANSLATED_ATTRIBUTE_SELECTOR = TRANSLATED_ATTRIBUTES.map(name => `[${name}]`).join(',');
+  // 表示領域の近くとみなす範囲（IntersectionObserver の rootMargin）
+  const VIEWPORT_MARGIN = '100% 0px';
+  // 表示領域の近くのテキストを変換してから、残りのテキストをまとめて変換するまでの時間(ms)
+  const VIEWPORT_SWEEP_DELAY_MS = 2000;
+  // ページの読み込み中から、追加されるノードを順に変換するか
+  // （false の場合は、DOMContentLoaded と load のあと DEBOUNCE_DELAY_MS 待ってページ全体を変換する）
+  const EARLY_START_ENABLED = true;
+  // ミューテーションがこの時間(ms)なければ、ページの読み込みが落ち着いたとみなす
+  const QUIESCENCE_MS = 500;
+  // ページの読み込みが落ち着くのを待つ時間の上限(ms)（変化し続けるページ用）
+  const QUIESCENCE_MAX_WAIT_MS = 10000;
+
+  chrome.storage.sync.get(['enabled'], function(result) {
+    if (D4DEBUG_DISPLAY) console.log('[D4T] Loaded extension state:', result.enabled); // デバッグ用ログ
+    if (result.enabled) {
+      if (D4DEBUG_DISPLAY) console.log('[D4T] Content script loaded'); // デバッグ用ログ
+
+      let translationTable = {};
+      let compiledPatterns = null;    // 実行時辞書がない場合に評価する、事前コンパイルされた正規表現パターンの配列
+      let translator = null;          // 実行時辞書（全体）による翻訳処理
+      let siteTranslator = null;      // このサイトでよく使われるキーだけの実行時辞書による翻訳処理
+      let coldFilter = null;          // サイト用の実行時辞書に含まれないキーの単語フィルタ
+      let dictionarySource = null;    // 実行時辞書の読み込み方法（loadDictionarySource）
+      let fullDictionaryRequest = null;
+      let fullDictionarySettled = false;  // 全体の実行時辞書の読み込みが終わったか（読み込めなかった場合も true）
+      let profiling = false;          // 置換に使われたキーの回数と処理時間を記録するか（ポップアップで切り替え）
+
+      // サイト用の実行時辞書とプロファイルで使うホスト名
+      const siteHost = location.hostname.replace(/^www\./, '');
+
+      // 全体の実行時辞書を読み込むまで変換を保留したテキストノードと、属性（[要素, 属性名]）
+      const deferredNodes = [];
+      const deferredAttributes = [];
+
+      // 元のテキスト → 変換後のテキスト（Map の挿入順を使い、最も長く使われていないものから捨てる）
+      // 辞書を読み込み直すたびに空にする
+      const translationCache = new Map();
+
+      // 全体の実行時辞書を持つ翻訳ワーカー（使えない場合はnull）と、結果を待っている依頼（依頼番号 → {resolve, reject}）
+      let translationWorker = null;
+      let translationWorkerUrl = null;
+      const workerRequests = new Map();
+      let workerRequestId = 0;
+
+      // tools/compile_dictionary.py で生成した実行時辞書を読み込む（ない場合はnull）
+      function loadCompiledFile(name) {
+        const url = chrome.runtime.getURL(`compiled/${name}`);
+        return fetch(url)
+            .then(response => response.ok ? response.json() : null)
+            .catch(() => null);
+      }
+
+      // 文字列キーの表（literals.json）と正規表現キーの表（patterns.json）の両方がそろった場合だけ使う
+      function loadCompiledDictionary() {
+        return Promise.all([loadCompiledFile('literals.json'), loadCompiledFile('patterns.json')])
+            .then(([literals, patterns]) => (literals && patterns) ? {literals, patterns} : null);
+      }
+
+      // このサイト用の実行時辞書（tools/build_site_subsets.py で生成。ない場合はnull）
+      function loadSiteDictionary() {
+        return loadCompiledFile('sites.json').then(index => {
+          const site = index && index.hosts[siteHost];
+          return site ? loadCompiledFile(`sites/${site.file}`) : null;
+        });
+      }
+
+      // build_extension.py で作成したZIPの実行時辞書の読み込み方法
+      // ZIPには実行時辞書と同時に生成した manifest.json（translations.json の内容の要約）があるため、
+      // translations.json は読み込まずに使う
+      // ZIPで配布されたものでない（unpackedで開発中など）場合はnull
+      function loadPackagedSource() {
+        return loadCompiledFile('manifest.json').then(manifest => {
+          if (!manifest || manifest.version !== D4Engine.COMPILED_FORMAT_VERSION) return null;
+          return {
+            data: null,
+            digest: manifest.digest,
+            loadFull: loadCompiledDictionary,
+            loadSite: loadSiteDictionary
+          };
+        });
+      }
+
+      function loadTranslationText() {
+        const url = chrome.runtime.getURL('translations.json');
+        return fetch(url)
+            .then(response => {
+              if (!response.ok) {
+                throw new Error(`[D4T] Failed to load translations.json, status: ${response.status}`);
+              }
+              return response.text();
             });
-            
-            if (D4DEBUG_DISPLAY) {
-              console.log('[D4T] Loaded translation table:', {
-                patterns: compiledPatterns.length
+      }
+
+      function loadTranslationTable() {
+        return loadTranslationText().then(text => JSON.parse(text));
+      }
+
+      // 実行時辞書の読み込み方法（ZIPの manifest.json か、translations.json から内容の要約を求めて sources/compiled/ の各表を使う）
+      // loadFull は全体の実行時辞書を、loadSite はこのサイト用の実行時辞書（tools/build_site_subsets.py で生成）を読み込む
+      // digest は translations.json の内容の要約（値だけを変えた場合も実行時辞書を古いものとみなすため）
+      function loadDictionarySource() {
+        return loadPackagedSource().then(packaged => packaged || loadTranslationText().then(text => {
+          const data = JSON.parse(text);
+          return {
+            data,
+            digest: D4Engine.textDigest(text),
+            loadFull: loadCompiledDictionary,
+            loadSite: loadSiteDictionary
+          };
+        }));
+      }
+
+      // translations.json と同じ内容から生成された実行時辞書か
+      function isCurrent(table) {
+        return !!table && table.version === D4Engine.COMPILED_FORMAT_VERSION && table.digest === dictionarySource.digest;
+      }
+
+      function loadProfilingState() {
+        return new Promise(resolve => {
+          chrome.storage.local.get(['profiling'], result => resolve(!!result.profiling));
+        });
+      }
+
+      // 全体の実行時辞書を読み込み、保留していたテキストノードと属性を変換する（1回だけ読み込む）
+      // 実行時辞書がない・古い・読み込めない場合は、translations.json のキーを正規表現として使う
+      function requestFullDictionary() {
+        if (!fullDictionaryRequest) {
+          fullDictionaryRequest = dictionarySource.loadFull()
+              .catch(error => {
+                console.error('[D4T] Error loading compiled dictionary:', error);
+                return null;
+              })
+              .then(compiled => {
+                if (compiled && isCurrent(compiled.literals) && isCurrent(compiled.patterns)) {
+                  translator = D4Engine.createTranslator(compiled.literals, compiled.patterns, profiling);
+                  return startTranslationWorker(compiled);
+                }
+                if (D4DEBUG_DISPLAY) {
+                  console.log('[D4T] Compiled dictionary is missing or out of date; using regex patterns from translations.json');
+                }
+                return loadFallbackPatterns();
+              })
+              .catch(error => {
+                console.error('[D4T] Error loading translations.json:', error);
+              })
+              .then(() => {
+                fullDictionarySettled = true;
+                processDeferred();
               });
+        }
+        return fullDictionaryRequest;
+      }
+
+      // translations.json のすべてのキーを正規表現として事前にコンパイル（全体の実行時辞書の代わり）
+      // ZIPの実行時辞書を読み込んだ場合は translations.json の内容を持たないため、ZIPに入っているものを読み込む
+      function loadFallbackPatterns() {
+        const table = dictionarySource.data ? Promise.resolve(dictionarySource.data) : loadTranslationTable();
+        return table.then(data => {
+          translationTable = data;
+          // キーの長さが長い順に並び替える（長いフレーズを優先的に処理）
+          const sortedKeys = Object.keys(translationTable).sort((a, b) => b.length - a.length);
+          compiledPatterns = sortedKeys.map(key => D4Engine.compilePattern(key, translationTable[key]));
+        });
+      }
+
+      function loadExtensionScript(name) {
+        return fetch(chrome.runtime.getURL(name)).then(response => {
+          if (!response.ok) {
+            throw new Error(`[D4T] Failed to load ${name}, status: ${response.status}`);
+          }
+          return response.text();
+        });
+      }
+
+      // engine.js と worker.js を連結したワーカーを起動し、全体の実行時辞書を送る
+      // プロファイルを記録している間は、メインスレッドの翻訳処理で記録するためワーカーを使わない
+      function startTranslationWorker(compiled) {
+        if (!TRANSLATION_WORKER_ENABLED || profiling || translationWorker) return Promise.resolve();
+        return Promise.all([loadExtensionScript('engine.js'), loadExtensionScript('worker.js')])
+            .then(([engineSource, workerSource]) => {
+              translationWorkerUrl = URL.createObjectURL(new Blob([engineSource, '\n', workerSource], {type: 'text/javascript'}));
+              const worker = new Worker(translationWorkerUrl);
+              worker.onmessage = event => {
+                const {id, texts, stats, error} = event.data;
+                const request = workerRequests.get(id);
+                if (!request) return;
+                workerRequests.delete(id);
+                if (error) {
+                  request.reject(new Error(error));
+                } else {
+                  request.resolve({texts, stats});
+                }
+              };
+              // 起動できなかった場合（ページのCSPなど）は以降メインスレッドで変換する
+              worker.onerror = event => {
+                if (D4DEBUG_DISPLAY) console.log('[D4T] Translation worker failed:', event.message); // デバッグ用ログ
+                stopTranslationWorker();
+              };
+              worker.postMessage({type: 'load', literals: compiled.literals, patterns: compiled.patterns});
+              translationWorker = worker;
+            })
+            .catch(error => {
+              if (D4DEBUG_DISPLAY) console.log('[D4T] Failed to start translation worker:', error); // デバッグ用ログ
+              stopTranslationWorker();
+            });
+      }
+
+      // ワーカーを停止し、結果を待っている依頼を失敗させる（呼び出し側はメインスレッドで変換し直す）
+      function stopTranslationWorker() {
+        if (translationWorker) translationWorker.terminate();
+        translationWorker = null;
+        if (translationWorkerUrl) URL.revokeObjectURL(translationWorkerUrl);
+        translationWorkerUrl = null;
+        workerRequests.forEach(request => request.reject(new Error('[D4T] Translation worker stopped')));
+        workerRequests.clear();
+      }
+
+      // テキストの配列をワーカーで変換する（WORKER_BATCH_SIZE ずつ送る）
+      function translateWithWorker(texts) {
+        const worker = translationWorker;
+        const batches = [];
+        for (let start = 0; start < texts.length; start += WORKER_BATCH_SIZE) {
+          const id = ++workerRequestId;
+          batches.push(new Promise((resolve, reject) => {
+            workerRequests.set(id, {resolve, reject});
+            worker.postMessage({type: 'translate', id, texts: texts.slice(start, start + WORKER_BATCH_SIZE)});
+          }));
+        }
+        return Promise.all(batches).then(results => {
+          const stats = {attempts: 0, replacements: 0, rejected: 0, work: 0};
+          results.forEach(result => {
+            for (const field in stats) stats[field] += result.stats[field];
+          });
+          return {texts: [].concat(...results.map(result => result.texts)), stats};
+        });
+      }
+
+      function loadTranslations() {
+        if (D4DEBUG_DISPLAY) console.log('[D4T] Loading translations...'); // デバッグ用ログ
+        stopTranslationWorker();
+        compiledPatterns = null;
+        translator = null;
+        siteTranslator = null;
+        coldFilter = null;
+        fullDictionaryRequest = null;
+        fullDictionarySettled = false;
+        translationTable = {};
+        translationCache.clear();
+        return Promise.all([loadDictionarySource(), loadProfilingState()])
+            .then(([source, profilingState]) => {
+              dictionarySource = source;
+              profiling = profilingState;
+              return source.loadSite();
+            })
+            .then(site => {
+              // サイト用の実行時辞書があれば、全体の実行時辞書は必要になるまで読み込まない
+              if (site && site.digest === dictionarySource.digest && isCurrent(site.literals) && isCurrent(site.patterns)) {
+                siteTranslator = D4Engine.createTranslator(site.literals, site.patterns, profiling);
+                coldFilter = D4Engine.createWordFilter([site.cold]);
+                return;
+              }
+              return requestFullDictionary();
+            })
+            .then(() => {
+              if (D4DEBUG_DISPLAY) {
+                const active = siteTranslator || translator;
+                console.log('[D4T] Loaded translation table:', {
+                  site: siteTranslator ? siteHost : null,
+                  patterns: activePatternCount(),
+                  literals: active ? active.literalCount : 0,
+                  exact: active ? active.exactCount : 0,
+                  templates: active ? active.templateCount : 0,
+                  words: active ? active.wordCount : 0
+                });
+              }
+            });
+      }
+
+      // 辞書の読み込み（タブごとに1回だけ。手動で変換する場合も読み込み済みの辞書を使う）
+      let dictionaryLoad = null;
+
+      function ensureTranslations() {
+        if (!dictionaryLoad) {
+          dictionaryLoad = loadTranslations().catch(error => {
+            // 次に変換するときに読み込み直す
+            dictionaryLoad = null;
+            throw error;
+          });
+        }
+        return dictionaryLoad;
+      }
+
+      // 変換に使うパターンの数（ログ用）
+      function activePatternCount() {
+        const active = siteTranslator || translator;
+        if (active) return active.patternCount;
+        return compiledPatterns ? compiledPatterns.length : 0;
+      }
+
+      // 最適化された変換処理関数
+      // 全体の実行時辞書が必要で、まだ読み込みが終わっていない場合はnullを返す（呼び出し側で変換を保留する）
+      function applyOptimizedTransformations(text, stats = null) {
+        // サイト用の実行時辞書にないキーの単語を含まなければ、サイト用の実行時辞書だけで全体と同じ結果になる
+        // （置換で新しい単語ができた場合に備え、変換後のテキストも確かめる）
+        if (siteTranslator) {
+          if (!coldFilter.test(text)) {
+            const newText = siteTranslator.translate(text, stats);
+            if (!coldFilter.test(newText)) return newText;
+          }
+          if (!translator && !fullDictionarySettled) {
+            requestFullDictionary();
+            return null;
+          }
+        }
+        if (translator) {
+          return translator.translate(text, stats);
+        }
+
+        // translations.json も読み込めなかった場合は、サイト用の実行時辞書だけで変換する
+        if (!compiledPatterns) {
+          return siteTranslator ? siteTranslator.translate(text, stats) : text;
+        }
+
+        // 実行時辞書がない場合は、すべてのキーを長い順に評価（長さフィルタ付き）
+        const textLength = text.length;
+        for (let {regex, replacement, minLength} of compiledPatterns) {
+          if (minLength <= textLength) {
+            if (stats) stats.attempts++;
+            const newText = text.replace(regex, replacement);
+            if (newText !== text) {
+              text = newText;
+              if (stats) stats.replacements++;
             }
-            
-            // 後方互換性のため、従来のregexTableも返す
-            const regexTable = [];
-            sortedKeys.forEach(pattern => {
-              const replacement = translationTable[pattern];
-              const escapedPattern = pattern.replace(/['']/g, "['']");
-              regexTable.push([new RegExp(escapedPattern, 'gi'), replacement]);
+          }
+        }
+        return text;
+      }
+
+      // 全体の実行時辞書を読み込んだあとに、保留していたテキストノードと属性を変換
+      function processDeferred() {
+        // 保留したものがなければ、変換の記録に空のパスを残さない
+        if (deferredNodes.length === 0 && deferredAttributes.length === 0) return;
+        const startTime = performance.now();
+        const stats = createTextStats();
+        const attributeStats = {attributes: 0, replaced: 0};
+        deferredNodes.splice(0).forEach(node => {
+          if (node.isConnected) replaceText(node, stats);
+        });
+        deferredAttributes.splice(0).forEach(([el, name]) => {
+          if (!el.isConnected) return;
+          attributeStats.attributes++;
+          if (replaceAttribute(el, name)) attributeStats.replaced++;
+        });
+        stats.work = performance.now() - startTime;
+        recordPass('deferred', startTime, stats, attributeStats);
+        if (D4DEBUG_DISPLAY) console.log(`[D4T] Processed ${stats.nodes} deferred text nodes`); // デバッグ用ログ
+        saveHitProfile(false);
+      }
+
+      let hitProfileTimer;
+      let unsavedPages = 0;
+
+      // 記録した置換回数を chrome.storage.local の hitProfile にホストごとに加算（ポップアップから書き出す）
+      // 変換のたびに書き込まないよう、最後の変換から一定時間後にまとめて保存する
+      function saveHitProfile(countPage) {
+        if (!profiling) return;
+        if (countPage) unsavedPages++;
+        if (hitProfileTimer) clearTimeout(hitProfileTimer);
+        hitProfileTimer = setTimeout(() => {
+          const pages = unsavedPages;
+          unsavedPages = 0;
+          const collected = [siteTranslator, translator].filter(Boolean).map(active => active.collectHits());
+          chrome.storage.local.get(['hitProfile'], result => {
+            // 形式の異なる古い記録は破棄する
+            const stored = result.hitProfile;
+            const profile = (stored && stored.version === HIT_PROFILE_VERSION) ? stored : {version: HIT_PROFILE_VERSION, hosts: {}};
+            const entry = profile.hosts[siteHost] || (profile.hosts[siteHost] =
+                {pages: 0, literals: {}, patterns: {}, automaton: {attempts: 0, time: 0}});
+            entry.pages += pages;
+            collected.forEach(hits => {
+              for (const [key, count] of Object.entries(hits.literals)) {
+                entry.literals[key] = (entry.literals[key] || 0) + count;
+              }
+              for (const [key, cost] of Object.entries(hits.patterns)) {
+                const total = entry.patterns[key] || (entry.patterns[key] = {attempts: 0, hits: 0, time: 0});
+                total.attempts += cost.attempts;
+                total.hits += cost.hits;
+                total.time += cost.time;
+              }
+              entry.automaton.attempts += hits.automaton.attempts;
+              entry.automaton.time += hits.automaton.time;
             });
-            
-            return regexTable;
+            chrome.storage.local.set({hitProfile: profile});
           });
-    }
+        }, HIT_PROFILE_SAVE_DELAY_MS);
+      }
+
+      // 変換結果をキャッシュする変換処理（同じテキストは辞書を評価せずに変換する）
+      // プロファイルを記録している間は、テキストごとの置換回数と処理時間を数えるためキャッシュしない
+      function applyRegexTransformations(text, stats = null) {
+        if (D4DEBUG_DISPLAY) console.log('[D4T] Original text:', text); // デバッグ用ログ
+        if (TRANSLATION_CACHE_SIZE <= 0 || profiling) {
+          return applyOptimizedTransformations(text, stats);
+        }
+        const cached = lookupTranslationCache(text);
+        if (cached !== undefined) {
+          if (stats) stats.cacheHits++;
+          return cached;
+        }
+        if (stats) stats.cacheMisses++;
+        const newText = applyOptimizedTransformations(text, stats);
+        // 全体の実行時辞書を待つ場合（null）はキャッシュしない
+        if (newText !== null) storeTranslationCache(text, newText);
+        return newText;
+      }
+
+      // キャッシュした変換後のテキスト（ない場合はundefined）
+      function lookupTranslationCache(text) {
+        if (TRANSLATION_CACHE_SIZE <= 0 || profiling) return undefined;
+        const cached = translationCache.get(text);
+        if (cached !== undefined) {
+          // 最近使ったものとして末尾に移す
+          translationCache.delete(text);
+          translationCache.set(text, cached);
+        }
+        return cached;
+      }
+
+      function storeTranslationCache(text, newText) {
+        if (TRANSLATION_CACHE_SIZE <= 0 || profiling) return;
+        if (translationCache.size >= TRANSLATION_CACHE_SIZE) {
+          translationCache.delete(translationCache.keys().next().value);
+        }
+        translationCache.set(text, newText);
+      }
+
+      // テキストの変換の集計（slices: メインスレッドで変換したスライスの数、longestSlice: 最も長かったスライス(ms)、
+      // work: メインスレッドのスライスとワーカーで変換していた時間の合計(ms)）
+      function createTextStats() {
+        return {nodes: 0, attempts: 0, replacements: 0, chars: 0, rejected: 0, deferred: 0, skipped: 0, cacheHits: 0, cacheMisses: 0,
+                slices: 0, longestSlice: 0, work: 0, firstVisible: null};
+      }
+
+      // 変換ごとの性能の記録（リングバッファ）。ポップアップで集計して表示し、JSONとして書き出す
+      const perfTrace = [];
+      let perfTraceNext = 0;
+
+      // 1回の変換を記録する（type: 'page' ページ全体、'mutations' ページの変化、'deferred' 保留していたノード）
+      // duration はスライスの間に譲った時間や表示領域の外をまとめて変換するまでの待ち時間を含む経過時間(ms)、
+      // work はそのうちメインスレッドとワーカーで変換していた時間(ms)（ポップアップと compare_traces.py はこちらを比べる）
+      function recordPass(type, startTime, textStats, attributeStats, mutations = 0) {
+        const record = {
+          type,
+          start: startTime,
+          duration: performance.now() - startTime,
+          work: textStats.work,
+          nodes: textStats.nodes,
+          skipped: textStats.skipped,
+          chars: textStats.chars,
+          attempts: textStats.attempts,
+          replacements: textStats.replacements,
+          rejected: textStats.rejected,
+          deferred: textStats.deferred,
+          cacheHits: textStats.cacheHits,
+          cacheMisses: textStats.cacheMisses,
+          slices: textStats.slices,
+          longestSlice: textStats.longestSlice,
+          firstVisible: textStats.firstVisible,
+          attributes: attributeStats.attributes,
+          mutations
+        };
+        if (perfTrace.length < PERF_TRACE_SIZE) {
+          perfTrace.push(record);
+        } else {
+          perfTrace[perfTraceNext] = record;
+        }
+        perfTraceNext = (perfTraceNext + 1) % PERF_TRACE_SIZE;
+      }
+
+      // 性能の記録（古い順）と、読み込み時の時間、書き込みの集計
+      function collectPerfTrace() {
+        return {
+          version: PERF_TRACE_VERSION,
+          host: siteHost,
+          url: location.href,
+          startup: startupStats,
+          writes: writeStats,
+          passes: perfTrace.slice(perfTraceNext).concat(perfTrace.slice(0, perfTraceNext))
+        };
+      }
 
-    // 最適化された変換処理関数
-    function applyOptimizedTransformations(text, stats = null) {
-      const textLength = text.length;
-      
-      // 事前コンパイルされたパターンを適用（長さフィルタ付き）
-      for (let {regex, replacement, minLength} of compiledPatterns) {
-        if (minLength <= textLength) {
-          if (stats) stats.attempts++;
-          const newText = text.replace(regex, replacement);
-          if (newText !== text) {
-            text = newText;
-            if (stats) stats.replacements++;
+      // 変換したテキストノード → 変換後のテキスト、要素 → Map(属性名 → 変換後の値)
+      // 値が変わっていないノードは再び変換しない（自分の書き込みによるミューテーションや、同じ部分木の再処理）
+      const translatedTexts = new WeakMap();
+      const translatedAttributes = new WeakMap();
+
+      function replaceText(node, stats = createTextStats()) {
+        if (node.nodeType === 3) { // テキストノード
+          if (isTranslatedText(node)) {
+            stats.skipped++;
+            return stats;
+          }
+          stats.nodes++;
+          stats.chars += node.nodeValue.length;
+          let originalText = node.nodeValue;
+          let newText = applyRegexTransformations(node.nodeValue, stats);
+          if (newText === null) {
+            // 全体の実行時辞書を読み込んだあとに変換する
+            deferredNodes.push(node);
+            stats.deferred++;
+            return stats;
+          }
+          writeText(node, originalText, newText);
+        } else if (node.nodeType === 1 && !['SCRIPT', 'STYLE'].includes(node.tagName)) { // 要素ノードでスクリプトとスタイルを除外
+          let childNodes = Array.from(node.childNodes);
+          for (let child of childNodes) {
+            replaceText(child, stats);
           }
         }
+        return stats;
       }
-      
-      return text;
-    }
 
-    // 共通の変換処理関数（後方互換性のため残す）
-    function applyRegexTransformations(text, regexTable, stats = null) {
-      if (D4DEBUG_DISPLAY) console.log('[D4T] Original text:', text); // デバッグ用ログ
-      
-      // 新しい最適化実装が利用可能な場合はそちらを使用
-      if (compiledPatterns) {
-        return applyOptimizedTransformations(text, stats);
-      }
-      
-      // 従来の実装
-      for (let [regex, replacement] of regexTable) {
-        if (D4DEBUG_DISPLAY) console.log('[D4T] Applying regex:', regex); // デバッグ用ログ
-        const wordBoundaryRegex = new RegExp(`\\b${regex.source}\\b`, regex.flags);
-        if (stats) stats.attempts++;
-        const newText = text.replace(wordBoundaryRegex, replacement);
-        if (stats && newText !== text) {
-          stats.replacements++;
-        }
-        text = newText;
-      }
-      return text;
-    }
+      // 要素の属性を変換（変換した場合はtrue）
+      function replaceAttribute(el, name) {
+        const originalValue = el.getAttribute(name);
+        if (originalValue === null || isTranslatedAttribute(el, name, originalValue)) return false;
+        let newValue = applyRegexTransformations(originalValue);
+        if (newValue === null) {
+          // 全体の実行時辞書を読み込んだあとに変換する
+          deferredAttributes.push([el, name]);
+          return false;
+        }
+        return writeAttribute(el, name, originalValue, newValue);
+      }
+
+      // 要素の変換する属性をすべて変換
+      function replaceAttributes(el, stats) {
+        TRANSLATED_ATTRIBUTES.forEach(name => {
+          if (!el.hasAttribute(name)) return;
+          stats.attributes++;
+          if (replaceAttribute(el, name)) stats.replaced++;
+        });
+      }
+
+      // 書き込み待ちのテキストノード（→ {from: 変換前, to: 変換後}）と要素（→ Map(属性名 → {from, to})）
+      // 次の描画フレームの前にまとめて書き込む
+      const pendingTextWrites = new Map();
+      const pendingAttributeWrites = new Map();
+      let writeFrame = null;
+      // 書き込みの集計（textWrites, attributeWrites: 書き込んだ数、avoided: 値が変わらないため書き込まなかった数、
+      // stale: 書き込む前にページが値を変えたため書き込まなかった数、selfMutations: 自分の書き込みで起きたミューテーションの数）
+      const writeStats = {textWrites: 0, attributeWrites: 0, avoided: 0, stale: 0, selfMutations: 0};
+      // 読み込み時の変換の時間（ナビゲーション開始からのms）。早期開始と従来の動作を比べるために記録する
+      // firstTranslation: 最初に変換を書き込んだ時間、complete: 読み込みが落ち着くまでに最後に変換を書き込んだ時間
+      const startupStats = {mode: EARLY_START_ENABLED ? 'early' : 'debounce', firstTranslation: null, complete: null, timedOut: false};
+      let lastWriteTime = null;
+
+      // 変換済みのテキストノードか（書き込み待ちのものを含む）
+      function isTranslatedText(node) {
+        const value = node.nodeValue;
+        const pending = pendingTextWrites.get(node);
+        return translatedTexts.get(node) === value || (pending !== undefined && pending.from === value);
+      }
+
+      // 変換済みの属性か（書き込み待ちのものを含む）
+      function isTranslatedAttribute(el, name, value) {
+        const translated = translatedAttributes.get(el);
+        if (translated !== undefined && translated.get(name) === value) return true;
+        const pending = pendingAttributeWrites.get(el);
+        return pending !== undefined && pending.has(name) && pending.get(name).from === value;
+      }
 
-    function replaceText(node, regexTable, stats = {nodes: 0, attempts: 0, replacements: 0, chars: 0}) {
-      if (node.nodeType === 3) { // テキストノード
-        stats.nodes++;
-        stats.chars += node.nodeValue.length;
-        let originalText = node.nodeValue;
-        let newText = applyRegexTransformations(node.nodeValue, regexTable, stats);
-        if (newText !== originalText && D4DEBUG_DISPLAY) {
-          console.log('[D4T] Text changed from:', originalText, 'to:', newText); // デバッグ用ログ
+      // 変換後のテキストを書き込み待ちにし、変換済みとして記録する
+      // 変わらない場合は書き込まない（不要なミューテーションやスタイルの再計算を起こさない）
+      function writeText(node, originalText, newText) {
+        translatedTexts.set(node, newText);
+        if (newText === originalText) {
+          writeStats.avoided++;
+          return;
         }
-        node.nodeValue = newText;
-      } else if (node.nodeType === 1 && !['SCRIPT', 'STYLE'].includes(node.tagName)) { // 要素ノードでスクリプトとスタイルを除外
-        let childNodes = Array.from(node.childNodes);
-        for (let child of childNodes) {
-          replaceText(child, regexTable, stats);
+        if (D4DEBUG_DISPLAY) console.log('[D4T] Text changed from:', originalText, 'to:', newText); // デバッグ用ログ
+        pendingTextWrites.set(node, {from: originalText, to: newText});
+        scheduleWrites();
+      }
+
+      // 変換後の属性を書き込み待ちにし、変換済みとして記録する（変わった場合はtrue）
+      function writeAttribute(el, name, originalValue, newValue) {
+        if (!translatedAttributes.has(el)) translatedAttributes.set(el, new Map());
+        translatedAttributes.get(el).set(name, newValue);
+        if (newValue === originalValue) {
+          writeStats.avoided++;
+          return false;
         }
+        if (D4DEBUG_DISPLAY) console.log(`[D4T] Attribute ${name} changed from:`, originalValue, 'to:', newValue); // デバッグ用ログ
+        if (!pendingAttributeWrites.has(el)) pendingAttributeWrites.set(el, new Map());
+        pendingAttributeWrites.get(el).set(name, {from: originalValue, to: newValue});
+        scheduleWrites();
+        return true;
       }
-      return stats;
-    }
 
-    function replaceTitleAttributes(regexTable, stats = {elements: 0, replaced: 0}) {
-      const elements = document.querySelectorAll('[title]');
-      stats.elements = elements.length;
-      elements.forEach(el => {
-        const originalTitle = el.getAttribute('title');
-        let newTitle = applyRegexTransformations(originalTitle, regexTable);
-        if (newTitle !== originalTitle) {
-          stats.replaced++;
-          if (D4DEBUG_DISPLAY) {
-            console.log('[D4T] Title changed from:', originalTitle, 'to:', newTitle); // デバッグ用ログ
+      function scheduleWrites() {
+        if (writeFrame === null) writeFrame = requestAnimationFrame(flushWrites);
+      }
+
+      // 書き込み待ちの値をまとめて書き込む
+      // 書き込みの前後で監視中のミューテーションを取り出し、自分の書き込みによるものは捨て、ページによるものだけを処理する
+      function flushWrites() {
+        writeFrame = null;
+        const records = domObserver ? domObserver.takeRecords() : [];
+        let written = 0;
+        pendingTextWrites.forEach(({from, to}, node) => {
+          // 送ったあとにページが書き換えた値は上書きしない（ミューテーションとして変換する）
+          if (node.nodeValue !== from) {
+            writeStats.stale++;
+            return;
+          }
+          node.nodeValue = to;
+          writeStats.textWrites++;
+          written++;
+        });
+        pendingTextWrites.clear();
+        pendingAttributeWrites.forEach((writes, el) => {
+          writes.forEach(({from, to}, name) => {
+            if (el.getAttribute(name) !== from) {
+              writeStats.stale++;
+              return;
+            }
+            el.setAttribute(name, to);
+            writeStats.attributeWrites++;
+            written++;
+          });
+        });
+        pendingAttributeWrites.clear();
+        if (written > 0) {
+          lastWriteTime = performance.now();
+          if (startupStats.firstTranslation === null) startupStats.firstTranslation = lastWriteTime;
+        }
+        if (!domObserver) return;
+        domObserver.takeRecords().forEach(record => {
+          if (isOwnMutation(record)) {
+            writeStats.selfMutations++;
+          } else {
+            records.push(record);
           }
+        });
+        if (D4DEBUG_DISPLAY) console.log('[D4T] DOM writes:', writeStats); // デバッグ用ログ
+        if (records.length > 0) handleMutations(records);
+      }
+
+      // 自分の書き込みで起きたミューテーションか（書き込んだ値のままのテキストと属性）
+      function isOwnMutation(record) {
+        if (record.type === 'characterData') {
+          return translatedTexts.get(record.target) === record.target.nodeValue;
         }
-        el.setAttribute('title', newTitle);
-      });
-      return stats;
-    }
+        if (record.type === 'attributes') {
+          const translated = translatedAttributes.get(record.target);
+          return translated !== undefined && translated.get(record.attributeName) === record.target.getAttribute(record.attributeName);
+        }
+        return false;
+      }
+
+      // node 以下のテキストノードを TreeWalker で textNodes に集める（スクリプトとスタイルの中を除外）
+      // DOMを読むだけで変換はしないため、変換をスライスに分けている間にページが書き換えても走査がずれない
+      function collectTextNodes(node, textNodes) {
+        if (node.nodeType === 3) {
+          textNodes.push(node);
+          return textNodes;
+        }
+        if (node.nodeType !== 1 || ['SCRIPT', 'STYLE'].includes(node.tagName)) return textNodes;
+        const walker = document.createTreeWalker(node, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT, {
+          acceptNode: child => {
+            if (child.nodeType === 3) return NodeFilter.FILTER_ACCEPT;
+            return ['SCRIPT', 'STYLE'].includes(child.tagName) ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_SKIP;
+          }
+        });
+        for (let child = walker.nextNode(); child; child = walker.nextNode()) {
+          textNodes.push(child);
+        }
+        return textNodes;
+      }
+
+      // ページの入力処理や描画に譲り、次のスライスを始めるときに解決する Promise
+      function yieldToPage() {
+        if (typeof scheduler !== 'undefined' && typeof scheduler.yield === 'function') {
+          return scheduler.yield();
+        }
+        if (typeof requestIdleCallback === 'function') {
+          return new Promise(resolve => requestIdleCallback(() => resolve(), {timeout: TRANSLATION_IDLE_TIMEOUT_MS}));
+        }
+        return new Promise(resolve => setTimeout(resolve, 0));
+      }
+
+      // テキストノードと、変換する属性を持つ要素をまとめて変換する（変換を終えたら解決する Promise を返す）
+      // 数が多く、ワーカーが使える場合は、値を読み取ってワーカーで変換し、結果を書き込むだけをメインスレッドで行う
+      // 数が少ない場合やワーカーが使えない場合は、その場でメインスレッドで変換する
+      function translateNodes(textNodes, elements, textStats, attributeStats) {
+        if (!translationWorker || textNodes.length + elements.length < WORKER_MIN_TEXTS) {
+          return translateNodesOnMainThread(textNodes, elements, textStats, attributeStats);
+        }
+
+        // 変換していないテキストを重複なしで集める（キャッシュにあるものはその場で書き込む）
+        const collectStart = performance.now();
+        const texts = [];
+        const indexes = new Map();
+        const textItems = [];
+        const attributeItems = [];
+        function request(text) {
+          let index = indexes.get(text);
+          if (index === undefined) {
+            index = texts.length;
+            indexes.set(text, index);
+            texts.push(text);
+          }
+          return index;
+        }
+        textNodes.forEach(node => {
+          const text = node.nodeValue;
+          if (isTranslatedText(node)) {
+            textStats.skipped++;
+            return;
+          }
+          const cached = lookupTranslationCache(text);
+          if (cached !== undefined) {
+            textStats.nodes++;
+            textStats.chars += text.length;
+            textStats.cacheHits++;
+            writeText(node, text, cached);
+            return;
+          }
+          textItems.push({node, text, index: request(text)});
+        });
+        elements.forEach(el => {
+          TRANSLATED_ATTRIBUTES.forEach(name => {
+            const value = el.getAttribute(name);
+            if (value === null || isTranslatedAttribute(el, name, value)) return;
+            attributeItems.push({el, name, value, index: request(value)});
+          });
+        });
+        textStats.work += performance.now() - collectStart;
+        if (texts.length === 0) return Promise.resolve();
+
+        return translateWithWorker(texts)
+            .then(result => {
+              const writeStart = performance.now();
+              textStats.nodes += textItems.length;
+              textItems.forEach(({text}) => textStats.chars += text.length);
+              textStats.cacheMisses += texts.length;
+              attributeStats.attributes += attributeItems.length;
+              textStats.attempts += result.stats.attempts;
+              textStats.replacements += result.stats.replacements;
+              textStats.rejected += result.stats.rejected;
+              texts.forEach((text, index) => storeTranslationCache(text, result.texts[index]));
+              // 送ったあとにページが書き換えたノードは、次のミューテーションで変換する
+              textItems.forEach(({node, text, index}) => {
+                if (node.nodeValue === text) writeText(node, text, result.texts[index]);
+              });
+              attributeItems.forEach(({el, name, value, index}) => {
+                if (el.getAttribute(name) === value && writeAttribute(el, name, value, result.texts[index])) {
+                  attributeStats.replaced++;
+                }
+              });
+              textStats.work += result.stats.work + performance.now() - writeStart;
+            })
+            .catch(error => {
+              if (D4DEBUG_DISPLAY) console.log('[D4T] Falling back to main thread translation:', error); // デバッグ用ログ
+              const failedElements = [...new Set(attributeItems.map(item => item.el))];
+              return translateNodesOnMainThread(textItems.map(item => item.node), failedElements, textStats, attributeStats);
+            });
+      }
+
+      // メインスレッドで、TRANSLATION_SLICE_BUDGET_MS ごとのスライスに分けて変換する（変換を終えたら解決する Promise を返す）
+      // 最初のスライスはその場で変換し、残りがあればページに譲ってから続ける
+      // スライスの間にページから外れたノードは変換しない（変わったノードはミューテーションとして変換する）
+      function translateNodesOnMainThread(textNodes, elements, textStats, attributeStats) {
+        const total = textNodes.length + elements.length;
+        if (total === 0) return Promise.resolve();
+        let index = 0;
+        function runSlice() {
+          const sliceStart = performance.now();
+          while (index < total && performance.now() - sliceStart < TRANSLATION_SLICE_BUDGET_MS) {
+            if (index < textNodes.length) {
+              const node = textNodes[index];
+              if (node.isConnected) replaceText(node, textStats);
+            } else {
+              const el = elements[index - textNodes.length];
+              if (el.isConnected) replaceAttributes(el, attributeStats);
+            }
+            index++;
+          }
+          const sliceTime = performance.now() - sliceStart;
+          textStats.slices++;
+          textStats.longestSlice = Math.max(textStats.longestSlice, sliceTime);
+          textStats.work += sliceTime;
+          if (index < total) return yieldToPage().then(runSlice);
+          return Promise.resolve();
+        }
+        return runSlice();
+      }
+
+      let observeDOMTimer;
+
+      // 変換待ちのノード（追加されたノードと値が変わったテキストノード）と、変換する属性が変わった要素
+      const pendingRoots = new Set();
+      const pendingAttributes = new Set();
+
+      // 変換待ちのノードを集めたミューテーションの数（性能の記録用）
+      let pendingMutationCount = 0;
+
+      function collectMutations(mutations) {
+        pendingMutationCount += mutations.length;
+        for (const mutation of mutations) {
+          if (mutation.type === 'childList') {
+            mutation.addedNodes.forEach(node => pendingRoots.add(node));
+          } else if (mutation.type === 'characterData') {
+            pendingRoots.add(mutation.target);
+          } else if (mutation.type === 'attributes') {
+            pendingAttributes.add(mutation.target);
+          }
+        }
+      }
+
+      // 変換待ちのノードのうち、ページにあり、他の変換待ちのノードに含まれないもの（部分木の根）を取り出す
+      function takePendingRoots() {
+        const roots = [];
+        for (const node of pendingRoots) {
+          // ページに残っている本文のノードだけを変換する（監視は読み込み中の head も含む）
+          if (!document.body || !document.body.contains(node)) continue;
+          let ancestor = node.parentNode;
+          while (ancestor && !pendingRoots.has(ancestor)) ancestor = ancestor.parentNode;
+          if (ancestor) continue;
+          // スクリプトとスタイルの中のテキストは変換しない
+          if (node.nodeType === 3 && node.parentNode && ['SCRIPT', 'STYLE'].includes(node.parentNode.nodeName)) continue;
+          roots.push(node);
+        }
+        pendingRoots.clear();
+        return roots;
+      }
+
+      // 変換待ちの部分木のテキストと属性、属性が変わった要素だけを変換（ページ全体は走査しない）
+      // 追加された部分木の子孫の属性は、その部分木の中だけを querySelectorAll で探す
+      function translatePending() {
+        const startTime = performance.now();
+        const mutations = pendingMutationCount;
+        pendingMutationCount = 0;
+        const textStats = createTextStats();
+        const attributeStats = {attributes: 0, replaced: 0};
+        const roots = takePendingRoots();
+        const textNodes = [];
+        const elements = new Set();
+        for (const root of roots) {
+          collectTextNodes(root, textNodes);
+          if (root.nodeType === 1) {
+            if (root.matches(TRANSLATED_ATTRIBUTE_SELECTOR)) elements.add(root);
+            root.querySelectorAll(TRANSLATED_ATTRIBUTE_SELECTOR).forEach(el => elements.add(el));
+          }
+        }
+        for (const el of pendingAttributes) {
+          if (el.isConnected) elements.add(el);
+        }
+        pendingAttributes.clear();
+        translateNodes(textNodes, [...elements], textStats, attributeStats).then(() => {
+          recordPass('mutations', startTime, textStats, attributeStats, mutations);
+          if (D4DEBUG_DISPLAY) {
+            console.log(`[D4T] Translated ${roots.length} subtrees: ${textStats.nodes} text nodes (${textStats.skipped} unchanged, ${textStats.cacheHits} cached), ${attributeStats.replaced} of ${attributeStats.attributes} attributes`); // デバッグ用ログ
+          }
+          saveHitProfile(false);
+        });
+      }
 
-    let observeDOMTimer;
+      // ページの変化の監視（タブごとに1つだけ）
+      let domObserver = null;
+      // 辞書を読み込んだか、ページ全体の変換のうち表示領域の近くの変換を書き込んだか
+      let dictionaryReady = false;
+      let visiblePassDone = false;
 
-    function observeDOM(regexTable) {
-      const observer = new MutationObserver(mutations => {
+      function handleMutations(mutations) {
         if (D4DEBUG_DISPLAY) {
           console.log(`[D4T] Number of mutations observed: ${mutations.length}`);
         }
+        collectMutations(mutations);
+        waitForQuiescence();
+        // 辞書を読み込む前に追加されたノードは、読み込んだあとのページ全体の変換で変換する
+        if (!dictionaryReady) return;
 
         if (mutations.length > DOM_CHANGE_MUTATION_THRESHOLD) {
           // すでにタイマーが設定されている場合はクリア
           if (observeDOMTimer) clearTimeout(observeDOMTimer);
 
-          // mutationsが閾値を超えた場合はデバウンスで遅延させて全体をまとめて処理
+          // mutationsが閾値を超えた場合はデバウンスで遅延させ、その間に変更されたノードをまとめて処理
           observeDOMTimer = setTimeout(() => {
-            // console.log(`[D4T] Batch translation triggered by ${mutations.length} mutations`);
-            if (D4DEBUG_DISPLAY) {
-              console.log('[D4T] Performing full-page translation due to high mutation count.');
-            }
-            const batchStartTime = performance.now();
-            const textStats = replaceText(document.body, regexTable);
-            const replaceEndTime = performance.now();
-            const titleStats = replaceTitleAttributes(regexTable);
-            const batchEndTime = performance.now();
-            const patternsCount = regexTable.length;
-            // console.log(`[D4T] Batch translation completed: Total ${(batchEndTime - batchStartTime).toFixed(2)}ms, Text replacement ${(replaceEndTime - batchStartTime).toFixed(2)}ms (${patternsCount} patterns × ${textStats.nodes} nodes = ${textStats.attempts} attempts, ${textStats.replacements} replacements, ${textStats.chars} chars), Title replacement ${(batchEndTime - replaceEndTime).toFixed(2)}ms (${titleStats.elements} elements, ${titleStats.replaced} replaced)`);
+            observeDOMTimer = null;
+            translatePending();
           }, DEBOUNCE_DOM_DELAY_MS);
-        } else {
-          // mutationsが閾値以下の場合は、逐次処理
-          mutations.forEach(mutation => {
-            mutation.addedNodes.forEach(node => {
-              replaceText(node, regexTable);
-              if (node.nodeType === 1 && node.hasAttribute('title')) {
-                let title = node.getAttribute('title');
-                let newTitle = applyRegexTransformations(title, regexTable);
-                if (newTitle !== title && D4DEBUG_DISPLAY) {
-                  console.log('[D4T] Title changed from:', title, 'to:', newTitle); // デバッグ用ログ
+        } else if (!observeDOMTimer) {
+          // mutationsが閾値以下の場合は、逐次処理（まとめて処理する予定がある場合はそちらに任せる）
+          translatePending();
+        }
+      }
+
+      function observeDOM() {
+        if (domObserver) return;
+        const observer = new MutationObserver(mutations => {
+          // 自分の書き込みによるミューテーションは処理しない
+          const pageMutations = mutations.filter(record => !isOwnMutation(record));
+          writeStats.selfMutations += mutations.length - pageMutations.length;
+          if (pageMutations.length > 0) handleMutations(pageMutations);
+        });
+
+        domObserver = observer;
+        // 読み込み中は body がまだない場合があるため、文書全体を監視する
+        observer.observe(document.documentElement, {
+          childList: true,
+          subtree: true,
+          characterData: true,
+          attributes: true,
+          attributeFilter: TRANSLATED_ATTRIBUTES
+        });
+        if (D4DEBUG_DISPLAY) console.log('[D4T] MutationObserver started'); // デバッグ用ログ
+      }
+
+      // 表示領域の近くのテキストを先に変換している変換の監視と、それを打ち切る関数（ページ全体を変換し直す場合に使う）
+      let viewportPass = null;
+
+      // 表示領域の近くにある要素のテキストと属性から変換する（すべて変換したら解決する Promise を返す）
+      // テキストノードを親要素ごとにまとめて IntersectionObserver で監視し、表示領域の近くにあるものを最初に変換する
+      // それ以外は表示領域に近づいた時点で変換し、VIEWPORT_SWEEP_DELAY_MS 後に残りをまとめて変換する
+      // （表示されない要素のテキストや、ページ内検索で使うテキストも変換するため）
+      // 最初に変換したテキストを書き込むまでの時間（startTime から）を textStats.firstVisible に記録し、
+      // 書き込んだ描画フレームで onVisible を呼ぶ
+      function translateViewportFirst(textNodes, elements, textStats, attributeStats, startTime, onVisible) {
+        const groups = new Map();
+        function groupOf(el) {
+          let group = groups.get(el);
+          if (!group) {
+            group = {textNodes: [], elements: []};
+            groups.set(el, group);
+          }
+          return group;
+        }
+        textNodes.forEach(node => groupOf(node.parentNode).textNodes.push(node));
+        elements.forEach(el => groupOf(el).elements.push(el));
+        // 前の変換の残りは新しい変換に含まれるため、前の変換は残りを変換せずに終える
+        if (viewportPass) viewportPass.settle();
+        if (groups.size === 0) {
+          requestAnimationFrame(onVisible);
+          return Promise.resolve();
+        }
+
+        return new Promise(resolve => {
+          let firstBatch = true;
+          const observer = new IntersectionObserver(entries => {
+            const batchTexts = [];
+            const batchElements = [];
+            entries.forEach(entry => {
+              const group = groups.get(entry.target);
+              if (!entry.isIntersecting || !group) return;
+              groups.delete(entry.target);
+              observer.unobserve(entry.target);
+              batchTexts.push(...group.textNodes);
+              batchElements.push(...group.elements);
+            });
+            const isFirstBatch = firstBatch;
+            firstBatch = false;
+            translateNodes(batchTexts, batchElements, textStats, attributeStats).then(() => {
+              if (!isFirstBatch) return;
+              // 書き込みは次の描画フレームの前に行うため、そのフレームで時間を記録する
+              requestAnimationFrame(() => {
+                textStats.firstVisible = performance.now() - startTime;
+                if (D4DEBUG_DISPLAY) {
+                  console.log(`[D4T] First visible text translated in ${textStats.firstVisible.toFixed(2)}ms (${batchTexts.length} text nodes near the viewport, ${groups.size} regions left)`); // デバッグ用ログ
                 }
-                node.setAttribute('title', newTitle);
-              }
+                onVisible();
+              });
+              setTimeout(sweep, VIEWPORT_SWEEP_DELAY_MS);
+            });
+          }, {rootMargin: VIEWPORT_MARGIN});
+
+          // 表示領域に近づかなかった残りをまとめて変換
+          function sweep() {
+            observer.disconnect();
+            if (viewportPass && viewportPass.observer === observer) viewportPass = null;
+            const restTexts = [];
+            const restElements = [];
+            groups.forEach(group => {
+              restTexts.push(...group.textNodes);
+              restElements.push(...group.elements);
             });
+            groups.clear();
+            translateNodes(restTexts, restElements, textStats, attributeStats).then(resolve);
+          }
+
+          // 新しい変換に置き換えられた場合は監視をやめて解決する（最初の変換の前であれば onVisible も呼ぶ）
+          function settle() {
+            observer.disconnect();
+            viewportPass = null;
+            groups.clear();
+            if (firstBatch) {
+              firstBatch = false;
+              requestAnimationFrame(onVisible);
+            }
+            resolve();
+          }
+
+          viewportPass = {observer, settle};
+          groups.forEach((group, el) => observer.observe(el));
+        });
+      }
+
+      function applyTranslations() {
+        if (D4DEBUG_DISPLAY) console.log('[D4T] applyTranslations started'); // デバッグ用ログ
+        const startTime = performance.now();
+        ensureTranslations().then(() => {
+          dictionaryReady = true;
+          const replaceStartTime = performance.now();
+          const textStats = createTextStats();
+          const attributeStats = {attributes: 0, replaced: 0};
+          const textNodes = document.body ? collectTextNodes(document.body, []) : [];
+          const elements = Array.from(document.querySelectorAll(TRANSLATED_ATTRIBUTE_SELECTOR));
+          // 読み込み時の変換の完了は表示領域の近くの変換までとし、VIEWPORT_SWEEP_DELAY_MS 後の残りの変換は含めない
+          function pageVisible() {
+            visiblePassDone = true;
+            if (startupStats.mode === 'debounce') completeStartup();
+          }
+          const viewportFirst = VIEWPORT_FIRST_ENABLED && typeof IntersectionObserver !== 'undefined';
+          const pagePass = viewportFirst
+              ? translateViewportFirst(textNodes, elements, textStats, attributeStats, startTime, pageVisible)
+              : translateNodes(textNodes, elements, textStats, attributeStats);
+          if (!viewportFirst) pagePass.then(() => requestAnimationFrame(pageVisible));
+          pagePass.then(() => {
+            recordPass('page', replaceStartTime, textStats, attributeStats);
+            const totalEndTime = performance.now();
+            const patternsCount = activePatternCount();
+            const firstVisible = textStats.firstVisible === null ? '-' : textStats.firstVisible.toFixed(2);
+            // console.log(`[D4T] Translation completed: Total ${(totalEndTime - startTime).toFixed(2)}ms, First visible text ${firstVisible}ms, Page translation ${(totalEndTime - replaceStartTime).toFixed(2)}ms (${patternsCount} patterns × ${textStats.nodes} nodes = ${textStats.attempts} attempts, ${textStats.replacements} replacements, ${textStats.chars} chars, ${textStats.rejected} nodes rejected, ${attributeStats.attributes} attributes, ${attributeStats.replaced} replaced)`);
+            if (D4DEBUG_DISPLAY) {
+              console.log(`[D4T] Word filter rejected ${textStats.rejected} of ${textStats.nodes} text nodes`); // デバッグ用ログ
+              console.log(`[D4T] Translation cache: ${textStats.cacheHits} hits, ${textStats.cacheMisses} misses`); // デバッグ用ログ
+              console.log(`[D4T] Main thread slices: ${textStats.slices}, longest ${textStats.longestSlice.toFixed(2)}ms`); // デバッグ用ログ
+              console.log(`[D4T] Page translated in ${(totalEndTime - startTime).toFixed(2)}ms (first visible text ${firstVisible}ms)`); // デバッグ用ログ
+            }
+            saveHitProfile(true);
           });
+          // ワーカーで変換している間に変わったノードも変換するため、結果を待たずに監視を始める
+          // （ワーカーの結果の書き込みによるミューテーションは、変換済みとして記録したノードなので変換しない）
+          observeDOM();
+
+          if (D4DEBUG_DISPLAY) console.log('[D4T] Translations applied on page load'); // デバッグ用ログ
+        }).catch(error => {
+          console.error('[D4T] Error loading translations:', error);
+        });
+      }
+
+      // 読み込みが落ち着いたか（最後のミューテーションから QUIESCENCE_MS 経ったか）を確かめるタイマー
+      let quiescenceTimer = null;
+      let quiescenceDeadline = null;
+
+      // 早期開始の場合、ミューテーションのたびに読み込みが落ち着くまでの待ち時間を延ばす
+      // DOMContentLoaded の前（文書の解析中）は落ち着いたとみなさない
+      function waitForQuiescence() {
+        if (startupStats.mode !== 'early' || startupStats.complete !== null) return;
+        if (quiescenceDeadline === null) quiescenceDeadline = performance.now() + QUIESCENCE_MAX_WAIT_MS;
+        if (quiescenceTimer) clearTimeout(quiescenceTimer);
+        const delay = Math.max(0, Math.min(QUIESCENCE_MS, quiescenceDeadline - performance.now()));
+        quiescenceTimer = setTimeout(() => {
+          quiescenceTimer = null;
+          // 表示領域の近くの変換と、まとめて変換する予定のノードの変換を終えてから完了とする
+          const settled = document.readyState !== 'loading' && visiblePassDone && !observeDOMTimer;
+          if (!settled && performance.now() < quiescenceDeadline) {
+            waitForQuiescence();
+            return;
+          }
+          startupStats.timedOut = !settled;
+          requestAnimationFrame(completeStartup);
+        }, delay);
+      }
+
+      // 読み込み時の変換が終わった時間を記録する
+      function completeStartup() {
+        if (startupStats.complete !== null) return;
+        startupStats.complete = lastWriteTime === null ? performance.now() : lastWriteTime;
+        if (D4DEBUG_DISPLAY) {
+          const firstTranslation = startupStats.firstTranslation === null ? '-' : startupStats.firstTranslation.toFixed(2);
+          console.log(`[D4T] Startup (${startupStats.mode}): first translation ${firstTranslation}ms, complete ${startupStats.complete.toFixed(2)}ms after navigation${startupStats.timedOut ? ' (timed out)' : ''}`); // デバッグ用ログ
         }
-      });
+      }
 
-      observer.observe(document.body, { childList: true, subtree: true });
-      if (D4DEBUG_DISPLAY) console.log('[D4T] MutationObserver started'); // デバッグ用ログ
-    }
+      // 早期開始: 辞書の読み込みと並行してページの変化を監視し、読み込んだらその時点のページ全体を変換する
+      // 以降に追加されたノードはミューテーションとして順に変換する
+      function startEarly() {
+        if (D4DEBUG_DISPLAY) console.log('[D4T] Early start'); // デバッグ用ログ
+        observeDOM();
+        waitForQuiescence();
+        ensureTranslations().then(() => {
+          // 読み込み前に集めたノードはページ全体の変換に含まれる
+          pendingRoots.clear();
+          pendingAttributes.clear();
+          pendingMutationCount = 0;
+          applyTranslations();
+        }).catch(error => {
+          console.error('[D4T] Error loading translations:', error);
+        });
+      }
 
-    function applyTranslations() {
-      if (D4DEBUG_DISPLAY) console.log('[D4T] applyTranslations started'); // デバッグ用ログ
-      const startTime = performance.now();
-      loadTranslations().then(regexTable => {
-        if (D4DEBUG_DISPLAY) console.log('[D4T] Loaded regexTable:', regexTable); // デバッグ用ログ
-        const replaceStartTime = performance.now();
-        const textStats = replaceText(document.body, regexTable);
-        const replaceEndTime = performance.now();
-        const titleStats = replaceTitleAttributes(regexTable);
-        const totalEndTime = performance.now();
-        const patternsCount = regexTable.length;
-        // console.log(`[D4T] Translation completed: Total ${(totalEndTime - startTime).toFixed(2)}ms, Text replacement ${(replaceEndTime - replaceStartTime).toFixed(2)}ms (${patternsCount} patterns × ${textStats.nodes} nodes = ${textStats.attempts} attempts, ${textStats.replacements} replacements, ${textStats.chars} chars), Title replacement ${(totalEndTime - replaceEndTime).toFixed(2)}ms (${titleStats.elements} elements, ${titleStats.replaced} replaced)`);
-        observeDOM(regexTable);
-
-
-        if (D4DEBUG_DISPLAY) console.log('[D4T] Translations applied on page load'); // デバッグ用ログ
-      }).catch(error => {
-        console.error('[D4T] Error loading translations:', error);
-      });
-    }
+      let debounceTimer;
 
-    let debounceTimer;
+      function initialize() {
+        if (D4DEBUG_DISPLAY) console.log('[D4T] Initializing...'); // デバッグ用ログ
 
-    function initialize() {
-      if (D4DEBUG_DISPLAY) console.log('[D4T] Initializing...'); // デバッグ用ログ
+        // 既存のタイマーをクリアする
+        if (debounceTimer) clearTimeout(debounceTimer);
 
-      // 既存のタイマーをクリアする
-      if (debounceTimer) clearTimeout(debounceTimer);
+        // 新しいタイマーを設定
+        debounceTimer = setTimeout(() => {
+          if (D4DEBUG_DISPLAY) console.log('[D4T] Timeout completed'); // デバッグ用ログ
+          applyTranslations();
+        }, DEBOUNCE_DELAY_MS);
+      }
 
-      // 新しいタイマーを設定
-      debounceTimer = setTimeout(() => {
-        if (D4DEBUG_DISPLAY) console.log('[D4T] Timeout completed'); // デバッグ用ログ
-        applyTranslations();
-      }, DEBOUNCE_DELAY_MS);
-    }
+      if (EARLY_START_ENABLED) {
+        startEarly();
+      } else {
+        // DOMContentLoaded イベントを追加
+        document.addEventListener('DOMContentLoaded', () => {
+          if (D4DEBUG_DISPLAY) console.log('[D4T] DOMContentLoaded event triggered'); // デバッグ用ログ
+          initialize();
+        });
 
-    // DOMContentLoaded イベントを追加
-    document.addEventListener('DOMContentLoaded', () => {
-      if (D4DEBUG_DISPLAY) console.log('[D4T] DOMContentLoaded event triggered'); // デバッグ用ログ
-      initialize();
-    });
-
-    // load イベントを追加
-    window.addEventListener('load', () => {
-      if (D4DEBUG_DISPLAY) console.log('[D4T] Window load event triggered'); // デバッグ用ログ
-      initialize();
-    });
-
-    // ページが既にロードされている場合にも対応
-    if (document.readyState === 'complete' || document.readyState === 'interactive') {
-      if (D4DEBUG_DISPLAY) console.log('[D4T] Document already loaded'); // デバッグ用ログ
-      initialize();
-    }
+        // load イベントを追加
+        window.addEventListener('load', () => {
+          if (D4DEBUG_DISPLAY) console.log('[D4T] Window load event triggered'); // デバッグ用ログ
+          initialize();
+        });
 
-    chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
-      if (message.action === 'convert') {
-        if (D4DEBUG_DISPLAY) console.log('[D4T] Manual convert triggered'); // デバッグ用ログ
-        applyTranslations();
+        // ページが既にロードされている場合にも対応
+        if (document.readyState === 'complete' || document.readyState === 'interactive') {
+          if (D4DEBUG_DISPLAY) console.log('[D4T] Document already loaded'); // デバッグ用ログ
+          initialize();
+        }
       }
-    });
 
-  } else {
-    if (D4DEBUG_DISPLAY) console.log('[D4T] Extension is disabled');
-  }
-});
\ No newline at end of file
+      chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
+        if (message.action === 'convert') {
+          if (D4DEBUG_DISPLAY) console.log('[D4T] Manual convert triggered'); // デバッグ用ログ
+          applyTranslations();
+        } else if (message.action === 'getPerformance') {
+          sendResponse(collectPerfTrace());
+        }
+      });
+
+    } else {
+      if (D4DEBUG_DISPLAY) console.log('[D4T] Extension is disabled');
+    }
+  });
+})(globalThis);
@@ -0,0 +1,542 @@
+// 翻訳エンジン（content.js から利用する辞書照合処理）
+(function(root) {
+  // 再注入された場合は既存の定義をそのまま使う
+  if (root.D4Engine) return;
+
+  // 実行時辞書の形式バージョン（tools/dictionary_engine.py と合わせる）
+  const COMPILED_FORMAT_VERSION = 8;
+
+  // 単語フィルタでテキストから取り出す単語（\b で区切られる単語構成文字の連続）
+  const WORD_TOKEN_RE = /[A-Za-z0-9_]+/g;
+
+  // 数値テンプレートの索引を引くときに数値とみなす部分と、索引で数値の位置を表す文字
+  const NUMBER_TOKEN_RE = /[+-]?(?:[0-9]+(?:,[0-9]{3})*(?:\.[0-9]+)?|\.[0-9]+)/g;
+  const TEMPLATE_SLOT = '\u0000';
+
+  // 正規表現の \b と同じ単語構成文字の判定（[A-Za-z0-9_]）
+  function isWordCode(code) {
+    return (code >= 97 && code <= 122) || (code >= 65 && code <= 90) || (code >= 48 && code <= 57) || code === 95;
+  }
+
+  const foldCache = new Map();
+
+  // 正規表現の 'i' フラグ（uフラグなし）と同じ大文字小文字の同一視
+  // toUpperCase の結果が1文字でない場合と、非ASCII文字がASCII文字になる場合は変換しない
+  function foldCode(code) {
+    if (code < 128) {
+      return (code >= 97 && code <= 122) ? code - 32 : code;
+    }
+    let folded = foldCache.get(code);
+    if (folded === undefined) {
+      const upper = String.fromCharCode(code).toUpperCase();
+      folded = (upper.length === 1 && upper.charCodeAt(0) >= 128) ? upper.charCodeAt(0) : code;
+      foldCache.set(code, folded);
+    }
+    return folded;
+  }
+
+  // 文字列全体に foldCode を適用
+  function foldText(text) {
+    let folded = '';
+    for (let i = 0; i < text.length; i++) {
+      folded += String.fromCharCode(foldCode(text.charCodeAt(i)));
+    }
+    return folded;
+  }
+
+  // translations.json の内容の要約（tools/dictionary_engine.py の text_digest と同じ）
+  // 実行時辞書が同じ内容の translations.json から生成されたかを確かめるために使う
+  // UTF-16単位で求めた2つの32ビットハッシュを16進数でつなげる
+  function textDigest(text) {
+    let first = 0x811c9dc5;
+    let second = 0x9747b28c;
+    for (let i = 0; i < text.length; i++) {
+      const code = text.charCodeAt(i);
+      first = Math.imul(first ^ code, 0x01000193);
+      second = Math.imul(second ^ code, 0x5bd1e995);
+      second ^= second >>> 15;
+    }
+    return (first >>> 0).toString(16).padStart(8, '0') + (second >>> 0).toString(16).padStart(8, '0');
+  }
+
+  // 位置 pos が単語境界（\b）かどうか
+  function isBoundary(text, pos) {
+    const before = pos > 0 && isWordCode(text.charCodeAt(pos - 1));
+    const after = pos < text.length && isWordCode(text.charCodeAt(pos));
+    return before !== after;
+  }
+
+  // literals.json のキー（大文字小文字を同一視した形、キー番号順）から Aho-Corasick オートマトンの照合器を作る
+  // 各キーは \b...\b と 'gi' で評価した場合と同じ位置にマッチする
+  // キー番号は content.js の適用順（キーの長さの降順）に並んでいる
+  // hits を渡すと、キーごとの置換回数を hits[キー番号] に加算する
+  //
+  // オートマトンは状態数がキーの文字数ほどになり、読み込みのたびにすべて構築すると時間がかかるため、
+  // 走査でたどった状態の子だけを作る。キーを辞書順に並べると、各状態はその状態までの文字列で始まるキーの
+  // 連続した範囲になるので、子は範囲を次の文字ごとに区切れば求まる。失敗リンクと出力リンクも必要になったときに求める
+  function createLiteralMatcher(keys, replacements, hits = null) {
+    const lengths = Int32Array.from(keys, key => key.length);
+    // 既定の sort はUTF-16単位で比べる
+    const sorted = keys.slice().sort();
+    const keyIndex = new Map(keys.map((key, index) => [key, index]));
+
+    // 状態ごとの情報（状態 0 がルート。状態の子は連続した番号でラベルの昇順に並ぶ）
+    const rangeStart = [0];   // その状態までの文字列で始まるキーの範囲（sorted の位置）
+    const rangeEnd = [sorted.length];
+    const depth = [0];
+    const parent = [0];
+    const labels = [0];       // 親からその状態へ遷移する文字
+    const output = [-1];      // その状態で終わるキーの番号（なければ -1）
+    const firstChild = [-1];  // 子を作っていなければ -1
+    const childEnd = [-1];
+    const fail = [0];         // 求めていなければ -1
+    const outputLink = [0];   // 失敗リンクをたどった先で最初に出力を持つ状態（求めていなければ -1）
+
+    function expand(state) {
+      const position = depth[state];
+      const end = rangeEnd[state];
+      let i = rangeStart[state];
+      // その状態で終わるキーは範囲の先頭にある（キーは重複しない）
+      if (i < end && sorted[i].length === position) i++;
+      firstChild[state] = labels.length;
+      while (i < end) {
+        const code = sorted[i].charCodeAt(position);
+        let j = i + 1;
+        while (j < end && sorted[j].charCodeAt(position) === code) j++;
+        rangeStart.push(i);
+        rangeEnd.push(j);
+        depth.push(position + 1);
+        parent.push(state);
+        labels.push(code);
+        output.push(sorted[i].length === position + 1 ? keyIndex.get(sorted[i]) : -1);
+        firstChild.push(-1);
+        childEnd.push(-1);
+        fail.push(-1);
+        outputLink.push(-1);
+        i = j;
+      }
+      childEnd[state] = labels.length;
+    }
+
+    // ルートからの遷移は頻繁に引くのでMapにしておく
+    expand(0);
+    const rootChildren = new Map();
+    for (let child = firstChild[0]; child < childEnd[0]; child++) {
+      rootChildren.set(labels[child], child);
+    }
+
+    // 状態 state の子のうちラベルが code の状態（なければ -1）
+    function childOf(state, code) {
+      if (state === 0) {
+        const child = rootChildren.get(code);
+        return child === undefined ? -1 : child;
+      }
+      if (firstChild[state] < 0) expand(state);
+      let low = firstChild[state];
+      let high = childEnd[state] - 1;
+      while (low <= high) {
+        const middle = (low + high) >> 1;
+        const label = labels[middle];
+        if (label === code) return middle;
+        if (label < code) {
+          low = middle + 1;
+        } else {
+          high = middle - 1;
+        }
+      }
+      return -1;
+    }
+
+    function failOf(state) {
+      if (fail[state] >= 0) return fail[state];
+      let target = 0;
+      if (parent[state] !== 0) {
+        const code = labels[state];
+        let link = failOf(parent[state]);
+        while (true) {
+          const child = childOf(link, code);
+          if (child >= 0) {
+            target = child;
+            break;
+          }
+          if (link === 0) break;
+          link = failOf(link);
+        }
+      }
+      fail[state] = target;
+      return target;
+    }
+
+    function outputLinkOf(state) {
+      if (outputLink[state] >= 0) return outputLink[state];
+      const link = failOf(state);
+      const target = (link === 0 || output[link] >= 0) ? link : outputLinkOf(link);
+      outputLink[state] = target;
+      return target;
+    }
+
+    // 直前に走査したテキストとそのマッチ候補（テキストが変わらなければ再走査しない）
+    let scannedText = null;
+    let candidateStarts = [];
+    let candidateKeys = [];
+
+    function scan(text, stats) {
+      const length = text.length;
+      candidateStarts = [];
+      candidateKeys = [];
+      scannedText = text;
+      let state = 0;
+
+      if (stats) stats.attempts++;
+      for (let i = 0; i < length; i++) {
+        const code = foldCode(text.charCodeAt(i));
+        let child = childOf(state, code);
+        while (child < 0 && state !== 0) {
+          state = failOf(state);
+          child = childOf(state, code);
+        }
+        state = child < 0 ? 0 : child;
+
+        let match = output[state] >= 0 ? state : outputLinkOf(state);
+        while (match > 0) {
+          const key = output[match];
+          const start = i + 1 - lengths[key];
+          if (isBoundary(text, start) && isBoundary(text, i + 1)) {
+            candidateStarts.push(start);
+            candidateKeys.push(key);
+          }
+          match = outputLinkOf(match);
+        }
+      }
+    }
+
+    // キー番号が first 以上 last 未満のキーで置換する
+    // 正規表現キーより長いキーと短いキーを分けて適用し、従来の適用順を保つために使う
+    function replace(text, stats = null, first = 0, last = lengths.length) {
+      if (text !== scannedText) scan(text, stats);
+
+      const order = [];
+      for (let index = 0; index < candidateKeys.length; index++) {
+        const key = candidateKeys[index];
+        if (key >= first && key < last) order.push(index);
+      }
+      if (order.length === 0) return text;
+
+      // 重なったマッチは従来の正規表現の適用順（キー番号＝長い順、同じキーは左から）で採用する
+      const length = text.length;
+      order.sort((a, b) => (candidateKeys[a] - candidateKeys[b]) || (candidateStarts[a] - candidateStarts[b]));
+      const used = new Uint8Array(length);
+      const chosen = new Int32Array(length).fill(-1);
+      for (const index of order) {
+        const start = candidateStarts[index];
+        const end = start + lengths[candidateKeys[index]];
+        let free = true;
+        for (let pos = start; pos < end; pos++) {
+          if (used[pos]) {
+            free = false;
+            break;
+          }
+        }
+        if (!free) continue;
+        used.fill(1, start, end);
+        chosen[start] = candidateKeys[index];
+      }
+
+      let result = '';
+      let lastEnd = 0;
+      for (let pos = 0; pos < length;) {
+        const key = chosen[pos];
+        if (key < 0) {
+          pos++;
+          continue;
+        }
+        result += text.slice(lastEnd, pos) + replacements[key];
+        pos += lengths[key];
+        lastEnd = pos;
+        if (stats) stats.replacements++;
+        if (hits) hits[key]++;
+      }
+      return result + text.slice(lastEnd);
+    }
+
+    return {
+      replace,
+      keys,  // キー番号ごとのキー（大文字小文字を同一視した形、プロファイルの書き出し用）
+      keyCount: lengths.length
+    };
+  }
+
+  // テキスト全体（前後の空白を除く）が1つの文字列キーと一致する場合の完全一致表
+  // compile_dictionary.py が、従来の適用順で置換しても結果が変わることのないキーだけを選んでいる
+  // excluded は完全一致表に入れないオートマトンのキー番号の一覧、limits は長さに上限があるキーの [キー番号, 上限]
+  function createExactLookup(excluded, limits, keys, replacements) {
+    const excludedSet = new Set(excluded);
+    const limitOf = new Map(limits);
+    const table = new Map();
+    let maxKeyLength = 0;
+    for (let keyIndex = 0; keyIndex < keys.length; keyIndex++) {
+      if (excludedSet.has(keyIndex)) continue;
+      const folded = keys[keyIndex];
+      table.set(folded, {
+        keyIndex,
+        replacement: replacements[keyIndex],
+        limit: limitOf.has(keyIndex) ? limitOf.get(keyIndex) : Infinity  // この長さ以上のテキストでは正規表現キーが評価される
+      });
+      maxKeyLength = Math.max(maxKeyLength, folded.length);
+    }
+
+    // 一致すれば置換後のテキストを、一致しなければnullを返す（hits はオートマトンのキー番号ごとの置換回数）
+    function lookup(text, hits = null) {
+      const core = text.trim();
+      if (core.length === 0 || core.length > maxKeyLength) return null;
+      const entry = table.get(foldText(core));
+      if (entry === undefined || text.length >= entry.limit) return null;
+      if (hits) hits[entry.keyIndex]++;
+      const leading = text.length - text.trimStart().length;
+      return text.slice(0, leading) + entry.replacement + text.slice(leading + core.length);
+    }
+
+    return {
+      lookup,
+      size: table.size
+    };
+  }
+
+  // 数値だけが変わる正規表現キーの索引
+  // テキストの数値を TEMPLATE_SLOT に置き換えて引き、見つかったキーの正規表現がテキスト全体（前後の空白を除く）に
+  // 一致した場合だけ、そのキーで置換する。patterns は content.js の compiledPatterns
+  function createTemplateLookup(templates, patterns) {
+    const table = new Map(Object.entries(templates));
+
+    // 一致すれば置換後のテキストを、一致しなければnullを返す（hits はパターン番号ごとの置換回数）
+    function lookup(text, stats = null, hits = null) {
+      if (table.size === 0) return null;
+      const core = text.trim();
+      if (!/[0-9]/.test(core)) return null;
+      const index = table.get(foldText(core.replace(NUMBER_TOKEN_RE, TEMPLATE_SLOT)));
+      if (index === undefined) return null;
+
+      // 長さフィルタで評価されないテキストでは通常の処理と結果が変わりうるため使わない
+      const {regex, replacement, minLength} = patterns[index];
+      if (text.length < minLength) return null;
+      const leading = text.length - text.trimStart().length;
+      regex.lastIndex = 0;
+      const match = regex.exec(text);
+      regex.lastIndex = 0;
+      if (!match || match.index !== leading || match[0].length !== core.length) return null;
+
+      const newText = text.replace(regex, replacement);
+      if (stats) {
+        stats.attempts++;
+        if (newText !== text) stats.replacements++;
+      }
+      if (hits && newText !== text) hits[index]++;
+      return newText;
+    }
+
+    return {
+      lookup,
+      size: table.size
+    };
+  }
+
+  // literals.json の wordPositions（キー番号ごとの単語フィルタの単語がキーの何番目の単語か）から単語フィルタの表を作る
+  // 文字列キーに一致するテキストにはキーの単語がすべて単語全体として含まれるため、prefixes はない
+  function literalWordTable(literals) {
+    if (!literals.wordPositions) return null;
+    const words = literals.wordPositions.map((position, keyIndex) =>
+      literals.keys[keyIndex].match(WORD_TOKEN_RE)[position].toLowerCase());
+    return {words, prefixes: []};
+  }
+
+  // compile_dictionary.py が生成した単語フィルタ（literalWordTable で作った表と patterns.json の words）
+  // どのキーも、一致するテキストには words のいずれかの単語か、prefixes のいずれかで始まる単語が含まれる
+  // 単語を決められないキーがある表を含む場合はnullを返す
+  function createWordFilter(tables) {
+    if (tables.some(table => !table)) return null;
+    const words = new Set();
+    const prefixes = new Set();
+    for (const table of tables) {
+      table.words.forEach(word => words.add(word));
+      table.prefixes.forEach(prefix => prefixes.add(prefix));
+    }
+    const prefixLengths = [...new Set([...prefixes].map(prefix => prefix.length))].sort((a, b) => a - b);
+
+    // いずれかのキーに一致しうるテキストであればtrue
+    function test(text) {
+      WORD_TOKEN_RE.lastIndex = 0;
+      let match;
+      while ((match = WORD_TOKEN_RE.exec(text)) !== null) {
+        // 非ASCII文字を含めて小文字にすると単語の区切りが変わるため、取り出した単語だけを小文字にする
+        const word = match[0].toLowerCase();
+        if (words.has(word)) return true;
+        for (const length of prefixLengths) {
+          if (length > word.length) break;
+          if (prefixes.has(word.slice(0, length))) return true;
+        }
+      }
+      return false;
+    }
+
+    return {
+      test,
+      size: words.size + prefixes.size
+    };
+  }
+
+  // content.js と同じ方法でキーを正規表現にする（' と ' を同一視し、\b...\b と 'gi' フラグで評価）
+  // minLength より短いテキストには評価しない（パターン自体の長さによる足切り）
+  // gate はプロファイルで降格したキーが必ず含む単語で、テキストに含まれない場合は評価しない
+  function compilePattern(pattern, replacement, literalsBefore = 0, gate = null) {
+    const escapedPattern = pattern.replace(/['']/g, "['']");
+    return {
+      key: pattern,
+      regex: new RegExp(`\\b${escapedPattern}\\b`, 'gi'),
+      replacement,
+      minLength: pattern.length,  // パターン自体の長さ
+      literalsBefore,
+      // 単語は [a-z0-9_] だけなのでそのまま正規表現にできる
+      gate: gate ? new RegExp(gate, 'i') : null
+    };
+  }
+
+  // compile_dictionary.py の実行時辞書（literals.json と patterns.json の内容）から翻訳処理を作る
+  // 結果はすべてのキーを長い順に正規表現として評価した従来の処理と同じになる
+  // profile が true の場合は、置換に使われたキーの回数と、正規表現キーごとの評価回数・処理時間を記録する
+  // （collectHits で取り出す）
+  function createTranslator(literals, patterns, profile = false) {
+    const literalHits = profile ? new Uint32Array(literals.keys.length) : null;
+    const patternHits = profile ? new Uint32Array(patterns.patterns.length) : null;
+    const patternAttempts = profile ? new Uint32Array(patterns.patterns.length) : null;
+    const patternTimes = profile ? new Float64Array(patterns.patterns.length) : null;
+    const automatonCost = {attempts: 0, time: 0};
+    const literalMatcher = createLiteralMatcher(literals.keys, literals.replacements, literalHits);
+    const exactLookup = createExactLookup(literals.exactExcluded, literals.exactLimits, literals.keys, literals.replacements);
+    const compiledPatterns = patterns.patterns.map(([pattern, replacement, literalsBefore, gate]) =>
+      compilePattern(pattern, replacement, literalsBefore, gate));
+    const templateLookup = createTemplateLookup(patterns.templates, compiledPatterns);
+    const wordFilter = createWordFilter([literalWordTable(literals), patterns.words]);
+
+    // オートマトンで first 以上 last 未満のキーを置換（プロファイル中は処理時間を記録）
+    function replaceLiterals(text, stats, first, last) {
+      if (!profile) return literalMatcher.replace(text, stats, first, last);
+      const start = performance.now();
+      const newText = literalMatcher.replace(text, stats, first, last);
+      automatonCost.attempts++;
+      automatonCost.time += performance.now() - start;
+      return newText;
+    }
+
+    // index 番目の正規表現キーを適用（プロファイル中は評価回数と処理時間を記録）
+    function replacePattern(text, index) {
+      const {regex, replacement} = compiledPatterns[index];
+      if (!profile) return text.replace(regex, replacement);
+      const start = performance.now();
+      const newText = text.replace(regex, replacement);
+      patternAttempts[index]++;
+      patternTimes[index] += performance.now() - start;
+      if (newText !== text) patternHits[index]++;
+      return newText;
+    }
+
+    function translate(text, stats = null) {
+      // どのキーの単語も含まないテキスト（ナビゲーション、数値だけ、日本語など）は照合しない
+      if (wordFilter && !wordFilter.test(text)) {
+        if (stats) stats.rejected++;
+        return text;
+      }
+
+      // テキスト全体が1つの文字列キーであれば、パターンを評価せずに置換
+      const exactText = exactLookup.lookup(text, literalHits);
+      if (exactText !== null) {
+        if (stats) {
+          stats.attempts++;
+          stats.replacements++;
+        }
+        return exactText;
+      }
+
+      // テキスト全体が数値だけが変わるキーであれば、そのキーだけを評価して置換
+      const templateText = templateLookup.lookup(text, stats, patternHits);
+      if (templateText !== null) return templateText;
+
+      const textLength = text.length;
+      // オートマトンで適用済みのキー数
+      let literalsApplied = 0;
+
+      // 事前コンパイルされたパターンを適用（長さフィルタ付き）
+      // 文字列キーはキーの長さの順序を保ったまま、正規表現キーの間でオートマトンで置換
+      for (let index = 0; index < compiledPatterns.length; index++) {
+        const {minLength, literalsBefore, gate} = compiledPatterns[index];
+        if (literalsBefore > literalsApplied) {
+          text = replaceLiterals(text, stats, literalsApplied, literalsBefore);
+          literalsApplied = literalsBefore;
+        }
+        // 降格したキーは、必ず含む単語が現在のテキストにない場合は評価しない
+        if (minLength <= textLength && (!gate || gate.test(text))) {
+          if (stats) stats.attempts++;
+          const newText = replacePattern(text, index);
+          if (newText !== text) {
+            text = newText;
+            if (stats) stats.replacements++;
+          }
+        }
+      }
+
+      // 残りの（最も短い正規表現キーより短い）文字列キーを置換
+      return replaceLiterals(text, stats, literalsApplied);
+    }
+
+    // 記録した内容を返し、記録をリセットする
+    // {literals: {キー（大文字小文字を同一視した形）: 置換回数},
+    //  patterns: {キー: {attempts: 評価回数, hits: 置換回数, time: 処理時間（ミリ秒）}},
+    //  automaton: {attempts: オートマトンでの置換回数, time: 処理時間（ミリ秒）}}
+    // performance.now() の精度は環境によって粗いため、処理時間は多くのページで合計して比べる
+    function collectHits() {
+      const hits = {literals: {}, patterns: {}, automaton: {attempts: 0, time: 0}};
+      if (!profile) return hits;
+      const literalKeys = literalMatcher.keys;
+      literalHits.forEach((count, index) => {
+        if (count > 0) hits.literals[literalKeys[index]] = count;
+      });
+      patternAttempts.forEach((attempts, index) => {
+        if (attempts > 0 || patternHits[index] > 0) {
+          hits.patterns[compiledPatterns[index].key] =
+              {attempts, hits: patternHits[index], time: patternTimes[index]};
+        }
+      });
+      hits.automaton = {...automatonCost};
+      literalHits.fill(0);
+      patternHits.fill(0);
+      patternAttempts.fill(0);
+      patternTimes.fill(0);
+      automatonCost.attempts = 0;
+      automatonCost.time = 0;
+      return hits;
+    }
+
+    return {
+      translate,
+      collectHits,
+      patternCount: compiledPatterns.length,
+      literalCount: literalMatcher.keyCount,
+      exactCount: exactLookup.size,
+      templateCount: templateLookup.size,
+      wordCount: wordFilter ? wordFilter.size : 0
+    };
+  }
+
+  root.D4Engine = {
+    COMPILED_FORMAT_VERSION,
+    isWordCode,
+    foldCode,
+    foldText,
+    textDigest,
+    createLiteralMatcher,
+    createExactLookup,
+    createTemplateLookup,
+    createWordFilter,
+    compilePattern,
+    createTranslator
+  };
+})(globalThis);
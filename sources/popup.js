@@ -2,12 +2,22 @@ document.addEventListener('DOMContentLoaded', () => {
   const toggleSwitch = document.getElementById('toggleSwitch');
   const convertButton = document.getElementById('convertButton');
   const versionElement = document.getElementById('version');
+  const profilingSwitch = document.getElementById('profilingSwitch');
+  const exportProfileButton = document.getElementById('exportProfileButton');
+  const clearProfileButton = document.getElementById('clearProfileButton');
+  const perfSummary = document.getElementById('perfSummary');
+  const exportTraceButton = document.getElementById('exportTraceButton');
 
   // ストレージから現在の状態を取得してスイッチの状態を設定
   chrome.storage.sync.get(['enabled'], function(result) {
     toggleSwitch.checked = !!result.enabled;
   });
 
+  // ヒット記録（サイトごとのキーの置換回数の記録）の状態を取得
+  chrome.storage.local.get(['profiling'], function(result) {
+    profilingSwitch.checked = !!result.profiling;
+  });
+
   // バージョン情報を表示
   const manifestData = chrome.runtime.getManifest();
   versionElement.textContent = 'ver ' + manifestData.version;
@@ -26,6 +36,90 @@ document.addEventListener('DOMContentLoaded', () => {
     });
   });
 
+  // ヒット記録のスイッチがクリックされたときの動作（次に変換したページから記録する）
+  profilingSwitch.addEventListener('change', () => {
+    chrome.storage.local.set({ profiling: profilingSwitch.checked });
+  });
+
+  // 記録をJSONファイルとして書き出す（tools/build_site_subsets.py と tools/profile_patterns.py の入力）
+  exportProfileButton.addEventListener('click', () => {
+    chrome.storage.local.get(['hitProfile'], function(result) {
+      const profile = result.hitProfile || { version: 2, hosts: {} };
+      const blob = new Blob([JSON.stringify(profile, null, 2)], { type: 'application/json' });
+      const url = URL.createObjectURL(blob);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `d4t_hit_profile_${new Date().toISOString().slice(0, 10)}.json`;
+      link.click();
+      setTimeout(() => URL.revokeObjectURL(url), 1000);
+    });
+  });
+
+  clearProfileButton.addEventListener('click', () => {
+    chrome.storage.local.remove('hitProfile', function() {
+      console.log('[D4T] Hit profile cleared');
+    });
+  });
+
+  // 表示中のタブの性能の記録を取得する（content.js が動いていないタブではnull）
+  function requestPerfTrace(callback) {
+    chrome.tabs.query({ active: true, currentWindow: true }, function(tabs) {
+      if (tabs.length === 0) {
+        callback(null);
+        return;
+      }
+      chrome.tabs.sendMessage(tabs[0].id, { action: 'getPerformance' }, function(response) {
+        callback(chrome.runtime.lastError ? null : (response || null));
+      });
+    });
+  }
+
+  // 最近傍順位法のパーセンタイル（tools/compare_traces.py と同じ）
+  function percentile(values, p) {
+    const sorted = values.slice().sort((a, b) => a - b);
+    return sorted[Math.max(0, Math.ceil(p / 100 * sorted.length) - 1)];
+  }
+
+  // 変換の種類ごとの回数と変換していた時間（work）の p50/p95、キャッシュのヒット率、読み込み時の時間を表示
+  function showPerfSummary(trace) {
+    if (!trace || trace.passes.length === 0) {
+      perfSummary.textContent = '性能の記録はありません';
+      return;
+    }
+    const lines = [];
+    ['page', 'mutations', 'deferred'].forEach(type => {
+      const times = trace.passes.filter(pass => pass.type === type).map(pass => pass.work);
+      if (times.length === 0) return;
+      lines.push(`${type}: ${times.length}回 p50 ${percentile(times, 50).toFixed(1)}ms p95 ${percentile(times, 95).toFixed(1)}ms`);
+    });
+    const hits = trace.passes.reduce((sum, pass) => sum + pass.cacheHits, 0);
+    const lookups = trace.passes.reduce((sum, pass) => sum + pass.cacheHits + pass.cacheMisses, 0);
+    if (lookups > 0) lines.push(`キャッシュ: ${(hits * 100 / lookups).toFixed(0)}%`);
+    if (trace.startup.firstTranslation !== null) {
+      const complete = trace.startup.complete === null ? '-' : trace.startup.complete.toFixed(0);
+      lines.push(`読み込み: ${trace.startup.firstTranslation.toFixed(0)}ms / ${complete}ms`);
+    }
+    perfSummary.textContent = lines.join('\n');
+  }
+
+  // ポップアップを開いている間は1秒ごとに更新
+  requestPerfTrace(showPerfSummary);
+  setInterval(() => requestPerfTrace(showPerfSummary), 1000);
+
+  // 性能の記録をJSONファイルとして書き出す（tools/compare_traces.py の入力）
+  exportTraceButton.addEventListener('click', () => {
+    requestPerfTrace(function(trace) {
+      if (!trace) return;
+      const blob = new Blob([JSON.stringify(trace, null, 2)], { type: 'application/json' });
+      const url = URL.createObjectURL(blob);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `d4t_trace_${trace.host}_${new Date().toISOString().slice(0, 10)}.json`;
+      link.click();
+      setTimeout(() => URL.revokeObjectURL(url), 1000);
+    });
+  });
+
   // 手動変換ボタンがクリックされたときの動作
   convertButton.addEventListener('click', () => {
     chrome.tabs.query({ active: true, currentWindow: true }, function(tabs) {
@@ -0,0 +1,26 @@
+// 翻訳ワーカー（content.js が engine.js と連結して起動する）
+// 全体の実行時辞書を持ち、content.js からまとめて送られたテキストを変換して返す
+// メッセージ:
+//   {type: 'load', literals, patterns}: 実行時辞書（literals.json と patterns.json の内容）を読み込む
+//   {type: 'translate', id, texts}: texts を変換し、{id, texts, stats} を返す（失敗した場合は {id, error}）
+//     stats.work は変換にかかった時間(ms)
+(function() {
+  let translator = null;
+
+  self.onmessage = event => {
+    const message = event.data;
+    if (message.type === 'load') {
+      translator = D4Engine.createTranslator(message.literals, message.patterns);
+    } else if (message.type === 'translate') {
+      try {
+        const start = performance.now();
+        const stats = {attempts: 0, replacements: 0, rejected: 0, work: 0};
+        const texts = message.texts.map(text => translator.translate(text, stats));
+        stats.work = performance.now() - start;
+        self.postMessage({id: message.id, texts, stats});
+      } catch (error) {
+        self.postMessage({id: message.id, error: String(error)});
+      }
+    }
+  };
+})();
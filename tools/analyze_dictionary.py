@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+translations.json のキー同士の関係を解析するスクリプト
+
+content.js はキーを長い順に1つずつ適用するため、次のようなキーは処理時間を使うだけだったり、
+意図しない変換の原因になったりする
+- 長いキーの一部になっているキー（そのテキストでは長いキーが先に置換するため一致しない）
+- 置換後の文字列に後から適用されるキーが現れるもの（置換結果がさらに翻訳される）
+- 一度も置換できないキー（大文字小文字だけが違う先のキーがすべて置換してしまう、正規表現として不正など）
+- 置換後の文字列がキーと同じキー（テキストの大文字小文字をキーに合わせる以外は何も変えない）
+
+文字列キーの包含と置換後の文字列の照合は、compile_dictionary.py と同じ Aho-Corasick オートマトンで
+各文字列を1回ずつ走査して調べる（キーの組を総当たりしない）
+一度も置換できないキーを除いた辞書は、content.js の変換結果を変えずにパターン数を減らせる
+"""
+
+import json
+import os
+import sys
+
+from compile_dictionary import is_literal_key, load_translations
+from dictionary_engine import (WORD_TOKEN_RE, LiteralMatcher, build_automaton, compile_key, fold_text, required_words,
+                               sorted_entries)
+
+# 画面に表示する例の数
+EXAMPLE_COUNT = 10
+
+def build_key_index(entries):
+    """文字列キーのオートマトンと、オートマトンのキー番号 → 適用順の位置の対応を作る
+
+    大文字小文字を同一視すると同じになるキーは、先に適用される方だけがオートマトンに入る
+    """
+    literals = []
+    positions = []
+    seen = set()
+    for position, (key, replacement) in enumerate(entries):
+        if not is_literal_key(key, replacement):
+            continue
+        literals.append((key, replacement))
+        folded = fold_text(key)
+        if folded not in seen:
+            seen.add(folded)
+            positions.append(position)
+    return LiteralMatcher(build_automaton(literals)), positions
+
+def find_matches(matcher, text):
+    """text に \\b...\\b で一致する文字列キーの番号（重複なし、出現順）"""
+    matcher.scan(text)
+    found = []
+    for key, _ in matcher.candidates:
+        if key not in found:
+            found.append(key)
+    return found
+
+def find_dead_keys(entries):
+    """大文字小文字だけが違う先のキーがすべての出現を置換してしまい、一度も置換できない文字列キー
+
+    2つのキーは同じ長さなので、その間に適用されるのも同じ長さのキーだけになる
+    それらの置換後の文字列がキーの文字を含まなければ、後のキーに一致するテキストが新たに作られることはない
+    （$ による参照を含む置換は元のテキストの一部を移すため確かめられず、unverified とする）
+    戻り値は (一度も置換できないキー, 確かめられなかったキー) で、どちらも (キー, 先のキー) のリスト
+    """
+    dead = []
+    unverified = []
+    first_position = {}
+    for position, (key, replacement) in enumerate(entries):
+        if not is_literal_key(key, replacement):
+            continue
+        folded = fold_text(key)
+        if folded not in first_position:
+            first_position[folded] = position
+            continue
+        earlier = first_position[folded]
+        chars = set(folded)
+        verified = True
+        for _, between_replacement in entries[earlier:position]:
+            if '$' in between_replacement:
+                verified = False
+                break
+            if chars & set(fold_text(between_replacement)):
+                verified = False
+                break
+        (dead if verified else unverified).append((key, entries[earlier][0]))
+    return dead, unverified
+
+def find_invalid_keys(entries):
+    """content.js で正規表現としてコンパイルできないキー"""
+    invalid = []
+    for key, replacement in entries:
+        try:
+            compile_key(key, replacement)
+        except ValueError as error:
+            invalid.append((key, str(error)))
+    return invalid
+
+def find_contained_keys(entries, matcher, positions):
+    """他の（より長い）文字列キーの一部として \\b...\\b で一致する文字列キー（キー → それを含むキーのリスト）"""
+    contained = {}
+    for position in positions:
+        key = entries[position][0]
+        for index in find_matches(matcher, key):
+            inner = entries[positions[index]][0]
+            if inner != key:
+                contained.setdefault(inner, []).append(key)
+    return contained
+
+def find_cascades(entries, matcher, positions, regex_keys):
+    """置換後の文字列に、後から適用されるキーが一致するエントリ（キー → 置換結果を翻訳し直すキーのリスト）
+
+    regex_keys は (適用順の位置, キー, コンパイルしたパターン, 必ず含まれる単語) のリストで、
+    置換後の文字列の単語で絞り込んでから正規表現を評価する
+    """
+    cascades = {}
+    for position, (key, replacement) in enumerate(entries):
+        later = [entries[positions[index]][0] for index in find_matches(matcher, replacement)
+                 if positions[index] > position]
+        tokens = None
+        for regex_position, regex_key, pattern, words in regex_keys:
+            if regex_position <= position:
+                continue
+            if tokens is None:
+                tokens = {token.lower() for token in WORD_TOKEN_RE.findall(replacement)}
+            if not all(word in tokens if whole else any(token.startswith(word) for token in tokens)
+                       for word, whole in words):
+                continue
+            if pattern['regex'].search(replacement):
+                later.append(regex_key)
+        if later:
+            cascades[key] = later
+    return cascades
+
+def analyze(translations, drop_identity=False):
+    """解析結果（レポートの内容）と、一度も置換できないキーを除いた辞書を返す
+
+    drop_identity を指定すると、置換後の文字列がキーと同じキーも除く
+    （テキストの大文字小文字がキーと違う場合だけ content.js の変換結果が変わる）
+    """
+    entries = sorted_entries(translations)
+    matcher, positions = build_key_index(entries)
+    invalid = find_invalid_keys(entries)
+    invalid_keys = {key for key, _ in invalid}
+
+    regex_keys = []
+    for position, (key, replacement) in enumerate(entries):
+        if is_literal_key(key, replacement) or key in invalid_keys:
+            continue
+        regex_keys.append((position, key, compile_key(key, replacement), required_words(key)))
+
+    dead, unverified = find_dead_keys(entries)
+    contained = find_contained_keys(entries, matcher, positions)
+    cascades = find_cascades(entries, matcher, positions, regex_keys)
+
+    identity = [key for key, replacement in entries if key == replacement]
+    removed = {key for key, _ in dead} | invalid_keys
+    if drop_identity:
+        removed |= set(identity)
+    pruned = {key: value for key, value in translations.items() if key not in removed}
+    report = {
+        'entries': len(translations),
+        'literalKeys': len(translations) - len(regex_keys) - len(invalid),
+        'regexKeys': len(regex_keys),
+        'prunedEntries': len(pruned),
+        'dead': [{'key': key, 'shadowedBy': earlier} for key, earlier in dead],
+        'unverified': [{'key': key, 'shadowedBy': earlier} for key, earlier in unverified],
+        'invalid': [{'key': key, 'error': error} for key, error in invalid],
+        'identity': identity,
+        'contained': [{'key': key, 'containedIn': outer}
+                      for key, outer in sorted(contained.items(), key=lambda item: -len(item[1]))],
+        'cascades': [{'key': key, 'replacement': translations[key], 'retranslatedBy': later}
+                     for key, later in cascades.items()],
+    }
+    return report, pruned
+
+def print_report(report):
+    print(f"  Entries: {report['entries']} ({report['literalKeys']} literal, {report['regexKeys']} regex)")
+
+    print(f"\nKeys that can never fire: {len(report['dead'])}")
+    for item in report['dead'][:EXAMPLE_COUNT]:
+        print(f"  {item['key']!r} (same as {item['shadowedBy']!r} ignoring case)")
+    if report['unverified']:
+        print(f"  Not verified (replacements in between may recreate the key): {len(report['unverified'])}")
+    print(f"\nInvalid regex keys: {len(report['invalid'])}")
+    for item in report['invalid'][:EXAMPLE_COUNT]:
+        print(f"  {item['error']}")
+
+    print(f"\nKeys replaced with themselves: {len(report['identity'])}")
+    for key in report['identity'][:EXAMPLE_COUNT]:
+        print(f"  {key!r}")
+
+    print(f"\nKeys contained in longer keys: {len(report['contained'])}")
+    for item in report['contained'][:EXAMPLE_COUNT]:
+        print(f"  {item['key']!r}: in {len(item['containedIn'])} keys (e.g. {item['containedIn'][0]!r})")
+
+    print(f"\nReplacements re-translated by later keys: {len(report['cascades'])}")
+    for item in report['cascades'][:EXAMPLE_COUNT]:
+        print(f"  {item['key']!r} -> {item['replacement']!r}: {', '.join(repr(key) for key in item['retranslatedBy'])}")
+
+    print(f"\nPruned dictionary: {report['entries']} -> {report['prunedEntries']} entries")
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    translations_file = os.path.join(os.path.dirname(script_dir), 'sources', 'translations.json')
+
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage: python analyze_dictionary.py [translations.json] [options]")
+        print("\nOptions:")
+        print("  --report <file>: Save the full report as JSON")
+        print("  --output <file>: Save the dictionary without keys that can never fire")
+        print("  --drop-identity: Also drop keys replaced with themselves (only changes letter case)")
+        print(f"\nDefault dictionary: {translations_file}")
+        return
+
+    report_file = None
+    output_file = None
+    drop_identity = False
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '--report' and i + 1 < len(sys.argv):
+            report_file = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--output' and i + 1 < len(sys.argv):
+            output_file = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--drop-identity':
+            drop_identity = True
+            i += 1
+        else:
+            translations_file = sys.argv[i]
+            i += 1
+
+    if not os.path.exists(translations_file):
+        print(f"Error: {translations_file} not found")
+        sys.exit(1)
+
+    print(f"Analyzing {translations_file}...")
+    translations = load_translations(translations_file)
+    report, pruned = analyze(translations, drop_identity)
+    print_report(report)
+
+    if report_file:
+        with open(report_file, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"Wrote {report_file}")
+    if output_file:
+        # translations.json と同じ形式（元の順序、インデント4）で保存
+        with open(output_file, 'w', encoding='utf-8') as file:
+            json.dump(pruned, file, ensure_ascii=False, indent=4)
+        print(f"Wrote {output_file}")
+
+if __name__ == "__main__":
+    main()
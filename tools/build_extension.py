@@ -2,15 +2,26 @@
 """
 Chrome拡張機能のビルドツール
 既存の命名規則に従ってZIPファイルを作成
+
+ZIPには編集用の translations.json の代わりに空白を除いたものを入れ、
+実行時辞書（sources/compiled/ の各表）と translations.json の内容の要約（manifest.json）を入れる
 """
 
 import zipfile
+import gzip
 import json
 import os
 import sys
+import time
 from pathlib import Path
 import shutil
 
+from compile_dictionary import COMPILED_FORMAT_VERSION, compile_dictionary, translations_digest
+from build_site_subsets import SITE_INDEX_FILE, SITES_DIR
+
+# 実行時辞書のシャード（content.js が読み込む順）
+COMPILED_SHARDS = ('literals', 'patterns')
+
 def load_manifest():
     """manifest.jsonからバージョン情報を取得"""
     manifest_path = Path('sources/manifest.json')
@@ -21,6 +32,107 @@ def load_manifest():
     with open(manifest_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
+def estimate_parse_time(data, repeat=5):
+    """JSONの解析時間の目安（json.loads の最短時間、ミリ秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        json.loads(data)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best * 1000
+
+def build_runtime_files(sources_dir='sources'):
+    """ZIPに入れる辞書ファイルを作成（sources からの相対パス → 内容のバイト列）
+
+    translations.json は空白を除き、実行時辞書のシャード（空白を除いて保存済み）はそのまま入れて、
+    translations.json の内容の要約を manifest.json に記録する
+    （ZIP自体が圧縮されるため、シャードを gzip で圧縮しても展開後にブラウザが読み込むサイズは変わらない）
+    サイト用の実行時辞書（build_site_subsets.py で生成）がある場合は、最新のものだけを一覧（sites.json）と一緒に入れる
+    """
+    sources_dir = Path(sources_dir)
+    files = {}
+
+    source = (sources_dir / 'translations.json').read_bytes()
+    translations = json.loads(source)
+    compact = json.dumps(translations, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    files['translations.json'] = compact
+    print("Runtime dictionary:")
+    print(f"  translations.json: {len(source) / 1024:.1f} KB -> {len(compact) / 1024:.1f} KB "
+          f"(parse {estimate_parse_time(source):.2f} ms -> {estimate_parse_time(compact):.2f} ms)")
+
+    # ページごとに読み込む辞書の比較（従来は translations.json をそのまま読み込んでいた。ZIPの形式では読み込まない）
+    # gzip のサイズは参考（配布するZIPでの圧縮後のサイズの目安）
+    baseline_gzip = len(gzip.compress(source, compresslevel=9, mtime=0))
+    baseline_parse = estimate_parse_time(source)
+    loaded_size = loaded_gzip = 0
+    loaded_parse = 0.0
+
+    for name in COMPILED_SHARDS:
+        data = (sources_dir / 'compiled' / f'{name}.json').read_bytes()
+        files[f'compiled/{name}.json'] = data
+        compressed_size = len(gzip.compress(data, compresslevel=9, mtime=0))
+        parse_time = estimate_parse_time(data)
+        print(f"  compiled/{name}.json: {len(data) / 1024:.1f} KB ({compressed_size / 1024:.1f} KB gzip, "
+              f"parse {parse_time:.2f} ms)")
+        loaded_size += len(data)
+        loaded_gzip += compressed_size
+        loaded_parse += parse_time
+    print(f"  Loaded per page: translations.json {len(source) / 1024:.1f} KB ({baseline_gzip / 1024:.1f} KB gzip, "
+          f"parse {baseline_parse:.2f} ms) -> compiled shards {loaded_size / 1024:.1f} KB "
+          f"({loaded_gzip / 1024:.1f} KB gzip, parse {loaded_parse:.2f} ms)")
+    print("  (parse times are estimated with Python json.loads)")
+
+    manifest = {
+        'version': COMPILED_FORMAT_VERSION,
+        'digest': translations_digest(sources_dir / 'translations.json'),
+    }
+    build_site_files(sources_dir / 'compiled', manifest['digest'], files)
+    files['compiled/manifest.json'] = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+    return files
+
+def build_site_files(compiled_dir, digest, files):
+    """最新のサイト用の実行時辞書と、それだけを載せた一覧（sites.json）を files に追加する
+
+    translations.json と異なる内容から生成されたもの（内容の要約 digest が違うもの）は入れない
+    """
+    index_path = compiled_dir / SITE_INDEX_FILE
+    if not index_path.exists():
+        return
+    index = json.loads(index_path.read_bytes())
+    if index.get('version') != COMPILED_FORMAT_VERSION or index.get('digest') != digest:
+        print(f"  Warning: {SITE_INDEX_FILE} is out of date, site dictionaries are not included "
+              f"(run build_site_subsets.py again)")
+        return
+
+    hosts = {}
+    for host, site in sorted(index['hosts'].items()):
+        data = (compiled_dir / SITES_DIR / site['file']).read_bytes()
+        if json.loads(data).get('digest') != digest:
+            print(f"  Warning: {SITES_DIR}/{site['file']} is out of date and is not included")
+            continue
+        files[f"compiled/{SITES_DIR}/{site['file']}"] = data
+        hosts[host] = site
+        print(f"  compiled/{SITES_DIR}/{site['file']}: {len(data) / 1024:.1f} KB ({site['keys']} keys)")
+    if hosts:
+        files[f'compiled/{SITE_INDEX_FILE}'] = json.dumps(dict(index, hosts=hosts), ensure_ascii=False,
+                                                          indent=2).encode('utf-8')
+
+def is_replaced_by_runtime_files(relative_path):
+    """ZIPでは build_runtime_files の出力に置き換えるファイル"""
+    return relative_path.as_posix() == 'translations.json' or relative_path.parts[0] == 'compiled'
+
+def package_runtime_files(extension_dir):
+    """sources をコピーした拡張機能のディレクトリの辞書ファイルをZIP用の形式に置き換える"""
+    extension_dir = Path(extension_dir)
+    runtime_files = build_runtime_files(extension_dir)
+    shutil.rmtree(extension_dir / 'compiled')
+    for relative_path, data in runtime_files.items():
+        path = extension_dir / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
 def create_extension_zip(output_dir='temp'):
     """拡張機能のZIPファイルを作成"""
     # manifest.jsonを読み込んでバージョンを取得
@@ -36,6 +148,11 @@ def create_extension_zip(output_dir='temp'):
     
     print(f"Building extension version {version}...")
     
+    # translations.json から実行時辞書（sources/compiled/）を生成
+    compile_dictionary('sources/translations.json', 'sources/compiled')
+    
+    runtime_files = build_runtime_files('sources')
+    
     # ZIPファイルを作成
     with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
         # sourcesディレクトリのすべてのファイルを追加
@@ -46,12 +163,20 @@ def create_extension_zip(output_dir='temp'):
             if file_path.is_file():
                 # ZIP内のパスを構築（Diablo_Translate/ファイル名）
                 relative_path = file_path.relative_to(sources_dir)
+                if is_replaced_by_runtime_files(relative_path):
+                    continue
                 arcname = f"{temp_dirname}/{relative_path}"
                 
                 zipf.write(file_path, arcname)
                 print(f"  Added: {relative_path}")
                 file_count += 1
         
+        # 辞書ファイルはZIP用の形式で追加
+        for relative_path, data in runtime_files.items():
+            zipf.writestr(f"{temp_dirname}/{relative_path}", data)
+            print(f"  Added: {relative_path}")
+            file_count += 1
+        
     # ファイルサイズを取得
     file_size = zip_path.stat().st_size / 1024  # KB
     
@@ -64,6 +189,11 @@ def create_extension_zip(output_dir='temp'):
 
 def main():
     """メイン処理"""
+    # create_release_zip.sh から、コピーした拡張機能のディレクトリの辞書ファイルだけを置き換える
+    if len(sys.argv) > 2 and sys.argv[1] == '--package-dir':
+        package_runtime_files(sys.argv[2])
+        return
+    
     if len(sys.argv) > 1:
         output_dir = sys.argv[1]
     else:
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+content.js のヒット記録（ポップアップの「記録を書き出す」で保存したJSON）から、
+サイトごとに実際に使われたキーだけの実行時辞書（sources/compiled/sites/）を生成するスクリプト
+
+サイト用の実行時辞書には、含まれないキー（cold）の単語フィルタを持たせる
+content.js はその単語を含まないテキストをサイト用の実行時辞書だけで変換し、
+含むテキストは全体の実行時辞書を必要になった時点で読み込んでから変換する
+"""
+
+import json
+import os
+import re
+import sys
+
+from compile_dictionary import (COMPILED_FORMAT_VERSION, DEMOTED_PATTERNS_FILE, build_tables, build_word_filter,
+                                choose_required_words, is_literal_key, load_demoted_patterns, load_translations,
+                                save_compiled, translations_digest)
+from dictionary_engine import fold_text, sorted_entries
+
+# ヒット記録の形式バージョン（content.js の HIT_PROFILE_VERSION と合わせる）
+PROFILE_FORMAT_VERSION = 2
+
+# サイト用の実行時辞書の一覧と、辞書を置くディレクトリ（実行時辞書のディレクトリからの相対パス）
+SITE_INDEX_FILE = 'sites.json'
+SITES_DIR = 'sites'
+
+# 置換後の文字列に含まれる単語（engine.js の単語フィルタと同じ区切り）
+WORD_TOKEN_RE = re.compile(r'[A-Za-z0-9_]+')
+
+def load_profiles(filenames):
+    """ヒット記録を読み込み、ホストごとに合算する
+
+    literals: キー（大文字小文字を同一視した形）→ 置換回数
+    patterns: 正規表現キー → {'attempts': 評価回数, 'hits': 置換回数, 'time': 処理時間（ミリ秒）}
+    automaton: オートマトンでの置換の {'attempts', 'time'}
+    """
+    hosts = {}
+    for filename in filenames:
+        with open(filename, 'r', encoding='utf-8') as file:
+            profile = json.load(file)
+        if profile.get('version') != PROFILE_FORMAT_VERSION:
+            raise ValueError(f"{filename}: unsupported profile version {profile.get('version')}")
+        for host, entry in profile.get('hosts', {}).items():
+            merged = hosts.setdefault(host, {'pages': 0, 'literals': {}, 'patterns': {},
+                                             'automaton': {'attempts': 0, 'time': 0.0}})
+            merged['pages'] += entry.get('pages', 0)
+            for key, count in entry.get('literals', {}).items():
+                merged['literals'][key] = merged['literals'].get(key, 0) + count
+            for key, cost in entry.get('patterns', {}).items():
+                total = merged['patterns'].setdefault(key, {'attempts': 0, 'hits': 0, 'time': 0.0})
+                for field in total:
+                    total[field] += cost.get(field, 0)
+            for field in merged['automaton']:
+                merged['automaton'][field] += entry.get('automaton', {}).get(field, 0)
+    return hosts
+
+def resolve_hits(translations, entry):
+    """ヒット記録のキーを translations.json のキーに対応付ける（キー → 回数、対応しないキーの数）
+
+    文字列キーは大文字小文字を同一視した形で記録されるため、同じ形になるキーのうち content.js で有効な
+    （先に適用される）キーに対応付ける
+    """
+    literal_keys = {}
+    for key, replacement in sorted_entries(translations):
+        if is_literal_key(key, replacement):
+            literal_keys.setdefault(fold_text(key), key)
+
+    hits = {}
+    unknown = 0
+    for folded, count in entry['literals'].items():
+        key = literal_keys.get(folded)
+        if key is None:
+            unknown += 1
+            continue
+        hits[key] = hits.get(key, 0) + count
+    # 置換結果を後のキーがさらに置換しうる文字列キーは、正規表現キーとして記録される
+    for key, cost in entry['patterns'].items():
+        if key not in translations:
+            unknown += 1
+            continue
+        if cost['hits'] > 0:
+            hits[key] = hits.get(key, 0) + cost['hits']
+    return hits, unknown
+
+def select_site_keys(translations, required, hits, min_hits):
+    """サイト用の実行時辞書に含めるキーを選ぶ
+
+    ヒット回数が min_hits 以上のキーに加え、サイト用の実行時辞書だけで変換しても全体と同じ結果になるように
+    次のキーを含める
+    - 正規表現キー（数が少なく、キャプチャで元のテキストの一部を置換後の文字列に残すため）
+    - 単語フィルタの単語を決められないキー
+    - 含めたキーと大文字小文字を同一視すると同じになるキー（content.js では先に適用されるキーだけが有効）
+    - 含めたキーの置換後の文字列に、単語フィルタの単語が現れるキー
+    required は choose_required_words で選んだキーごとの単語
+    """
+    selected = {key for key, count in hits.items() if count >= min_hits}
+    for key, replacement in translations.items():
+        if not is_literal_key(key, replacement) or required[key] is None:
+            selected.add(key)
+
+    while True:
+        folded = {fold_text(key) for key in selected}
+        words = set()
+        for key in selected:
+            words.update(word.lower() for word in WORD_TOKEN_RE.findall(translations[key]))
+        added = set()
+        for key, word in required.items():
+            if key in selected or word is None:
+                continue
+            if fold_text(key) in folded:
+                added.add(key)
+            elif word[1] and word[0] in words:
+                added.add(key)
+            elif not word[1] and any(token.startswith(word[0]) for token in words):
+                added.add(key)
+        if not added:
+            return selected
+        selected |= added
+
+def build_site_dictionary(translations, digest, required, host, selected, demoted=frozenset()):
+    """サイト用の実行時辞書
+
+    digest は translations.json 全体の内容の要約で、content.js と build_extension.py は translations.json と
+    異なる内容から生成されたサイト用の実行時辞書を使わない
+    """
+    # content.js の適用順（同じ長さのキーは元の順序）を保つため、元の順序のまま絞り込む
+    subset = {key: value for key, value in translations.items() if key in selected}
+    literals_table, patterns_table = build_tables(subset, digest, demoted)
+    return {
+        'version': COMPILED_FORMAT_VERSION,
+        'digest': digest,
+        'host': host,
+        'keys': len(subset),
+        'literals': literals_table,
+        'patterns': patterns_table,
+        'cold': build_word_filter(required[key] for key in translations if key not in selected),
+    }
+
+def build_site_subsets(profile_files, translations_file, output_dir, min_hits=1):
+    """ヒット記録から全ホストのサイト用の実行時辞書と一覧を生成して output_dir に保存"""
+    translations = load_translations(translations_file)
+    digest = translations_digest(translations_file)
+    hosts = load_profiles(profile_files)
+    if not hosts:
+        print("No hosts found in the profiles")
+        return
+
+    # 全体の実行時辞書と同じ単語を単語フィルタに使う
+    required = choose_required_words(translations)
+    demoted = load_demoted_patterns(DEMOTED_PATTERNS_FILE)
+    sites_dir = os.path.join(output_dir, SITES_DIR)
+    os.makedirs(sites_dir, exist_ok=True)
+    index = {
+        'version': COMPILED_FORMAT_VERSION,
+        'digest': digest,
+        'hosts': {},
+    }
+    for host, entry in sorted(hosts.items()):
+        hits, unknown = resolve_hits(translations, entry)
+        selected = select_site_keys(translations, required, hits, min_hits)
+        print(f"\n{host}: {entry['pages']} pages, {len(hits)} keys hit ({unknown} not in the dictionary)")
+        site = build_site_dictionary(translations, digest, required, host, selected, demoted)
+        print(f"  Site dictionary: {site['keys']} of {len(translations)} keys")
+        filename = f"{host}.json"
+        save_compiled(site, os.path.join(sites_dir, filename))
+        index['hosts'][host] = {'file': filename, 'keys': site['keys'], 'pages': entry['pages']}
+
+    with open(os.path.join(output_dir, SITE_INDEX_FILE), 'w', encoding='utf-8') as file:
+        json.dump(index, file, ensure_ascii=False, indent=2)
+    print(f"\nWrote {os.path.join(output_dir, SITE_INDEX_FILE)} ({len(index['hosts'])} hosts)")
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sources_dir = os.path.join(os.path.dirname(script_dir), 'sources')
+    translations_file = os.path.join(sources_dir, 'translations.json')
+    output_dir = os.path.join(sources_dir, 'compiled')
+
+    if len(sys.argv) < 2 or '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage: python build_site_subsets.py <profile.json> [profile.json ...] [options]")
+        print("\nOptions:")
+        print(f"  --translations <file>: Dictionary (default: {translations_file})")
+        print(f"  --output <dir>       : Compiled dictionary directory (default: {output_dir})")
+        print("  --min-hits <N>       : Keep keys replaced at least N times (default: 1)")
+        print("\nProfiles are exported from the popup after enabling hit recording.")
+        return
+
+    profile_files = []
+    min_hits = 1
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '--translations' and i + 1 < len(sys.argv):
+            translations_file = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--output' and i + 1 < len(sys.argv):
+            output_dir = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--min-hits' and i + 1 < len(sys.argv):
+            if not sys.argv[i + 1].isdigit() or int(sys.argv[i + 1]) < 1:
+                print(f"Error: --min-hits requires a positive integer (got {sys.argv[i + 1]})")
+                sys.exit(1)
+            min_hits = int(sys.argv[i + 1])
+            i += 2
+        else:
+            profile_files.append(sys.argv[i])
+            i += 1
+
+    for filename in [translations_file] + profile_files:
+        if not os.path.exists(filename):
+            print(f"Error: {filename} not found")
+            sys.exit(1)
+
+    try:
+        build_site_subsets(profile_files, translations_file, output_dir, min_hits)
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
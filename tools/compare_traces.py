@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+content.js の性能の記録（ポップアップの「性能の記録を書き出す」で保存したJSON）を集計・比較するスクリプト
+
+変換の種類（page: ページ全体、mutations: DOMの変更、deferred: 後回しにしたテキスト）ごとに
+回数と変換していた時間（work: メインスレッドのスライスとワーカーでの変換の合計）のパーセンタイル、
+経過時間（duration: スライスの間に譲った時間や表示領域の外をまとめて変換するまでの待ち時間を含む）の p95、
+ノード数、キャッシュのヒット率を表示する
+--baseline を指定すると、変更前の記録と work の p95 を比べ、しきい値を超えて遅くなった種類があれば終了コード 1 を返す
+"""
+
+import json
+import math
+import os
+import sys
+
+# 性能の記録の形式バージョン（content.js の PERF_TRACE_VERSION と合わせる）
+TRACE_FORMAT_VERSION = 2
+
+# 表示する変換の種類の順序
+PASS_TYPES = ['page', 'mutations', 'deferred']
+
+def load_traces(filenames):
+    """性能の記録を読み込み、すべての変換の記録を1つのリストにまとめる"""
+    passes = []
+    for filename in filenames:
+        with open(filename, 'r', encoding='utf-8') as file:
+            trace = json.load(file)
+        if trace.get('version') != TRACE_FORMAT_VERSION:
+            raise ValueError(f"{filename}: unsupported trace version {trace.get('version')}")
+        passes.extend(trace.get('passes', []))
+    return passes
+
+def percentile(values, p):
+    """最近傍順位法のパーセンタイル（ポップアップの表示と同じ）"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def summarize(passes):
+    """変換の種類 → {count, p50, p95, max, mean, elapsed_p95, nodes, hit_rate} を返す
+
+    p50、p95、max、mean は work（変換していた時間）、elapsed_p95 は duration（経過時間）の p95
+    hit_rate: キャッシュを引いた回数に対するヒットの割合（キャッシュを引いていない場合は None）
+    """
+    summary = {}
+    for pass_type in PASS_TYPES + sorted({entry['type'] for entry in passes} - set(PASS_TYPES)):
+        entries = [entry for entry in passes if entry['type'] == pass_type]
+        if not entries:
+            continue
+        times = [entry['work'] for entry in entries]
+        hits = sum(entry.get('cacheHits', 0) for entry in entries)
+        lookups = hits + sum(entry.get('cacheMisses', 0) for entry in entries)
+        summary[pass_type] = {
+            'count': len(entries),
+            'p50': percentile(times, 50),
+            'p95': percentile(times, 95),
+            'max': max(times),
+            'mean': sum(times) / len(times),
+            'elapsed_p95': percentile([entry['duration'] for entry in entries], 95),
+            'nodes': sum(entry.get('nodes', 0) for entry in entries),
+            'hit_rate': hits / lookups if lookups else None,
+        }
+    return summary
+
+def print_summary(summary):
+    for pass_type, stats in summary.items():
+        hit_rate = '-' if stats['hit_rate'] is None else f"{stats['hit_rate'] * 100:.1f}%"
+        print(f"  {pass_type:<10} {stats['count']:6d} passes  p50 {stats['p50']:8.2f} ms  "
+              f"p95 {stats['p95']:8.2f} ms  max {stats['max']:8.2f} ms  mean {stats['mean']:8.2f} ms  "
+              f"elapsed p95 {stats['elapsed_p95']:8.2f} ms  {stats['nodes']:8d} nodes  cache {hit_rate}")
+
+def compare_summaries(baseline, current, threshold):
+    """work の p95 が baseline より threshold パーセントを超えて長くなった種類を返す"""
+    regressions = []
+    print("\nComparison with baseline (work p95):")
+    for pass_type, stats in current.items():
+        if pass_type not in baseline:
+            print(f"  {pass_type:<10} not in baseline")
+            continue
+        before = baseline[pass_type]['p95']
+        after = stats['p95']
+        change = (after - before) * 100 / before if before > 0 else 0.0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(pass_type)
+        print(f"  {pass_type:<10} {before:8.2f} ms -> {after:8.2f} ms ({change:+.1f}%)"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def main():
+    if len(sys.argv) < 2 or '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage: python compare_traces.py <trace.json> [trace.json ...] [options]")
+        print("\nOptions:")
+        print("  --baseline <file>    : Trace to compare against (can be given more than once)")
+        print("  --threshold <percent>: Report a regression when the work p95 grows by more than this (default: 20)")
+        print("\nTraces are exported from the popup with the performance export button.")
+        return
+
+    trace_files = []
+    baseline_files = []
+    threshold = 20.0
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '--baseline' and i + 1 < len(sys.argv):
+            baseline_files.append(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--threshold' and i + 1 < len(sys.argv):
+            try:
+                threshold = float(sys.argv[i + 1])
+            except ValueError:
+                print(f"Error: --threshold requires a number (got {sys.argv[i + 1]})")
+                sys.exit(1)
+            i += 2
+        else:
+            trace_files.append(sys.argv[i])
+            i += 1
+
+    if not trace_files:
+        print("Error: no trace files given")
+        sys.exit(1)
+    for filename in trace_files + baseline_files:
+        if not os.path.exists(filename):
+            print(f"Error: {filename} not found")
+            sys.exit(1)
+
+    try:
+        current = summarize(load_traces(trace_files))
+        baseline = summarize(load_traces(baseline_files)) if baseline_files else None
+    except (ValueError, KeyError) as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+
+    print(f"Loaded {len(trace_files)} traces")
+    print_summary(current)
+    if baseline is None:
+        return
+
+    print(f"\nBaseline: {len(baseline_files)} traces")
+    print_summary(baseline)
+    regressions = compare_summaries(baseline, current, threshold)
+    if regressions:
+        print(f"\nWork p95 regressed by more than {threshold:g}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
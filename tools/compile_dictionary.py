@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+translations.json から content.js 用の実行時辞書を生成するスクリプト
+正規表現の記号を含まないキーは完全一致表と Aho-Corasick オートマトンのキー（literals.json）にまとめ、
+ページ上のテキストを1回の引き当て・走査で変換できるようにする
+（オートマトン自体は状態数がキーの文字数ほどになり、JSONにすると translations.json より大きくなるため、
+キーの一覧だけを書き出し、engine.js が読み込み時に構築する）
+それ以外のキーは正規表現として評価する小さな表（patterns.json）に分け、
+数値だけが変わるキーはテキストの数値を置き換えて引ける索引にする
+どちらの表にも、キーに一致するテキストに必ず含まれる単語の一覧（単語フィルタ）を持たせ、
+どのキーの単語も含まないテキストは照合せずに済ませる
+profile_patterns.py で降格した正規表現キーには必ず含まれる単語を添え、その単語を含むテキストだけで評価する
+"""
+
+import json
+import os
+import re
+import sys
+
+# キーの解釈と照合は content.js と同じ処理を再現した dictionary_engine.py を使う
+from dictionary_engine import (COMPILED_FORMAT_VERSION, TEMPLATE_SLOT, WORD_TOKEN_RE, CompiledEngine, TemplateLookup,
+                               compile_key, fold_text, literal_keys, literal_word_table, required_literal, required_words,
+                               sorted_entries, text_digest)
+
+# 正規表現として解釈される記号（これらを含まないキーはそのままの文字列として扱える）
+REGEX_META_RE = re.compile(r'[\\^$.|?*+()\[\]{}]')
+# 正規表現の \b で単語の一部とみなされる文字
+WORD_CHAR_RE = re.compile(r'[A-Za-z0-9_]')
+# 完全一致表の検証でキーの前後に付ける空白
+EXACT_PADDINGS = ('', ' ', '\n', '  ', '\n  ', ' \u00a0\t\n')
+
+# 数値テンプレートのスロットとして扱う正規表現
+# （convert_stringlist_to_translations.py が {VALUE} から生成する形式と、以前の版の形式）
+NUMBER_SLOT_SOURCES = (
+    r'([+-]?\d{1,3}(?:,\d{3})*(?:\.\d+)?|\.\d+)',
+    r'(([+-]?\d{1,3}(,\d{3})*(\.\d+)?|\.\d+))',
+    r'(\d+)',
+)
+NUMBER_SLOT_RE = re.compile('|'.join(re.escape(source) for source in NUMBER_SLOT_SOURCES))
+# 数値テンプレートの検証でスロットに入れる値と前後の空白
+TEMPLATE_SAMPLE_VALUES = ('7', '+15', '-3', '2.5', '.5', '1,234')
+TEMPLATE_PADDINGS = ('', ' \n')
+
+# profile_patterns.py が書き出す、降格する正規表現キーの一覧（あれば使う）
+DEMOTED_PATTERNS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'demoted_patterns.json')
+
+def load_translations(filename):
+    """translations.json を読み込む"""
+    with open(filename, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def translations_digest(filename):
+    """translations.json の内容の要約（content.js が読み込んだテキストから求めるものと同じ）"""
+    with open(filename, 'r', encoding='utf-8-sig', newline='') as file:
+        return text_digest(file.read())
+
+def save_compiled(data, filename):
+    """実行時辞書を空白なしのJSONで保存"""
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False, separators=(',', ':'))
+    size = os.path.getsize(filename) / 1024
+    print(f"  Wrote {filename} ({size:.1f} KB)")
+
+def is_literal_key(key, replacement):
+    """正規表現として評価しなくても content.js と同じ結果になるキーかどうか"""
+    if not key or REGEX_META_RE.search(key):
+        return False
+    # 置換文字列中の $ は String.prototype.replace で特別扱いされる
+    if '$' in replacement:
+        return False
+    # content.js はUTF-16単位で走査するため、サロゲートペアを含むキーは正規表現のまま扱う
+    if any(ord(char) > 0xFFFF for char in key):
+        return False
+    return True
+
+def overlaps_text(key, text):
+    """key（大文字小文字を同一視した形）が、text を含むテキストで text と重なる位置に一致しうるか
+
+    key が text に含まれる、text を含む、または key の先頭が text の末尾か key の末尾が text の先頭と重なる
+    """
+    if key in text or text in key:
+        return True
+    return any(text.endswith(key[:size]) or text.startswith(key[-size:]) for size in range(1, min(len(key), len(text))))
+
+def find_cascading_keys(translations):
+    """置換結果を、後から適用される文字列キーがさらに置換しうる文字列キーの集合
+
+    オートマトンは元のテキストを1回走査して重ならないマッチだけを置換するため、置換結果を後のキーが
+    さらに置換する従来の動作（"Season Amulet" → "Season Amulet" のあとに "Amulet" を置換するなど）を再現できない
+    後のキーの単語は \\b で区切られるためテキストの単語全体と一致し、置換結果に新たに一致するなら置換後の文字列と重なる
+    置換後の文字列とその単語を共有し、重なりうる後のキーがあれば、正規表現キーとして適用順の位置で評価する
+    """
+    cascading = set()
+    # 後から適用される文字列キー（大文字小文字を同一視した形）の単語 → キーの一覧
+    later_keys = {}
+    for key, replacement in reversed(sorted_entries(translations)):
+        if not is_literal_key(key, replacement):
+            continue
+        folded = fold_text(replacement)
+        words = {word.lower() for word in WORD_TOKEN_RE.findall(replacement)}
+        if any(overlaps_text(later, folded) for word in words for later in later_keys.get(word, ())):
+            cascading.add(key)
+        folded_key = fold_text(key)
+        for word in {word.lower() for word in WORD_TOKEN_RE.findall(key)}:
+            later_keys.setdefault(word, []).append(folded_key)
+    return cascading
+
+def split_literal_entries(translations, cascading=frozenset()):
+    """文字列として扱えるエントリとそれ以外（正規表現）に分ける（cascading のキーは正規表現として扱う）
+
+    正規表現のエントリには、それより先に適用されるオートマトンのキー数を添える
+    （content.js は正規表現キーの前後でオートマトンのキーを分けて適用し、従来の適用順を保つ）
+    """
+    literals = []
+    patterns = []
+    folded_keys = set()
+    for key, replacement in sorted_entries(translations):
+        if is_literal_key(key, replacement) and key not in cascading:
+            literals.append((key, replacement))
+            folded_keys.add(fold_text(key))
+        else:
+            patterns.append((key, replacement, len(folded_keys)))
+    return literals, patterns
+
+def build_exact_table(translations, cascading=frozenset()):
+    """テキストノード全体（前後の空白を除く）が1つの文字列キーと一致する場合に引く完全一致表
+
+    content.js の適用順で置換しても結果が変わらないキーだけを含める
+    - キーの先頭と末尾が単語構成文字（テキスト全体と一致したときに \\b が成り立つ）
+    - 置換後の文字列に単語構成文字がなく（\\b が存在しないため、後から適用する文字列キーは一致しない）、
+      どの正規表現キーにも一致しない
+    - 先に適用される正規表現キーがテキストに一致しない
+    cascading のキーは split_literal_entries と同じく正規表現キーとして扱う
+    戻り値はオートマトンのキー番号の一覧と、その中で長さに上限があるキーの [キー番号, 上限] の一覧
+    （この長さ以上のテキストには使えない。キー自体は literals.json の keys から引く）
+    先に適用される正規表現キーのうち前後に空白を付けたキーに一致しうるものがあれば、
+    そのキーの長さ（これより短いテキストでは長さフィルタで評価されない）を上限にする
+    """
+    # [パターン, 一致するテキストに必ず含まれる文字列]
+    all_patterns = []
+    for key, replacement in sorted_entries(translations):
+        if not is_literal_key(key, replacement) or key in cascading:
+            pattern = compile_key(key, replacement)
+            all_patterns.append((pattern, required_literal(pattern['regex'])))
+
+    def matches_any(patterns, text):
+        folded = text.casefold()
+        return any(required in folded and pattern['regex'].search(padding + text + padding)
+                   for pattern, required in patterns for padding in EXACT_PADDINGS)
+
+    folded_keys = set()
+    earlier_patterns = []
+    exact = []
+    limits = []
+    for key, replacement in sorted_entries(translations):
+        if not is_literal_key(key, replacement) or key in cascading:
+            earlier_patterns.append(all_patterns[len(earlier_patterns)])
+            continue
+        folded = fold_text(key)
+        if folded in folded_keys:
+            continue
+        # literal_keys と同じ番号（大文字小文字を同一視して重複を除いた順）
+        key_index = len(folded_keys)
+        folded_keys.add(folded)
+
+        if not (WORD_CHAR_RE.match(key[0]) and WORD_CHAR_RE.match(key[-1])):
+            continue
+        if WORD_CHAR_RE.search(replacement) or matches_any(all_patterns, replacement):
+            continue
+        limit = None
+        for pattern, required in earlier_patterns:
+            if limit is not None and pattern['minLength'] >= limit:
+                continue
+            if matches_any([(pattern, required)], key):
+                limit = pattern['minLength']
+        if limit is not None and limit <= len(key):
+            continue
+        exact.append(key_index)
+        if limit is not None:
+            limits.append([key_index, limit])
+    return exact, limits
+
+def template_signature(key):
+    """数値スロット以外が文字列だけのキーから数値テンプレートの索引のキーを作る（テンプレートにできない場合はNone）"""
+    parts = NUMBER_SLOT_RE.split(key)
+    if len(parts) < 2:
+        return None
+    for part in parts:
+        if REGEX_META_RE.search(part) or re.search(r'[0-9]', part):
+            return None
+    return TEMPLATE_SLOT.join(fold_text(part) for part in parts)
+
+def verify_template(engine, pattern):
+    """テキスト全体がテンプレートと一致したとき、そのキーだけを適用した結果がすべてのキーを適用した結果と同じか
+
+    いくつかの数値と前後の空白の組み合わせで確かめる
+    """
+    parts = NUMBER_SLOT_RE.split(pattern['key'])
+    verified = False
+    for offset in range(len(TEMPLATE_SAMPLE_VALUES)):
+        values = [TEMPLATE_SAMPLE_VALUES[(offset + i) % len(TEMPLATE_SAMPLE_VALUES)] for i in range(len(parts) - 1)]
+        core = parts[0] + ''.join(value + part for value, part in zip(values, parts[1:]))
+        for padding in TEMPLATE_PADDINGS:
+            text = padding + core + padding
+            result = TemplateLookup.apply(pattern, text, padding, core)
+            if result is None:
+                # content.js はこの場合は通常の処理に戻る
+                continue
+            if result != engine.translate(text):
+                return False
+            verified = True
+    return verified
+
+def build_template_index(translations, literals_table, patterns_table):
+    """数値テンプレートの索引（索引のキー → patterns.json のパターン番号）
+
+    同じ索引のキーになるキーが複数ある場合は、先に適用されるキーを使う
+    """
+    # 索引を使わない処理で検証する
+    engine = CompiledEngine(literals_table, patterns_table, literals_table['digest'])
+    templates = {}
+    for index, pattern in enumerate(engine.patterns):
+        signature = template_signature(pattern['key'])
+        if signature is None or signature in templates:
+            continue
+        if verify_template(engine, pattern):
+            templates[signature] = index
+    return templates
+
+def choose_required_words(keys):
+    """キーごとに単語フィルタで使う単語を選ぶ（キー → (単語, 単語全体か)、決められないキーはNone）
+
+    一致するテキストに必ず含まれる単語のうち、単語全体になるものを優先し、
+    その中でも他のキーに現れることが少ない（ページ上のテキストに現れにくい）ものを選ぶ
+    """
+    candidates = {key: required_words(key) for key in keys}
+    frequency = {}
+    for words in candidates.values():
+        for word in set(words):
+            frequency[word] = frequency.get(word, 0) + 1
+
+    chosen = {}
+    for key, words in candidates.items():
+        whole = [word for word in words if word[1]]
+        chosen[key] = min(whole or words, key=lambda word: (frequency[word], -len(word[0]))) if words else None
+    return chosen
+
+def build_word_filter(required):
+    """キーに一致するテキストに必ず含まれる単語の一覧（単語フィルタ）
+
+    required は choose_required_words で選んだキーごとの単語
+    words: テキストの単語（小文字）と一致するもの、prefixes: テキストの単語の先頭と一致するもの
+    単語を決められないキーがあれば、どのテキストも除外できないためNoneを返す
+    """
+    words = set()
+    prefixes = set()
+    for word in required:
+        if word is None:
+            return None
+        (words if word[1] else prefixes).add(word[0])
+    return {'words': sorted(words), 'prefixes': sorted(prefixes)}
+
+def literal_word_positions(literals, required):
+    """オートマトンのキー番号ごとに、単語フィルタの単語がキーの何番目の単語か（literals.json の wordPositions）
+
+    文字列キーに一致するテキストにはキーの単語がすべて単語全体として含まれるため、単語の代わりに位置だけを保存する
+    単語を決められないキーがあればNone
+    """
+    positions = []
+    seen = set()
+    for key, _ in literals:
+        folded = fold_text(key)
+        if folded in seen:
+            continue
+        seen.add(folded)
+        if required[key] is None:
+            return None
+        positions.append([word.lower() for word in WORD_TOKEN_RE.findall(folded)].index(required[key][0]))
+    return positions
+
+def load_demoted_patterns(filename):
+    """profile_patterns.py が書き出した降格する正規表現キーの一覧を読み込む（ファイルがなければ空）"""
+    if not filename or not os.path.exists(filename):
+        return set()
+    with open(filename, 'r', encoding='utf-8') as file:
+        return set(json.load(file)['patterns'])
+
+def build_tables(translations, digest, demoted=frozenset()):
+    """実行時辞書の2つの表（literals.json と patterns.json の内容）を作る
+
+    digest は content.js が translations.json と同じ内容から生成されたかを確かめる translations.json の内容の要約
+    （translations の一部から作る場合も translations.json 全体の要約を指定する）
+    demoted の正規表現キーと、置換結果を後のキーがさらに置換しうる文字列キー（find_cascading_keys）には、
+    必ず含まれる単語（content.js はその単語を含むテキストだけで評価する）を添える
+    """
+    cascading = find_cascading_keys(translations)
+    literals, patterns = split_literal_entries(translations, cascading)
+    required = choose_required_words(translations)
+    gated = 0
+    for index, (key, replacement, literals_before) in enumerate(patterns):
+        if (key in demoted or key in cascading) and required[key] is not None:
+            patterns[index] = (key, replacement, literals_before, required[key][0])
+            gated += key in demoted
+
+    keys, replacements = literal_keys(literals)
+    exact, exact_limits = build_exact_table(translations, cascading)
+    print(f"  Literal keys: {len(literals)} ({len(keys)} after case folding), {len(exact)} exact-match entries, "
+          f"{len(cascading)} evaluated as regex keys (replacement rewritten by a later key)")
+
+    # 文字列キーの表（オートマトンのキーと完全一致表）
+    # keys: オートマトンのキー（大文字小文字を同一視した形、キー番号順）、replacements: キー番号ごとの置換後の文字列
+    # exactExcluded: 完全一致表に入れないキー番号（ほとんどのキーは入るため、入れないものを記録する）
+    # exactLimits: 完全一致表のキーのうち長さに上限があるキーの [キー番号, 上限]
+    # wordPositions: キー番号ごとの単語フィルタの単語の位置（literal_word_positions）
+    literals_table = {
+        'version': COMPILED_FORMAT_VERSION,
+        'digest': digest,
+        'keys': keys,
+        'replacements': replacements,
+        'exactExcluded': sorted(set(range(len(keys))) - set(exact)),
+        'exactLimits': exact_limits,
+        'wordPositions': literal_word_positions(literals, required),
+    }
+    # オートマトンで扱えず、正規表現として評価するキー
+    # [キー, 置換後の文字列, その前に適用するオートマトンのキー数(, 降格したキーが必ず含む単語)]
+    patterns_table = {
+        'version': COMPILED_FORMAT_VERSION,
+        'digest': digest,
+        'patterns': [list(entry) for entry in patterns],
+        'words': build_word_filter(required[entry[0]] for entry in patterns),
+    }
+    patterns_table['templates'] = build_template_index(translations, literals_table, patterns_table)
+    print(f"  Regex keys: {len(patterns)} ({len(patterns_table['templates'])} numeric templates, {gated} demoted)")
+    literal_words = literal_word_table(literals_table)
+    if literal_words is None or patterns_table['words'] is None:
+        print("  Word filter: disabled (some keys have no required word)")
+    else:
+        words = set(literal_words['words']) | set(patterns_table['words']['words'])
+        prefixes = set(patterns_table['words']['prefixes'])
+        print(f"  Word filter: {len(words)} words, {len(prefixes)} prefixes")
+    return literals_table, patterns_table
+
+def compile_dictionary(translations_file, output_dir, demoted_file=DEMOTED_PATTERNS_FILE):
+    """translations.json から実行時辞書を生成して output_dir に保存"""
+    print(f"Compiling {translations_file}...")
+    translations = load_translations(translations_file)
+    demoted = load_demoted_patterns(demoted_file)
+    if demoted:
+        print(f"  Demoted patterns: {len(demoted & set(translations))} of {len(demoted)} listed in {demoted_file}")
+    literals_table, patterns_table = build_tables(translations, translations_digest(translations_file), demoted)
+
+    os.makedirs(output_dir, exist_ok=True)
+    save_compiled(literals_table, os.path.join(output_dir, 'literals.json'))
+    save_compiled(patterns_table, os.path.join(output_dir, 'patterns.json'))
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sources_dir = os.path.join(os.path.dirname(script_dir), 'sources')
+
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage: python compile_dictionary.py [translations.json] [output_dir] [--demoted <file>]")
+        print(f"\nDefaults: {os.path.join(sources_dir, 'translations.json')} -> {os.path.join(sources_dir, 'compiled')}")
+        print(f"Demoted patterns: {DEMOTED_PATTERNS_FILE} (written by profile_patterns.py, used if present)")
+        return
+
+    demoted_file = DEMOTED_PATTERNS_FILE
+    args = []
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '--demoted' and i + 1 < len(sys.argv):
+            demoted_file = sys.argv[i + 1]
+            i += 2
+        else:
+            args.append(sys.argv[i])
+            i += 1
+
+    translations_file = args[0] if len(args) > 0 else os.path.join(sources_dir, 'translations.json')
+    output_dir = args[1] if len(args) > 1 else os.path.join(sources_dir, 'compiled')
+
+    if not os.path.exists(translations_file):
+        print(f"Error: {translations_file} not found")
+        sys.exit(1)
+
+    try:
+        compile_dictionary(translations_file, output_dir, demoted_file)
+    except ValueError as error:
+        # content.js でも new RegExp が失敗するキー
+        print(f"Error: {error}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,107 @@ Diablo IVの各シーズンのStringListファイルに対応
 import json
 import sys
 import re
-from collections import OrderedDict
+import time
+import hashlib
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 import os
+from compile_dictionary import is_literal_key
+from validate_patterns import load_json_checked, print_validation_report, validate_translations
+
+try:
+    import resource
+except ImportError:  # Windowsでは利用不可
+    resource = None
+
+# ストリーミング読み込み時に一度に読み込む文字数
+STREAM_CHUNK_SIZE = 1 << 20
+
+# 並列抽出時のワーカーあたりのシャード数（負荷の偏りを均すため多めに分割）
+SHARDS_PER_JOB = 4
+
+# セクション単位の抽出結果キャッシュのファイル名
+SECTION_CACHE_FILE = 'sections.json'
+
+# 抽出対象となるセクション（.stl）のパターン
+ATTRIBUTE_SECTION = 'AttributeDescriptions.stl'
+
+ITEM_PATTERNS = [
+    r'^ItemType_.*\.stl$',
+    r'^Item_.*_Unique.*\.stl$',
+    r'^Item_.*_Legendary.*\.stl$',
+    r'^Item_Rune_.*\.stl$'
+]
+
+POWER_PATTERNS = [
+    r'^Power_.*\.stl$',
+    r'^Affix_legendary_.*\.stl$',
+    r'^Affix_S05_BSK_.*\.stl$',
+    r'^Affix_x1_legendary_.*\.stl$',
+    r'^CollectiblePower_.*\.stl$'
+]
+
+SKILL_PATTERNS = [
+    r'^Skill_.*\.stl$',
+    r'^SkillTagNames\.stl$'
+]
+
+# セクションのカテゴリ（抽出結果のマージもこの順で行う）
+# 新しいカテゴリはここにパターンを、SECTION_EXTRACTORS に抽出関数を追加する
+SECTION_CATEGORIES = OrderedDict([
+    ('attribute', [r'^' + re.escape(ATTRIBUTE_SECTION) + '$']),
+    ('item', ITEM_PATTERNS),
+    ('power', POWER_PATTERNS),
+    ('skill', SKILL_PATTERNS),
+])
+
+CATEGORY_LABELS = {
+    'attribute': 'attribute',
+    'item': 'item',
+    'power': 'power/aspect',
+    'skill': 'skill',
+}
+
+# 全カテゴリのパターンを1つにまとめ、キーごとに1回のマッチでカテゴリを判定する
+SECTION_ROUTER = re.compile('|'.join(
+    f"(?P<{category}>{'|'.join(patterns)})" for category, patterns in SECTION_CATEGORIES.items()
+))
+
+# ストリーミング読み込み用のトークン
+JSON_STRING_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+JSON_SKIP_RE = re.compile(r'[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*', re.DOTALL)
+JSON_SCALAR_RE = re.compile(r'[^\s,}\]]+')
+JSON_OPEN_RE = re.compile(r'\s*\{\s*')
+JSON_ENTRY_RE = re.compile(r'\s*("[^"\\]*(?:\\.[^"\\]*)*")\s*:\s*', re.DOTALL)
+JSON_SEPARATOR_RE = re.compile(r'\s*([,}])')
+
+# ゲーム内マークアップのトークン
+# 1回の走査で clean_value・is_usable_translation・create_regex_pattern に必要な情報をすべて集める
+COLOR_TAG_PATTERN = r'''
+    (?P<open>\{c_\w+\})
+  | (?P<close_named>\{/c_\w+\})
+  | (?P<close>\{/c\})
+  | (?P<open_hex>\{c:[0-9A-Fa-f]{6,8}\})
+  | (?P<close_hex>\{/c:[0-9A-Fa-f]{6,8}\})
+'''
+COLOR_TAG_RE = re.compile(COLOR_TAG_PATTERN, re.VERBOSE)
+MARKUP_TOKEN_RE = re.compile(r'''
+    (?P<value>\{VALUE\d*%?\})
+  | (?P<string>\{s\d+\})
+  | \[(?P<range>[^\]\n]*)\]
+  | ''' + COLOR_TAG_PATTERN + r'''
+  | (?P<tag>\{(?:c_|/|icon:|VALUE|vALUE|Value))
+  | (?P<newline>\n)
+  | (?P<special>[\\()|[\]{}+*?^$.])
+''', re.VERBOSE)
+SPECIAL_CHAR_RE = re.compile(r'[\\()|[\]{}+*?^$.]')
+
+# 変換キーとして使用不可とするタグ（is_usable_translation の判定対象）
+UNUSABLE_TAGS = ['{c_', '{/c}', '{icon:', '{/', '{VALUE', '{vALUE', '{Value']
+UNUSABLE_TAG_KINDS = {'value', 'open', 'close_named', 'close', 'close_hex', 'tag'}
+
+MarkupScan = namedtuple('MarkupScan', ['cleaned', 'placeholders', 'usable'])
 
 def load_json(filename):
     """JSONファイルを読み込む"""
@@ -16,6 +115,137 @@ def load_json(filename):
     with open(filename, 'r', encoding='utf-8') as file:
         return json.load(file)
 
+def classify_section(key):
+    """セクション名からカテゴリを判定（対象外の場合はNone）"""
+    match = SECTION_ROUTER.match(key)
+    return match.lastgroup if match else None
+
+def is_target_section(key):
+    """抽出処理で参照するセクションかどうか"""
+    return SECTION_ROUTER.match(key) is not None
+
+def get_peak_rss_mb():
+    """プロセスのピークRSS（MB）を取得（取得できない環境ではNone）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linuxはキロバイト、macOSはバイト単位
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def iter_json_sections(filename, section_filter, chunk_size=STREAM_CHUNK_SIZE):
+    """トップレベルのJSONオブジェクトを逐次読み込み、(キー, 値) を返す
+
+    section_filter が False を返すセクションは値のPythonオブジェクトを構築せず読み飛ばす
+    """
+    with open(filename, 'r', encoding='utf-8') as file:
+        buf = ''
+        pos = 0
+        eof = False
+
+        def fill(keep):
+            """buf[keep:] を残して続きを読み込む（読み込めなければFalse）"""
+            nonlocal buf, pos, eof
+            if eof:
+                return False
+            chunk = file.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            # 処理済みの部分は捨ててメモリを抑える
+            buf = buf[keep:] + chunk
+            pos -= keep
+            return True
+
+        def match_complete(pattern):
+            """バッファ末尾で途切れないよう必要に応じて読み足しながらマッチする"""
+            while True:
+                match = pattern.match(buf, pos)
+                if (match and match.end() < len(buf)) or not fill(pos):
+                    return match
+
+        match = match_complete(JSON_OPEN_RE)
+        if not match:
+            raise ValueError(f"{filename}: expected top-level object")
+        pos = match.end()
+        if buf.startswith('}', pos):
+            return
+
+        while True:
+            match = match_complete(JSON_ENTRY_RE)
+            if not match:
+                raise ValueError(f"{filename}: expected key at offset {pos}")
+            raw_key = match.group(1)
+            key = json.loads(raw_key) if '\\' in raw_key else raw_key[1:-1]
+            pos = start = match.end()
+            wanted = section_filter(key)
+
+            if buf[pos] in '{[':
+                depth = 0
+                while True:
+                    # 文字列と構造記号以外の部分はまとめて読み飛ばす
+                    pos = JSON_SKIP_RE.match(buf, pos).end()
+                    if pos >= len(buf) or buf[pos] == '"':
+                        # バッファ末尾、または途中で切れた文字列
+                        # 読み飛ばすセクションは走査済みの部分を残さない
+                        keep = start if wanted else pos
+                        if not fill(keep):
+                            raise ValueError(f"{filename}: unexpected end of file")
+                        start -= keep
+                        continue
+                    char = buf[pos]
+                    pos += 1
+                    if char in '{[':
+                        depth += 1
+                    else:
+                        depth -= 1
+                        if depth == 0:
+                            break
+            else:
+                scalar_re = JSON_STRING_RE if buf[pos] == '"' else JSON_SCALAR_RE
+                match = match_complete(scalar_re)
+                if not match:
+                    raise ValueError(f"{filename}: invalid value at offset {pos}")
+                start = match.start()
+                pos = match.end()
+
+            if wanted:
+                yield key, json.loads(buf[start:pos])
+
+            match = match_complete(JSON_SEPARATOR_RE)
+            if not match:
+                raise ValueError(f"{filename}: expected ',' or '}}' at offset {pos}")
+            pos = match.end()
+            if match.group(1) == '}':
+                return
+
+def load_stringlist(filename, streaming=True):
+    """StringListファイルを読み込み、解析時間とピークRSSの増加量を表示する
+
+    streaming が True の場合は抽出対象のセクションのみを構築する
+    ピークRSSはプロセス全体の最大値のため、読み込み前からの増加量をこのファイルの分として表示する
+    （先に読み込んだファイルのデータを保持したままでも、そのファイルの分は含まれない）
+    """
+    print(f"Loading {filename}...")
+    peak_before = get_peak_rss_mb()
+    start_time = time.perf_counter()
+    if streaming:
+        data = dict(iter_json_sections(filename, is_target_section))
+    else:
+        with open(filename, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    elapsed = time.perf_counter() - start_time
+
+    peak_after = get_peak_rss_mb()
+    if peak_after is not None:
+        peak_text = f"+{peak_after - peak_before:.1f} MB, process peak {peak_after:.1f} MB"
+    else:
+        peak_text = "n/a"
+    mode = "streaming" if streaming else "full"
+    print(f"  Parsed {os.path.basename(filename)}: {len(data)} sections in {elapsed:.2f}s ({mode}, peak RSS {peak_text})")
+    return data
+
 def save_json(data, filename):
     """辞書をJSONファイルとして保存（キーの長さ順にソート）"""
     # キーの長さで降順ソート（長いキーを優先）、同じ長さはアルファベット順
@@ -25,23 +255,123 @@ def save_json(data, filename):
         json.dump(sorted_data, file, ensure_ascii=False, indent=4)
     print(f"Saved {len(sorted_data)} translations to {filename}")
 
-def is_usable_translation(key, value):
-    """変換が実際に使用可能かチェック"""
-    # 改行を含む場合は除外（HTMLでは分割される）
-    if '\r\n' in key:
-        return False
+@lru_cache(maxsize=None)
+def scan_markup(text):
+    """マークアップを1回だけ走査し、クリーニング後の文字列・プレースホルダー・キーとしての使用可否を返す
+
+    同じ文字列は各セクションで何度も現れるため結果をキャッシュする
+    """
+    tokens = []  # (種類, 開始位置, 終了位置, 行番号)
+    placeholders = []
+    line = 0
+    specials = 0
+    has_crlf = False
+    has_tag = False
+    has_hex = False
+    
+    for match in MARKUP_TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'special':
+            specials += 1
+            continue
+        if kind == 'newline':
+            if match.start() > 0 and text[match.start() - 1] == '\r':
+                has_crlf = True
+            line += 1
+            continue
+        
+        # 1文字の特殊記号以外は { } または [ ] の2文字を含む
+        specials += 1 if kind == 'tag' else 2
+        has_tag = has_tag or kind in UNUSABLE_TAG_KINDS
+        if kind in ('value', 'string'):
+            placeholders.append('')
+        elif kind == 'range':
+            body = match.group('range')
+            placeholders.append(body)
+            specials += len(SPECIAL_CHAR_RE.findall(body))
+            if '{' in body:
+                # [...] の内側にあるカラータグもクリーニングの対象
+                for inner in COLOR_TAG_RE.finditer(text, match.start('range'), match.end('range')):
+                    has_tag = has_tag or inner.lastgroup in UNUSABLE_TAG_KINDS
+                    has_hex = has_hex or inner.lastgroup == 'open_hex'
+                    tokens.append((inner.lastgroup, inner.start(), inner.end(), line))
+                has_tag = has_tag or any(tag in body for tag in UNUSABLE_TAGS)
+        elif kind != 'tag':
+            has_hex = has_hex or kind == 'open_hex'
+            tokens.append((kind, match.start(), match.end(), line))
+    
+    removed = remove_color_tags(tokens, has_hex)
+    if removed:
+        parts = []
+        last = 0
+        for start, end in removed:
+            parts.append(text[last:start])
+            last = end
+        parts.append(text[last:])
+        cleaned = ''.join(parts).strip()
+        if '{c' in cleaned or '{/c' in cleaned:
+            # タグの除去で新たにタグが組み上がる可能性がある場合は順次置換で確定する
+            cleaned = clean_color_tags_sequential(text)
+    else:
+        cleaned = text.strip()
     
-    # ゲーム固有のフォーマットタグを含む場合は除外
-    if any(tag in key for tag in ['{c_', '{/c}', '{icon:', '{/', '{VALUE', '{vALUE', '{Value']):
-        return False
+    usable = not has_crlf and not has_tag and len(text) < 200 and specials <= 10
+    return MarkupScan(cleaned, tuple(placeholders), usable)
+
+def remove_color_tags(tokens, has_hex):
+    """除去するカラータグの (開始位置, 終了位置) を位置順に返す
+
+    従来の clean_value と同じ結果になるよう、re.sub を順に適用した場合の対応付けを再現する
+    （(.*?) は改行をまたがないため、同じ行のタグ同士だけが対になる）
+    """
+    if not has_hex:
+        # {c:RRGGBB} がなければ {c_*}・{/c_*}・{/c} をすべて除去するだけ
+        return [(start, end) for kind, start, end, line in tokens if kind in ('open', 'close_named', 'close')]
+    
+    def pair(open_kind, close_kind, used):
+        """open_kind の各タグを同じ行で最初に現れる close_kind と対にする（re.sub の走査順）"""
+        paired = set()
+        resume = 0
+        for i, (kind, start, end, line) in enumerate(tokens):
+            if i < resume or kind != open_kind or i in used:
+                continue
+            for j in range(i + 1, len(tokens)):
+                if tokens[j][3] != line:
+                    break
+                if tokens[j][0] == close_kind and j not in used:
+                    paired.update((i, j))
+                    resume = j + 1
+                    break
+        return paired
+    
+    # 1. {c_*}...{/c}  2. {c:hex}...{/c:hex}  3. {c:hex}...{/c}
+    used = pair('open', 'close', set())
+    used |= pair('open_hex', 'close_hex', used)
+    used |= pair('open_hex', 'close', used)
+    
+    return [
+        (start, end) for i, (kind, start, end, line) in enumerate(tokens)
+        if i in used or kind in ('open', 'close_named', 'close')
+    ]
+
+def clean_color_tags_sequential(value):
+    """カラータグを re.sub で順に除去する（scan_markup で判定しきれない場合のみ使用）"""
+    # カラータグを除去しつつ、内容は残す
+    value = re.sub(r'\{c_\w+\}(.*?)\{/c\}', r'\1', value)
+    value = re.sub(r'\{c:[0-9A-Fa-f]{6,8}\}(.*?)\{/c:[0-9A-Fa-f]{6,8}\}', r'\1', value)
+    value = re.sub(r'\{c:[0-9A-Fa-f]{6,8}\}(.*?)\{/c\}', r'\1', value)
     
-    # 非常に長い文字列は除外（200文字以上）
-    if len(key) >= 200:
-        return False
+    # その他のタグを除去
+    value = re.sub(r'\{/c_\w+\}', '', value)
+    value = re.sub(r'\{c_\w+\}', '', value)
+    value = re.sub(r'\{/c\}', '', value)
     
-    # 複雑すぎる正規表現は除外（特殊文字が多すぎる）
-    special_chars = len(re.findall(r'[\\()|[\]{}+*?^$.]', key))
-    if special_chars > 10:
+    return value.strip()
+
+def is_usable_translation(key, value):
+    """変換が実際に使用可能かチェック"""
+    # 改行・ゲーム固有のフォーマットタグ・200文字以上・特殊文字が多すぎる正規表現は除外
+    if not scan_markup(key).usable:
         return False
     
     # 空の値は除外
@@ -69,22 +399,12 @@ def clean_value(value):
     if not value:
         return ""
     
-    # カラータグを除去しつつ、内容は残す
-    value = re.sub(r'\{c_\w+\}(.*?)\{/c\}', r'\1', value)
-    value = re.sub(r'\{c:[0-9A-Fa-f]{6,8}\}(.*?)\{/c:[0-9A-Fa-f]{6,8}\}', r'\1', value)
-    value = re.sub(r'\{c:[0-9A-Fa-f]{6,8}\}(.*?)\{/c\}', r'\1', value)
-    
-    # その他のタグを除去
-    value = re.sub(r'\{/c_\w+\}', '', value)
-    value = re.sub(r'\{c_\w+\}', '', value)
-    value = re.sub(r'\{/c\}', '', value)
-    
-    return value.strip()
+    return scan_markup(value).cleaned
 
 def create_regex_pattern(eng_value, jp_value):
     """英語と日本語の値から正規表現パターンを作成"""
     # 数値プレースホルダーを検出
-    placeholders = re.findall(r'\{VALUE\d*%?\}|\{s\d+\}|\[(.*?)\]', eng_value)
+    placeholders = scan_markup(eng_value).placeholders
     
     if not placeholders:
         return None, None
@@ -110,18 +430,15 @@ def create_regex_pattern(eng_value, jp_value):
     
     return pattern, replacement
 
-def extract_attribute_descriptions(eng_data, jp_data):
+def extract_attribute_section(key, eng_attrs, jp_attrs):
     """AttributeDescriptions.stl から変換ルールを抽出"""
     translations = {}
     
-    eng_attrs = eng_data.get('AttributeDescriptions.stl', {})
-    jp_attrs = jp_data.get('AttributeDescriptions.stl', {})
-    
-    for key, eng_value in eng_attrs.items():
-        if key not in jp_attrs:
+    for sub_key, eng_value in eng_attrs.items():
+        if sub_key not in jp_attrs:
             continue
             
-        jp_value = jp_attrs[key]
+        jp_value = jp_attrs[sub_key]
         
         # 値をクリーニング
         eng_clean = clean_value(eng_value)
@@ -142,131 +459,248 @@ def extract_attribute_descriptions(eng_data, jp_data):
     
     return translations
 
-def extract_item_names(eng_data, jp_data):
+def extract_item_section(key, eng_item, jp_item):
     """アイテム名の変換ルールを抽出"""
     translations = {}
     
-    # アイテムタイプのパターン
-    item_patterns = [
-        r'^ItemType_.*\.stl$',
-        r'^Item_.*_Unique.*\.stl$',
-        r'^Item_.*_Legendary.*\.stl$',
-        r'^Item_Rune_.*\.stl$'
-    ]
-    
-    for key in eng_data:
-        # アイテム関連のキーをチェック
-        if not any(re.match(pattern, key) for pattern in item_patterns):
-            continue
-            
-        if key not in jp_data:
-            continue
-            
-        eng_item = eng_data[key]
-        jp_item = jp_data[key]
+    # Nameフィールドを抽出
+    if isinstance(eng_item, dict) and 'Name' in eng_item and isinstance(jp_item, dict) and 'Name' in jp_item:
+        eng_name = clean_value(eng_item['Name'])
+        jp_name = clean_value(jp_item['Name'])
         
-        # Nameフィールドを抽出
-        if isinstance(eng_item, dict) and 'Name' in eng_item and isinstance(jp_item, dict) and 'Name' in jp_item:
-            eng_name = clean_value(eng_item['Name'])
-            jp_name = clean_value(jp_item['Name'])
-            
-            if eng_name and jp_name and eng_name != jp_name:
-                translations[eng_name] = jp_name
+        if eng_name and jp_name and eng_name != jp_name:
+            translations[eng_name] = jp_name
     
     return translations
 
-def extract_powers_and_aspects(eng_data, jp_data):
+def extract_power_section(key, eng_power, jp_power):
     """パワーと化身の変換ルールを抽出"""
     translations = {}
     
-    # パワーと化身のパターン
-    power_patterns = [
-        r'^Power_.*\.stl$',
-        r'^Affix_legendary_.*\.stl$',
-        r'^Affix_S05_BSK_.*\.stl$',
-        r'^Affix_x1_legendary_.*\.stl$',
-        r'^CollectiblePower_.*\.stl$'
-    ]
+    # NameまたはnameフィールドをチェックPower_*)
+    name_field = 'Name' if 'Name' in eng_power else 'name' if 'name' in eng_power else None
     
-    for key in eng_data:
-        if not any(re.match(pattern, key) for pattern in power_patterns):
-            continue
-            
-        if key not in jp_data:
-            continue
-            
-        eng_power = eng_data[key]
-        jp_power = jp_data[key]
-        
-        # NameまたはnameフィールドをチェックPower_*)
-        name_field = 'Name' if 'Name' in eng_power else 'name' if 'name' in eng_power else None
+    if name_field and isinstance(eng_power, dict) and isinstance(jp_power, dict):
+        eng_name = clean_value(eng_power.get(name_field, ''))
+        jp_name = clean_value(jp_power.get(name_field, ''))
         
-        if name_field and isinstance(eng_power, dict) and isinstance(jp_power, dict):
-            eng_name = clean_value(eng_power.get(name_field, ''))
-            jp_name = clean_value(jp_power.get(name_field, ''))
+        if eng_name and jp_name and eng_name != jp_name:
+            # 基本形を追加
+            translations[eng_name] = jp_name
             
-            if eng_name and jp_name and eng_name != jp_name:
-                # 基本形を追加
-                translations[eng_name] = jp_name
-                
-            # Ultimate（奥義）のMod（スキル強化）も抽出
-            if 'Ultimate' in key:
-                for mod_key in eng_power:
-                    if 'Mod' in mod_key and '_Name' in mod_key:
-                        eng_mod = clean_value(eng_power.get(mod_key, ''))
-                        jp_mod = clean_value(jp_power.get(mod_key, ''))
-                        if eng_mod and jp_mod and eng_mod != jp_mod:
-                            translations[eng_mod] = jp_mod
-                
-                # Aspectバリエーションを追加（Affixの場合）
-                if key.startswith('Affix_'):
-                    # "of XXX" 形式
-                    if eng_name.startswith('of '):
-                        translations[f"Aspect {eng_name}"] = f"{jp_name}化身"
-                    else:
-                        translations[f"{eng_name} Aspect"] = f"{jp_name}化身"
+        # Ultimate（奥義）のMod（スキル強化）も抽出
+        if 'Ultimate' in key:
+            for mod_key in eng_power:
+                if 'Mod' in mod_key and '_Name' in mod_key:
+                    eng_mod = clean_value(eng_power.get(mod_key, ''))
+                    jp_mod = clean_value(jp_power.get(mod_key, ''))
+                    if eng_mod and jp_mod and eng_mod != jp_mod:
+                        translations[eng_mod] = jp_mod
+            
+            # Aspectバリエーションを追加（Affixの場合）
+            if key.startswith('Affix_'):
+                # "of XXX" 形式
+                if eng_name.startswith('of '):
+                    translations[f"Aspect {eng_name}"] = f"{jp_name}化身"
+                else:
+                    translations[f"{eng_name} Aspect"] = f"{jp_name}化身"
     
     return translations
 
-def extract_skill_names(eng_data, jp_data):
+def extract_skill_section(key, eng_skills, jp_skills):
     """スキル名の変換ルールを抽出"""
     translations = {}
     
-    # スキル関連のパターン
-    skill_patterns = [
-        r'^Skill_.*\.stl$',
-        r'^SkillTagNames\.stl$'
-    ]
+    if isinstance(eng_skills, dict) and isinstance(jp_skills, dict):
+        for sub_key, eng_value in eng_skills.items():
+            if sub_key in jp_skills:
+                eng_clean = clean_value(str(eng_value))
+                jp_clean = clean_value(str(jp_skills[sub_key]))
+                
+                if eng_clean and jp_clean and eng_clean != jp_clean:
+                    translations[eng_clean] = jp_clean
+    
+    return translations
+
+SECTION_EXTRACTORS = {
+    'attribute': extract_attribute_section,
+    'item': extract_item_section,
+    'power': extract_power_section,
+    'skill': extract_skill_section,
+}
+
+def route_sections(eng_data, jp_data):
+    """全セクションを1回だけ走査し、カテゴリごとのセクション名リストに振り分ける"""
+    routes = OrderedDict((category, []) for category in SECTION_CATEGORIES)
     
     for key in eng_data:
-        if not any(re.match(pattern, key) for pattern in skill_patterns):
+        category = classify_section(key)
+        if category is None or key not in jp_data:
             continue
-            
-        if key not in jp_data:
-            continue
-            
-        eng_skills = eng_data[key]
-        jp_skills = jp_data[key]
-        
-        if isinstance(eng_skills, dict) and isinstance(jp_skills, dict):
-            for sub_key, eng_value in eng_skills.items():
-                if sub_key in jp_skills:
-                    eng_clean = clean_value(str(eng_value))
-                    jp_clean = clean_value(str(jp_skills[sub_key]))
-                    
-                    if eng_clean and jp_clean and eng_clean != jp_clean:
-                        translations[eng_clean] = jp_clean
+        routes[category].append(key)
     
+    return routes
+
+def extract_shard(items):
+    """シャード内のセクションを抽出（並列実行用）
+
+    items は (カテゴリ, セクション名, 英語セクション, 日本語セクション) のリスト
+    抽出結果のリストと、このシャードでの scan_markup のキャッシュのヒット数・ミス数を返す
+    （ワーカーのキャッシュはプロセスごとにあり、親プロセスの cache_info には含まれないため）
+    """
+    before = scan_markup.cache_info()
+    results = [SECTION_EXTRACTORS[category](key, eng_section, jp_section)
+               for category, key, eng_section, jp_section in items]
+    after = scan_markup.cache_info()
+    return results, after.hits - before.hits, after.misses - before.misses
+
+def split_shards(items, eng_data, shard_count):
+    """順序を保ったまま、要素数がほぼ均等になるよう連続した区間に分割"""
+    weights = [max(len(eng_data[key]) if isinstance(eng_data[key], (dict, list)) else 1, 1) for _, key in items]
+    target = sum(weights) / shard_count if shard_count else 0
+    
+    shards = []
+    current = []
+    current_weight = 0
+    for item, weight in zip(items, weights):
+        current.append(item)
+        current_weight += weight
+        if current_weight >= target and len(shards) < shard_count - 1:
+            shards.append(current)
+            current = []
+            current_weight = 0
+    if current:
+        shards.append(current)
+    return shards
+
+def extract_sections(eng_data, jp_data, items, pool=None, jobs=1, scan_stats=None):
+    """(カテゴリ, セクション名) のリストを抽出し、同じ順序で結果のリストを返す
+
+    scan_stats を指定すると、ワーカーでの scan_markup のキャッシュのヒット数・ミス数を加算する
+    """
+    if pool is None:
+        return [SECTION_EXTRACTORS[category](key, eng_data[key], jp_data[key]) for category, key in items]
+    
+    shards = split_shards(items, eng_data, jobs * SHARDS_PER_JOB)
+    futures = [
+        pool.submit(extract_shard, [(category, key, eng_data[key], jp_data[key]) for category, key in shard])
+        for shard in shards
+    ]
+    # シャードは連続した区間なので、投入順に連結すれば元の順序に戻る
+    results = []
+    for future in futures:
+        shard_results, hits, misses = future.result()
+        results.extend(shard_results)
+        if scan_stats is not None:
+            scan_stats['hits'] += hits
+            scan_stats['misses'] += misses
+    return results
+
+def extract_translations(eng_data, jp_data, routes, pool=None, jobs=1, cache=None, scan_stats=None):
+    """振り分け済みのセクションをカテゴリごとの抽出関数に渡して変換ルールを抽出
+
+    pool を指定すると並列に、cache を指定すると内容が変わったセクションだけを抽出する
+    結果は常に直列実行と同じ順序でマージする
+    scan_stats を指定すると、ワーカーでの scan_markup のキャッシュのヒット数・ミス数と、
+    キャッシュから読み込んだ（走査しなかった）セクション数（cached）を加算する
+    """
+    items = [(category, key) for category, keys in routes.items() for key in keys]
+    results = [None] * len(items)
+    pending = []
+    digests = {}
+    
+    for index, (category, key) in enumerate(items):
+        if cache is None:
+            pending.append(index)
+            continue
+        digest = section_hash(key, eng_data[key], jp_data[key])
+        cached = lookup_section_cache(cache, digest)
+        if cached is None:
+            digests[index] = digest
+            pending.append(index)
+        else:
+            results[index] = cached
+            if scan_stats is not None:
+                scan_stats['cached'] += 1
+    
+    extracted = extract_sections(eng_data, jp_data, [items[index] for index in pending], pool, jobs, scan_stats)
+    for index, translations in zip(pending, extracted):
+        results[index] = translations
+        if cache is not None:
+            store_section_cache(cache, digests[index], translations)
+    
+    merged = OrderedDict((category, {}) for category in routes)
+    for (category, _), translations in zip(items, results):
+        merged[category].update(translations)
+    return merged
+
+def extractor_fingerprint():
+    """抽出ロジックの識別子（このスクリプトが変わればキャッシュを無効にする）"""
+    with open(os.path.abspath(__file__), 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def section_hash(key, eng_section, jp_section):
+    """セクション名と英語・日本語の内容から求めたハッシュ"""
+    content = json.dumps([key, eng_section, jp_section], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def load_section_cache(cache_dir):
+    """セクション単位の抽出結果キャッシュを読み込む"""
+    cache = {
+        'path': os.path.join(cache_dir, SECTION_CACHE_FILE),
+        'version': extractor_fingerprint(),
+        'sections': {},
+        'used': {},
+        'hits': 0,
+        'misses': 0,
+    }
+    if os.path.exists(cache['path']):
+        try:
+            with open(cache['path'], 'r', encoding='utf-8') as file:
+                stored = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable cache {cache['path']}: {e}")
+            return cache
+        if stored.get('version') == cache['version']:
+            cache['sections'] = stored.get('sections', {})
+        else:
+            print("Extractor changed since the last run; rebuilding section cache")
+    return cache
+
+def lookup_section_cache(cache, digest):
+    """キャッシュ済みの抽出結果を返す（なければNone）"""
+    translations = cache['sections'].get(digest)
+    if translations is None:
+        cache['misses'] += 1
+        return None
+    cache['hits'] += 1
+    cache['used'][digest] = translations
     return translations
 
+def store_section_cache(cache, digest, translations):
+    """抽出結果をキャッシュに追加"""
+    cache['used'][digest] = translations
+
+def save_section_cache(cache):
+    """今回使用したセクションの抽出結果のみを保存"""
+    os.makedirs(os.path.dirname(cache['path']), exist_ok=True)
+    temp_path = cache['path'] + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump({'version': cache['version'], 'sections': cache['used']}, file, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temp_path, cache['path'])
+    print(f"Section cache: {cache['hits']} hits, {cache['misses']} misses (saved to {cache['path']})")
+
 def merge_with_existing(new_translations, existing_file):
     """既存のtranslations.jsonとマージ"""
     existing = {}
     
     if os.path.exists(existing_file):
         print(f"Loading existing translations from {existing_file}...")
-        existing = load_json(existing_file)
+        # json.load は重複したキーを後の値で黙って上書きするため、読み込みと同時に検出する
+        existing, duplicates = load_json_checked(existing_file)
         print(f"Found {len(existing)} existing translations")
+        for key in duplicates:
+            print(f"  Warning: duplicate key in {existing_file} (the last value is used): {key[:80]!r}")
     
     # 新しい変換を既存の変換とマージ（既存のものを優先）
     merged = new_translations.copy()
@@ -284,6 +718,12 @@ def main():
         print("\nOptions:")
         print("  --merge-existing : Merge with existing translations.json")
         print("  --no-filter      : Skip filtering (include all translations)")
+        print("  --no-stream      : Load whole StringList files with json.load (for comparison)")
+        print("  --jobs <N>       : Parse and extract with N worker processes")
+        print("  --cache-dir <dir>: Section cache directory (default: temp/stringlist_cache)")
+        print("  --no-cache       : Re-extract every section without using the cache")
+        print("  --no-validate    : Skip compiling and checking the regex keys before saving")
+        print("  --keep-unsafe    : Keep regex keys with nested or adjacent unbounded quantifiers (default: rewrite or remove them)")
         print("\nExamples:")
         print("  # Basic usage")
         print("  python convert_stringlist_to_translations.py output.json --en temp/StringList_en.json --jp temp/StringList_jp.json")
@@ -294,6 +734,10 @@ def main():
     output_file = sys.argv[1]
     merge_existing = '--merge-existing' in sys.argv
     skip_filter = '--no-filter' in sys.argv
+    streaming = '--no-stream' not in sys.argv
+    use_cache = '--no-cache' not in sys.argv
+    validate = '--no-validate' not in sys.argv
+    reject_unsafe = '--keep-unsafe' not in sys.argv
     
     # デフォルトファイルパス
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -303,6 +747,8 @@ def main():
     # コマンドライン引数からファイルパスを取得
     eng_file = None
     jp_file = None
+    jobs = 1
+    cache_dir = os.path.join(temp_dir, 'stringlist_cache')
     
     # 引数を解析
     i = 2
@@ -313,6 +759,15 @@ def main():
         elif sys.argv[i] == '--jp' and i + 1 < len(sys.argv):
             jp_file = sys.argv[i + 1]
             i += 2
+        elif sys.argv[i] == '--jobs' and i + 1 < len(sys.argv):
+            if not sys.argv[i + 1].isdigit() or int(sys.argv[i + 1]) < 1:
+                print(f"Error: --jobs requires a positive integer (got {sys.argv[i + 1]})")
+                return
+            jobs = int(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--cache-dir' and i + 1 < len(sys.argv):
+            cache_dir = sys.argv[i + 1]
+            i += 2
         else:
             i += 1
     
@@ -332,46 +787,55 @@ def main():
         print(f"Error: {jp_file} not found")
         return
     
-    # JSONファイルを読み込む
-    eng_data = load_json(eng_file)
-    jp_data = load_json(jp_file)
-    
-    print("Extracting translations...")
+    cache = load_section_cache(cache_dir) if use_cache else None
+    # ワーカーでの scan_markup のキャッシュの統計と、セクションのキャッシュから読み込んだセクション数
+    scan_stats = {'hits': 0, 'misses': 0, 'cached': 0}
+    
+    if jobs > 1:
+        print(f"Using {jobs} worker processes")
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            # 英語・日本語のファイルを同時に読み込む
+            eng_future = pool.submit(load_stringlist, eng_file, streaming)
+            jp_future = pool.submit(load_stringlist, jp_file, streaming)
+            eng_data = eng_future.result()
+            jp_data = jp_future.result()
+            
+            print("Extracting translations...")
+            routes = route_sections(eng_data, jp_data)
+            category_translations = extract_translations(eng_data, jp_data, routes, pool, jobs, cache, scan_stats)
+    else:
+        # JSONファイルを読み込む（抽出対象のセクションのみ）
+        eng_data = load_stringlist(eng_file, streaming)
+        jp_data = load_stringlist(jp_file, streaming)
+        
+        print("Extracting translations...")
+        
+        # セクションを1回の走査でカテゴリに振り分ける
+        routes = route_sections(eng_data, jp_data)
+        category_translations = extract_translations(eng_data, jp_data, routes, cache=cache, scan_stats=scan_stats)
     
-    # 各カテゴリから変換ルールを抽出
+    # カテゴリ順にマージ（後のカテゴリが優先）
     all_translations = {}
-    
-    # 1. AttributeDescriptions
-    print("Extracting attribute descriptions...")
-    attr_translations = extract_attribute_descriptions(eng_data, jp_data)
-    all_translations.update(attr_translations)
-    print(f"  Found {len(attr_translations)} attribute translations")
-    
-    # 2. アイテム名
-    print("Extracting item names...")
-    item_translations = extract_item_names(eng_data, jp_data)
-    all_translations.update(item_translations)
-    print(f"  Found {len(item_translations)} item translations")
-    
-    # 3. パワーと化身
-    print("Extracting powers and aspects...")
-    power_translations = extract_powers_and_aspects(eng_data, jp_data)
-    all_translations.update(power_translations)
-    print(f"  Found {len(power_translations)} power/aspect translations")
-    
-    # 4. スキル名
-    print("Extracting skill names...")
-    skill_translations = extract_skill_names(eng_data, jp_data)
-    all_translations.update(skill_translations)
-    print(f"  Found {len(skill_translations)} skill translations")
+    for category, translations in category_translations.items():
+        all_translations.update(translations)
+        print(f"  Found {len(translations)} {CATEGORY_LABELS[category]} translations ({len(routes[category])} sections)")
     
     print(f"\nTotal new translations extracted: {len(all_translations)}")
     
+    if cache is not None:
+        save_section_cache(cache)
+    
     # 使用可能な変換のみをフィルタリング（オプション）
     if not skip_filter:
         print("\nFiltering unusable translations...")
         all_translations = filter_translations(all_translations)
         print(f"Usable translations: {len(all_translations)}")
+        # 親プロセス（直列の抽出とフィルタリング）とワーカーの統計を合算する
+        cache_info = scan_markup.cache_info()
+        cached = f" ({scan_stats['cached']} sections were loaded from the section cache and not scanned)" \
+            if scan_stats['cached'] else ""
+        print(f"Markup scan cache: {cache_info.hits + scan_stats['hits']} hits, "
+              f"{cache_info.misses + scan_stats['misses']} misses{cached}")
     else:
         print("\nSkipping filter (--no-filter option used)")
     
@@ -379,15 +843,22 @@ def main():
     if merge_existing:
         all_translations = merge_with_existing(all_translations, existing_translations)
     
+    # 正規表現キーを検証（コンパイルできないキーを除外し、バックトラッキングが爆発しうるキーを書き換え・除外）
+    if validate:
+        print("\nValidating regex keys...")
+        all_translations, report = validate_translations(all_translations, reject_unsafe)
+        print_validation_report(report)
+    
     # 保存
     save_json(all_translations, output_file)
     print(f"\nTranslations saved to {output_file}")
     
     # 統計情報を表示
     print("\nTranslation statistics:")
-    regex_count = sum(1 for k in all_translations.keys() if any(c in k for c in ['(', ')', '[', ']', '\\', '$', '^', '*', '+', '?', '{', '}']))
-    print(f"  - Regular expressions: {regex_count}")
-    print(f"  - Simple replacements: {len(all_translations) - regex_count}")
+    # compile_dictionary.py と同じ基準で、正規表現として評価するキーと文字列として照合するキーを数える
+    literal_count = sum(1 for key, value in all_translations.items() if is_literal_key(key, value))
+    print(f"  - Regular expressions: {len(all_translations) - literal_count}")
+    print(f"  - Simple replacements: {literal_count}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -13,10 +13,15 @@ echo "バージョン $VERSION のリリースzipを作成します..."
 # tempディレクトリを作成（存在しない場合）
 mkdir -p temp
 
+# translations.json から実行時辞書（sources/compiled/）を生成
+python3 tools/compile_dictionary.py || exit 1
+
 # 一時的にDiablo_Translateディレクトリを作成してzipを生成
+# （辞書ファイルは build_extension.py と同じく、空白を除いた translations.json と圧縮したシャードに置き換える）
 cd temp && \
 mkdir -p Diablo_Translate && \
 cp -r ../sources/* Diablo_Translate/ && \
+python3 ../tools/build_extension.py --package-dir Diablo_Translate && \
 zip -r "Diablo_Translate_${VERSION}.zip" Diablo_Translate && \
 rm -rf Diablo_Translate
 
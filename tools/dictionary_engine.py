@@ -0,0 +1,587 @@
+"""
+content.js（engine.js）の翻訳処理のPython版と、ツール間で共有するキーの解釈
+
+compile_dictionary.py（実行時辞書の生成）、validate_patterns.py、analyze_dictionary.py、profile_patterns.py と
+translation_bench（速度の計測）が同じ解釈を使うように、すべてここにまとめる
+（本モジュールは他のツールを読み込まない）
+
+LegacyEngine: すべてのキーを正規表現として評価する従来の処理
+  （キーの長さの降順、' を [''] に置換、\\b...\\b と 'gi' フラグ、パターン長による足切り）
+CompiledEngine: compile_dictionary.py の実行時辞書を使う現在の処理
+  （単語フィルタでどのキーにも一致しないテキストを除外し、テキスト全体の完全一致表と数値テンプレートの
+  索引を引き、一致しなければ正規表現キーと Aho-Corasick オートマトンの文字列キーをキーの長さの順序を保って適用）
+
+どちらも translate() の結果は content.js の applyOptimizedTransformations と同じになり、
+stats には replaceText と同じ項目（nodes、attempts、replacements、chars、rejected）を集計する
+"""
+
+import re
+import time
+from collections import deque
+
+from jsregex import JS_WHITESPACE, compile_js_regex, convert_pattern, js_replace_all
+
+try:
+    from re import _parser as sre_parse  # Python 3.11 以降
+except ImportError:
+    import sre_parse
+
+# 実行時辞書の形式バージョン（engine.js と合わせる）
+COMPILED_FORMAT_VERSION = 8
+
+# String.prototype.trim と同じ空白の除去（前後の空白と中身に分ける）
+TRIM_RE = re.compile(f'([{JS_WHITESPACE}]*)(.*?)([{JS_WHITESPACE}]*)', re.DOTALL)
+
+WORD_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_')
+
+# 単語フィルタでテキストから取り出す単語（engine.js と合わせる）
+WORD_TOKEN_RE = re.compile(r'[A-Za-z0-9_]+')
+
+# 数値テンプレートの索引を引くときに数値とみなす部分（engine.js と合わせる）
+NUMBER_TOKEN_RE = re.compile(r'[+-]?(?:[0-9]+(?:,[0-9]{3})*(?:\.[0-9]+)?|\.[0-9]+)')
+# 数値テンプレートの索引で数値の位置を表す文字
+TEMPLATE_SLOT = '\x00'
+
+def fold_char(char):
+    """JavaScriptの正規表現 'i' フラグ（uフラグなし）と同じ大文字小文字の同一視
+
+    toUpperCase の結果が1文字でない場合と、非ASCII文字がASCII文字になる場合は変換しない
+    """
+    upper = char.upper()
+    if len(upper) != 1:
+        return char
+    if ord(char) >= 128 and ord(upper) < 128:
+        return char
+    return upper
+
+def fold_text(text):
+    return ''.join(fold_char(char) for char in text)
+
+def text_digest(text):
+    """translations.json の内容の要約（engine.js の textDigest と同じ）
+
+    実行時辞書が同じ内容の translations.json から生成されたかを確かめるために使う
+    UTF-16単位で求めた2つの32ビットハッシュを16進数でつなげる
+    """
+    first = 0x811c9dc5
+    second = 0x9747b28c
+    data = text.encode('utf-16-le')
+    for index in range(0, len(data), 2):
+        code = data[index] | data[index + 1] << 8
+        first = ((first ^ code) * 0x01000193) & 0xFFFFFFFF
+        second = ((second ^ code) * 0x5bd1e995) & 0xFFFFFFFF
+        second ^= second >> 15
+    return f'{first:08x}{second:08x}'
+
+def sorted_entries(translations):
+    """content.js と同じ順序（キーの長さの降順、同じ長さは元の順序）で並べる"""
+    return sorted(translations.items(), key=lambda item: -len(item[0]))
+
+def new_stats():
+    """replaceText と同じ集計項目"""
+    return {'nodes': 0, 'attempts': 0, 'replacements': 0, 'chars': 0, 'rejected': 0}
+
+def required_literal(regex):
+    """正規表現に一致するテキストに必ず含まれる文字列（casefold済み、見つからなければ空文字列）
+
+    トップレベルで連続する文字のうち最も長いものを返す
+    """
+    best = current = ''
+    for op, value in sre_parse.parse(regex.pattern, regex.flags).data:
+        if op is sre_parse.LITERAL:
+            current += chr(value)
+            continue
+        best = max(best, current, key=len)
+        current = ''
+    return max(best, current, key=len).casefold()
+
+def has_top_level_alternation(source):
+    """正規表現ソースのトップレベルに | があるか（\\b...\\b で囲んでも最初と最後の選択肢にしか付かない）"""
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            return True
+        i += 1
+    return False
+
+def flatten_sequence(items):
+    """量指定子の付かないグループを展開して、テキスト上で連続する要素の列にする"""
+    for op, value in items:
+        if op is sre_parse.SUBPATTERN:
+            yield from flatten_sequence(value[-1])
+        else:
+            yield op, value
+
+def required_words(key):
+    """content.js と同じく \\b...\\b で囲んだキーに一致するテキストに必ず含まれる単語の一覧
+
+    単語は [A-Za-z0-9_] の連続（小文字にする）で、(単語, 単語全体か) のリストを返す
+    単語全体でない場合は、テキストのいずれかの単語がその文字列で始まる
+    """
+    escaped = key.replace("'", "['']")
+    if has_top_level_alternation(escaped):
+        return []
+    words = []
+    current = ''
+    # 直前の文字が単語構成文字でないことが確実か（キーの先頭は \\b の直後）
+    bounded = True
+    items = list(flatten_sequence(sre_parse.parse(convert_pattern(escaped), re.IGNORECASE)))
+    for op, value in items + [(None, None)]:
+        char = chr(value) if op is sre_parse.LITERAL else None
+        if char is not None and char in WORD_CHARS:
+            current += char
+            continue
+        if current and bounded:
+            # キーの末尾（\\b の直前）か単語構成文字以外の文字で終われば単語全体
+            words.append((current.lower(), op is None or char is not None))
+        current = ''
+        bounded = char is not None or (op is sre_parse.AT and value is sre_parse.AT_BEGINNING)
+    return words
+
+def compile_key(key, replacement):
+    """content.js の loadTranslations と同じ方法でキーを正規表現にする"""
+    escaped = key.replace("'", "['']")
+    try:
+        regex = compile_js_regex(f'\\b{escaped}\\b', 'gi')
+    except Exception as error:
+        raise ValueError(f"Invalid pattern {key!r}: {error}") from error
+    return {
+        'key': key,
+        'regex': regex,
+        'replacement': replacement,
+        'minLength': len(key),
+    }
+
+def apply_pattern(pattern, text, stats=None, pattern_times=None):
+    """1つのパターンを適用（長さフィルタは呼び出し側で判定する）
+
+    pattern_times に辞書を渡すと、キーごとの処理時間（秒）を加算する
+    """
+    if stats is not None:
+        stats['attempts'] += 1
+    if pattern_times is None:
+        new_text = js_replace_all(pattern['regex'], text, pattern['replacement'])
+    else:
+        start = time.perf_counter()
+        new_text = js_replace_all(pattern['regex'], text, pattern['replacement'])
+        key = pattern['key']
+        pattern_times[key] = pattern_times.get(key, 0.0) + time.perf_counter() - start
+    if new_text != text and stats is not None:
+        stats['replacements'] += 1
+    return new_text
+
+def apply_patterns(patterns, text, stats=None, pattern_times=None):
+    """事前コンパイルされたパターンを順に適用（変換前のテキストの長さによる足切り付き）"""
+    text_length = len(text)
+    for pattern in patterns:
+        if pattern['minLength'] <= text_length:
+            text = apply_pattern(pattern, text, stats, pattern_times)
+    return text
+
+class LegacyEngine:
+    """すべてのキーを正規表現として評価する content.js の従来の処理"""
+
+    name = 'legacy'
+
+    def __init__(self, translations):
+        self.patterns = [compile_key(key, replacement) for key, replacement in sorted_entries(translations)]
+
+    @property
+    def pattern_count(self):
+        return len(self.patterns)
+
+    def translate(self, text, stats=None, pattern_times=None):
+        return apply_patterns(self.patterns, text, stats, pattern_times)
+
+def literal_keys(literals):
+    """オートマトンのキー（大文字小文字を同一視した形）と置換後の文字列の一覧を返す
+
+    一覧の位置がオートマトンのキー番号になる
+    大文字小文字を同一視した結果が同じキーは、content.js で先に適用される方だけが有効
+    """
+    keys = []
+    replacements = []
+    seen = set()
+    for key, replacement in literals:
+        folded = fold_text(key)
+        if folded in seen:
+            continue
+        seen.add(folded)
+        keys.append(folded)
+        replacements.append(replacement)
+    return keys, replacements
+
+def build_automaton(literals):
+    """文字列キーから Aho-Corasick オートマトンを構築
+
+    状態は幅優先順に番号を振るため、ある状態の子はラベルの昇順で連続した番号になる
+    （engine.js は同じキーから、走査でたどった状態だけを作る）
+    """
+    keys, replacements = literal_keys(literals)
+
+    # トライ木を構築
+    children = [{}]
+    terminal = [-1]
+    for index, key in enumerate(keys):
+        state = 0
+        for char in key:
+            next_state = children[state].get(char)
+            if next_state is None:
+                next_state = len(children)
+                children[state][char] = next_state
+                children.append({})
+                terminal.append(-1)
+            state = next_state
+        terminal[state] = index
+
+    # 幅優先順に番号を振り直す
+    order = [0]
+    renumber = {0: 0}
+    queue = deque([0])
+    while queue:
+        state = queue.popleft()
+        for char in sorted(children[state]):
+            child = children[state][char]
+            renumber[child] = len(order)
+            order.append(child)
+            queue.append(child)
+
+    state_count = len(order)
+    labels = []
+    first_child = []
+    next_id = 1
+    for old_state in order:
+        first_child.append(next_id)
+        for char in sorted(children[old_state]):
+            labels.append(char)
+            next_id += 1
+    first_child.append(next_id)
+
+    # 失敗リンクを計算
+    fail = [0] * state_count
+    for state in range(state_count):
+        for offset in range(first_child[state + 1] - first_child[state]):
+            child = first_child[state] + offset
+            char = labels[child - 1]
+            if state == 0:
+                fail[child] = 0
+                continue
+            link = fail[state]
+            while True:
+                target = find_child(first_child, labels, link, char)
+                if target is not None:
+                    fail[child] = target
+                    break
+                if link == 0:
+                    fail[child] = 0
+                    break
+                link = fail[link]
+
+    outputs = []
+    for old_state, new_state in renumber.items():
+        if terminal[old_state] >= 0:
+            outputs.append([new_state, terminal[old_state]])
+    outputs.sort()
+
+    return {
+        'labels': ''.join(labels),
+        'firstChild': first_child,
+        'fail': fail,
+        'outputs': [value for pair in outputs for value in pair],
+        'lengths': [len(key) for key in keys],
+        'replacements': replacements,
+    }
+
+def find_child(first_child, labels, state, char):
+    """state の子のうちラベルが char の状態を返す（なければNone）"""
+    low = first_child[state]
+    high = first_child[state + 1] - 1
+    while low <= high:
+        middle = (low + high) // 2
+        label = labels[middle - 1]
+        if label == char:
+            return middle
+        if label < char:
+            low = middle + 1
+        else:
+            high = middle - 1
+    return None
+
+class LiteralMatcher:
+    """engine.js の createLiteralMatcher のPython版"""
+
+    def __init__(self, data):
+        first_child = data['firstChild']
+        labels = data['labels']
+        self.fail = data['fail']
+        self.lengths = data['lengths']
+        self.replacements = data['replacements']
+        state_count = len(self.fail)
+
+        # 二分探索の代わりに状態ごとの辞書で遷移を引く
+        self.children = []
+        for state in range(state_count):
+            self.children.append({labels[child - 1]: child
+                                  for child in range(first_child[state], first_child[state + 1])})
+
+        self.output = [-1] * state_count
+        outputs = data['outputs']
+        for i in range(0, len(outputs), 2):
+            self.output[outputs[i]] = outputs[i + 1]
+
+        self.output_link = [0] * state_count
+        for state in range(1, state_count):
+            link = self.fail[state]
+            self.output_link[state] = link if self.output[link] >= 0 else self.output_link[link]
+
+        self.fold_cache = {}
+
+        # 直前に走査したテキストとそのマッチ候補
+        self.scanned_text = None
+        self.candidates = []
+
+    @property
+    def key_count(self):
+        return len(self.lengths)
+
+    @property
+    def state_count(self):
+        return len(self.fail)
+
+    def fold(self, char):
+        folded = self.fold_cache.get(char)
+        if folded is None:
+            folded = fold_char(char)
+            self.fold_cache[char] = folded
+        return folded
+
+    @staticmethod
+    def is_boundary(text, pos):
+        before = pos > 0 and text[pos - 1] in WORD_CHARS
+        after = pos < len(text) and text[pos] in WORD_CHARS
+        return before != after
+
+    def scan(self, text, stats=None):
+        children = self.children
+        fail = self.fail
+        output = self.output
+        output_link = self.output_link
+        lengths = self.lengths
+        candidates = []
+        state = 0
+
+        if stats is not None:
+            stats['attempts'] += 1
+        for i, char in enumerate(text):
+            code = self.fold(char)
+            child = children[state].get(code)
+            while child is None and state != 0:
+                state = fail[state]
+                child = children[state].get(code)
+            state = child or 0
+
+            match = state if output[state] >= 0 else output_link[state]
+            while match > 0:
+                key = output[match]
+                start = i + 1 - lengths[key]
+                if self.is_boundary(text, start) and self.is_boundary(text, i + 1):
+                    candidates.append((key, start))
+                match = output_link[match]
+
+        self.scanned_text = text
+        self.candidates = candidates
+
+    def replace(self, text, stats=None, first=0, last=None):
+        """キー番号が first 以上 last 未満のキーで置換（テキストが変わらなければ再走査しない）"""
+        if last is None:
+            last = self.key_count
+        if text != self.scanned_text:
+            self.scan(text, stats)
+
+        candidates = [candidate for candidate in self.candidates if first <= candidate[0] < last]
+        if not candidates:
+            return text
+
+        # 重なったマッチは従来の正規表現の適用順（キー番号＝長い順、同じキーは左から）で採用する
+        lengths = self.lengths
+        candidates.sort()
+        used = bytearray(len(text))
+        chosen = {}
+        for key, start in candidates:
+            end = start + lengths[key]
+            if any(used[start:end]):
+                continue
+            used[start:end] = b'\x01' * (end - start)
+            chosen[start] = key
+
+        pieces = []
+        last_end = 0
+        for start in sorted(chosen):
+            key = chosen[start]
+            pieces.append(text[last_end:start])
+            pieces.append(self.replacements[key])
+            last_end = start + lengths[key]
+            if stats is not None:
+                stats['replacements'] += 1
+        pieces.append(text[last_end:])
+        return ''.join(pieces)
+
+class ExactLookup:
+    """engine.js の createExactLookup のPython版"""
+
+    def __init__(self, excluded, exact_limits, keys, replacements):
+        excluded = set(excluded)
+        limits = dict((key_index, limit) for key_index, limit in exact_limits)
+        self.table = {}
+        for key_index, folded in enumerate(keys):
+            if key_index not in excluded:
+                self.table[folded] = (replacements[key_index], limits.get(key_index, float('inf')))
+        self.max_key_length = max((len(folded) for folded in self.table), default=0)
+
+    def lookup(self, text):
+        """一致すれば置換後のテキストを、一致しなければNoneを返す"""
+        leading, core, trailing = TRIM_RE.fullmatch(text).groups()
+        if not core or len(core) > self.max_key_length:
+            return None
+        entry = self.table.get(''.join(fold_char(char) for char in core))
+        if entry is None or len(text) >= entry[1]:
+            return None
+        return leading + entry[0] + trailing
+
+class TemplateLookup:
+    """engine.js の createTemplateLookup のPython版"""
+
+    def __init__(self, templates, patterns):
+        self.table = dict(templates)
+        self.patterns = patterns
+
+    def lookup(self, text, stats=None, pattern_times=None):
+        """テキスト全体が数値テンプレートと一致すれば置換後のテキストを、一致しなければNoneを返す"""
+        leading, core, _ = TRIM_RE.fullmatch(text).groups()
+        if not self.table or NUMBER_TOKEN_RE.search(core) is None:
+            return None
+        signature = NUMBER_TOKEN_RE.sub(TEMPLATE_SLOT, core)
+        index = self.table.get(''.join(fold_char(char) for char in signature))
+        if index is None:
+            return None
+        return self.apply(self.patterns[index], text, leading, core, stats, pattern_times)
+
+    @staticmethod
+    def apply(pattern, text, leading, core, stats=None, pattern_times=None):
+        """パターンがテキスト全体（前後の空白を除く）に一致する場合だけ置換する
+
+        長さフィルタで評価されないテキストでは通常の処理と結果が変わりうるため使わない
+        """
+        if pattern['minLength'] > len(text):
+            return None
+        match = pattern['regex'].search(text)
+        if match is None or match.start() != len(leading) or match.end() != len(leading) + len(core):
+            return None
+        return apply_pattern(pattern, text, stats, pattern_times)
+
+def literal_word_table(literals):
+    """literals.json の wordPositions から単語フィルタの表を作る（engine.js の literalWordTable と同じ）"""
+    if literals.get('wordPositions') is None:
+        return None
+    words = [WORD_TOKEN_RE.findall(folded)[position].lower()
+             for folded, position in zip(literals['keys'], literals['wordPositions'])]
+    return {'words': words, 'prefixes': []}
+
+class WordFilter:
+    """engine.js の createWordFilter のPython版"""
+
+    def __init__(self, tables):
+        self.words = set()
+        self.prefixes = set()
+        for table in tables:
+            self.words.update(table['words'])
+            self.prefixes.update(table['prefixes'])
+        self.prefix_lengths = sorted({len(prefix) for prefix in self.prefixes})
+
+    def test(self, text):
+        """いずれかのキーに一致しうるテキストであればTrue"""
+        for match in WORD_TOKEN_RE.finditer(text):
+            word = match.group(0).lower()
+            if word in self.words:
+                return True
+            for length in self.prefix_lengths:
+                if length > len(word):
+                    break
+                if word[:length] in self.prefixes:
+                    return True
+        return False
+
+class CompiledEngine:
+    """compile_dictionary.py の実行時辞書を使う content.js の現在の処理"""
+
+    name = 'compiled'
+
+    def __init__(self, literals, patterns, digest):
+        for table in (literals, patterns):
+            if table.get('version') != COMPILED_FORMAT_VERSION or table.get('digest') != digest:
+                raise ValueError("Compiled dictionary is out of date; run compile_dictionary.py")
+        # engine.js と同じく、キーの一覧から読み込み時にオートマトンを構築する
+        self.matcher = LiteralMatcher(build_automaton(zip(literals['keys'], literals['replacements'])))
+        self.exact = ExactLookup(literals['exactExcluded'], literals['exactLimits'], literals['keys'], literals['replacements'])
+        self.patterns = []
+        for key, replacement, literals_before, *gate in patterns['patterns']:
+            pattern = compile_key(key, replacement)
+            pattern['literalsBefore'] = literals_before
+            # 降格したキーが必ず含む単語（engine.js と同じく、現在のテキストになければ評価しない）
+            pattern['gate'] = re.compile(re.escape(gate[0]), re.IGNORECASE) if gate else None
+            self.patterns.append(pattern)
+        self.templates = TemplateLookup(patterns.get('templates', {}), self.patterns)
+        word_tables = [literal_word_table(literals), patterns.get('words')]
+        self.word_filter = WordFilter(word_tables) if all(word_tables) else None
+
+    @property
+    def pattern_count(self):
+        return len(self.patterns) + self.matcher.key_count
+
+    def replace_literals(self, text, stats, first, last, pattern_times):
+        if pattern_times is None:
+            return self.matcher.replace(text, stats, first, last)
+        start = time.perf_counter()
+        text = self.matcher.replace(text, stats, first, last)
+        pattern_times['<literals>'] = pattern_times.get('<literals>', 0.0) + time.perf_counter() - start
+        return text
+
+    def translate(self, text, stats=None, pattern_times=None):
+        """content.js の applyOptimizedTransformations と同じく、正規表現キーの間で文字列キーを置換"""
+        if self.word_filter is not None and not self.word_filter.test(text):
+            if stats is not None:
+                stats['rejected'] += 1
+            return text
+        exact_text = self.exact.lookup(text)
+        if exact_text is not None:
+            if stats is not None:
+                stats['attempts'] += 1
+                stats['replacements'] += 1
+            return exact_text
+        template_text = self.templates.lookup(text, stats, pattern_times)
+        if template_text is not None:
+            return template_text
+
+        text_length = len(text)
+        literals_applied = 0
+        for pattern in self.patterns:
+            if pattern['literalsBefore'] > literals_applied:
+                text = self.replace_literals(text, stats, literals_applied, pattern['literalsBefore'], pattern_times)
+                literals_applied = pattern['literalsBefore']
+            if pattern['minLength'] <= text_length and (pattern['gate'] is None or pattern['gate'].search(text)):
+                text = apply_pattern(pattern, text, stats, pattern_times)
+        return self.replace_literals(text, stats, literals_applied, None, pattern_times)
@@ -0,0 +1,186 @@
+"""
+JavaScriptの正規表現（uフラグなし）をPythonの re で同じように評価するための変換
+content.js が new RegExp(..., 'gi') で組み立てるパターンと、
+String.prototype.replace の置換文字列（$1、$& など）を扱う
+
+UTF-16のサロゲートペアは区別しない（Pythonではコードポイント単位で扱われる）
+"""
+
+import re
+
+# JavaScriptの \s に含まれる文字
+JS_WHITESPACE = '\\t\\n\\v\\f\\r \\u00a0\\u1680\\u2000-\\u200a\\u2028\\u2029\\u202f\\u205f\\u3000\\ufeff'
+# JavaScriptの \w（uフラグなしでは大文字小文字の同一視でも非ASCII文字に広がらない）
+JS_WORD = 'A-Za-z0-9_'
+
+# 文字クラスの外で使われるエスケープ
+ESCAPES = {
+    'd': '[0-9]',
+    'D': '[^0-9]',
+    'w': f'(?-i:[{JS_WORD}])',
+    'W': f'(?-i:[^{JS_WORD}])',
+    's': f'[{JS_WHITESPACE}]',
+    'S': f'[^{JS_WHITESPACE}]',
+    'b': f'(?-i:(?:(?<=[{JS_WORD}])(?![{JS_WORD}])|(?<![{JS_WORD}])(?=[{JS_WORD}])))',
+    'B': f'(?-i:(?:(?<=[{JS_WORD}])(?=[{JS_WORD}])|(?<![{JS_WORD}])(?![{JS_WORD}])))',
+}
+
+# 文字クラスの中で使われるエスケープ（否定形はPythonの解釈のまま）
+CLASS_ESCAPES = {
+    'd': '0-9',
+    'w': JS_WORD,
+    's': JS_WHITESPACE,
+    'b': '\\x08',
+}
+
+# Pythonでもそのまま使えるエスケープ
+PASSTHROUGH_ESCAPES = set('DWSfnrtv0123456789xu')
+
+# JavaScriptで量指定子として解釈される {n}、{n,}、{n,m}
+QUANTIFIER_RE = re.compile(r'\{\d+(?:,\d*)?\}')
+# 名前付きグループの参照 \k<name>
+NAMED_BACKREF_RE = re.compile(r'k<([A-Za-z_$][\w$]*)>')
+# 置換文字列の特殊パターン
+SUBSTITUTION_RE = re.compile(r"\$(?:(\$)|(&)|(`)|(')|(\d{1,2})|<([^>]*)>)")
+
+# . が一致しない改行文字
+JS_DOT = '[^\\n\\r\\u2028\\u2029]'
+
+def convert_pattern(source):
+    """JavaScriptの正規表現ソースをPythonの re で同じ意味になるパターンに変換"""
+    result = []
+    in_class = False
+    i = 0
+    length = len(source)
+    while i < length:
+        char = source[i]
+
+        if char == '\\' and i + 1 < length:
+            escaped = source[i + 1]
+            i += 2
+            if in_class:
+                if escaped in CLASS_ESCAPES:
+                    result.append(CLASS_ESCAPES[escaped])
+                elif escaped in PASSTHROUGH_ESCAPES or not escaped.isalpha():
+                    result.append('\\' + escaped)
+                else:
+                    # uフラグなしでは未定義のエスケープは文字そのもの
+                    result.append(re.escape(escaped))
+                continue
+            if escaped in ESCAPES:
+                result.append(ESCAPES[escaped])
+            elif escaped == 'k' and NAMED_BACKREF_RE.match(source, i - 1):
+                backref = NAMED_BACKREF_RE.match(source, i - 1)
+                result.append(f'(?P={backref.group(1)})')
+                i = backref.end()
+            elif escaped in PASSTHROUGH_ESCAPES or not escaped.isalpha():
+                result.append('\\' + escaped)
+            else:
+                result.append(re.escape(escaped))
+            continue
+
+        if in_class:
+            if char == ']':
+                in_class = False
+                result.append(char)
+            elif char in '[&~|':
+                # Pythonでは集合演算の予約になっている記号
+                result.append('\\' + char)
+            else:
+                result.append(char)
+            i += 1
+            continue
+
+        if char == '[':
+            # [] は何にも一致せず、[^] は任意の1文字に一致する
+            if source.startswith('[]', i):
+                result.append('(?!)')
+                i += 2
+                continue
+            if source.startswith('[^]', i):
+                result.append('[\\s\\S]')
+                i += 3
+                continue
+            in_class = True
+            result.append(char)
+            i += 1
+            if i < length and source[i] == '^':
+                result.append('^')
+                i += 1
+            continue
+
+        if char == '{':
+            quantifier = QUANTIFIER_RE.match(source, i)
+            if quantifier:
+                result.append(quantifier.group(0))
+                i = quantifier.end()
+            else:
+                # 量指定子にならない { はJavaScriptでは文字そのもの
+                result.append('\\{')
+                i += 1
+            continue
+
+        if char == '}':
+            result.append('\\}')
+        elif char == '.':
+            result.append(JS_DOT)
+        elif char == '$':
+            # mフラグなしの $ は末尾の改行の前には一致しない
+            result.append('(?!(?s:.))')
+        elif char == '(' and source.startswith('(?<', i) and not source.startswith(('(?<=', '(?<!'), i):
+            result.append('(?P<')
+            i += 3
+            continue
+        else:
+            result.append(char)
+        i += 1
+
+    return ''.join(result)
+
+def compile_js_regex(source, flags='gi'):
+    """JavaScriptの new RegExp(source, flags) に相当するPythonの正規表現を返す（g フラグは呼び出し側で扱う）"""
+    python_flags = 0
+    if 'i' in flags:
+        python_flags |= re.IGNORECASE
+    if 'm' in flags:
+        python_flags |= re.MULTILINE
+    if 's' in flags:
+        python_flags |= re.DOTALL
+    return re.compile(convert_pattern(source), python_flags)
+
+def expand_replacement(template, match):
+    """String.prototype.replace の置換文字列を展開（$$、$&、$`、$'、$n、$nn、$<name>）"""
+    if '$' not in template:
+        return template
+
+    group_count = match.re.groups
+    text = match.string
+
+    def substitute(special):
+        dollar, whole, before, after, number, name = special.groups()
+        if dollar:
+            return '$'
+        if whole:
+            return match.group(0)
+        if before:
+            return text[:match.start()]
+        if after:
+            return text[match.end():]
+        if number is not None:
+            # 2桁のグループ番号が存在しなければ1桁として解釈する
+            if len(number) == 2 and 1 <= int(number) <= group_count:
+                return match.group(int(number)) or ''
+            if 1 <= int(number[0]) <= group_count:
+                return (match.group(int(number[0])) or '') + number[1:]
+            return special.group(0)
+        if match.re.groupindex:
+            if name in match.re.groupindex:
+                return match.group(name) or ''
+            return ''
+        return special.group(0)
+
+    return SUBSTITUTION_RE.sub(substitute, template)
+
+def js_replace_all(regex, text, replacement):
+    """text.replace(regex, replacement)（g フラグ付き）と同じ結果を返す"""
+    return regex.sub(lambda match: expand_replacement(replacement, match), text)
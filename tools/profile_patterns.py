@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+content.js のヒット記録（ポップアップの「記録を書き出す」で保存したJSON）を合算し、
+正規表現キーごとの評価回数・置換回数・処理時間を集計するスクリプト
+
+一度も置換していないのに処理時間の長い正規表現キーを降格の対象として書き出す
+compile_dictionary.py は降格したキーに必ず含まれる単語を添え、content.js はその単語を含むテキストだけで評価する
+（変換結果は変わらない。置換していないキーを translations.json から削除するかは、一覧を見て判断する）
+"""
+
+import json
+import os
+import sys
+
+from build_site_subsets import PROFILE_FORMAT_VERSION, load_profiles
+from compile_dictionary import DEMOTED_PATTERNS_FILE, is_literal_key, load_translations
+from dictionary_engine import required_words
+
+# 降格する一覧の形式バージョン
+DEMOTED_FORMAT_VERSION = 1
+
+# 画面に表示するキーの数
+TOP_COUNT = 20
+
+def merge_hosts(hosts):
+    """ホストごとの記録を1つにまとめる（正規表現キーの集計とオートマトンの集計）"""
+    patterns = {}
+    automaton = {'attempts': 0, 'time': 0.0}
+    for entry in hosts.values():
+        for key, cost in entry['patterns'].items():
+            total = patterns.setdefault(key, {'attempts': 0, 'hits': 0, 'time': 0.0})
+            for field in total:
+                total[field] += cost[field]
+        for field in automaton:
+            automaton[field] += entry['automaton'][field]
+    return patterns, automaton
+
+def select_demoted(translations, patterns, min_attempts, min_time):
+    """降格するキーと、置換していないキーの一覧を返す
+
+    置換していない: min_attempts 回以上評価して一度も置換していない正規表現キー
+    降格する: そのうち処理時間の合計が min_time ミリ秒以上で、必ず含まれる単語を決められるキー
+    """
+    unused = []
+    demoted = []
+    for key, cost in sorted(patterns.items(), key=lambda item: -item[1]['time']):
+        if key not in translations or is_literal_key(key, translations[key]):
+            continue
+        if cost['hits'] > 0 or cost['attempts'] < min_attempts:
+            continue
+        unused.append(key)
+        if cost['time'] >= min_time and required_words(key):
+            demoted.append(key)
+    return demoted, unused
+
+def format_cost(key, cost):
+    per_attempt = cost['time'] * 1000 / cost['attempts'] if cost['attempts'] else 0.0
+    return (f"  {cost['time']:9.2f} ms {cost['attempts']:9d} attempts {cost['hits']:7d} hits "
+            f"{per_attempt:8.2f} us/attempt  {key[:80]!r}")
+
+def print_report(hosts, translations, patterns, automaton, demoted, unused):
+    pages = sum(entry['pages'] for entry in hosts.values())
+    print(f"  Hosts: {len(hosts)} ({pages} pages)")
+    regex_keys = [key for key, value in translations.items() if not is_literal_key(key, value)]
+    evaluated = [key for key in regex_keys if key in patterns]
+    regex_time = sum(cost['time'] for cost in patterns.values())
+    print(f"  Regex keys: {len(evaluated)} of {len(regex_keys)} evaluated, {regex_time:.2f} ms in total")
+    print(f"  Automaton: {automaton['attempts']} replacements, {automaton['time']:.2f} ms in total")
+    unknown = [key for key in patterns if key not in translations]
+    if unknown:
+        print(f"  Keys not in the dictionary: {len(unknown)}")
+
+    print("\nMost expensive regex keys:")
+    for key, cost in sorted(patterns.items(), key=lambda item: -item[1]['time'])[:TOP_COUNT]:
+        print(format_cost(key, cost))
+
+    print(f"\nRegex keys that never replaced anything: {len(unused)}")
+    print(f"Demoted (expensive and never replaced anything): {len(demoted)}")
+    for key in demoted[:TOP_COUNT]:
+        print(format_cost(key, patterns[key]))
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    translations_file = os.path.join(os.path.dirname(script_dir), 'sources', 'translations.json')
+
+    if len(sys.argv) < 2 or '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage: python profile_patterns.py <profile.json> [profile.json ...] [options]")
+        print("\nOptions:")
+        print(f"  --translations <file>: Dictionary (default: {translations_file})")
+        print("  --min-attempts <N>   : Only judge keys evaluated at least N times (default: 50)")
+        print("  --min-time <ms>      : Demote keys that took at least this long in total (default: 1.0)")
+        print("  --save <file>        : Save the merged profile (can be merged again later)")
+        print(f"  --output <file>      : Save the demoted keys (compile_dictionary.py reads {DEMOTED_PATTERNS_FILE})")
+        print("\nProfiles are exported from the popup after enabling hit recording.")
+        return
+
+    profile_files = []
+    min_attempts = 50
+    min_time = 1.0
+    save_file = None
+    output_file = None
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '--translations' and i + 1 < len(sys.argv):
+            translations_file = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--min-attempts' and i + 1 < len(sys.argv):
+            if not sys.argv[i + 1].isdigit():
+                print(f"Error: --min-attempts requires a non-negative integer (got {sys.argv[i + 1]})")
+                sys.exit(1)
+            min_attempts = int(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--min-time' and i + 1 < len(sys.argv):
+            try:
+                min_time = float(sys.argv[i + 1])
+            except ValueError:
+                print(f"Error: --min-time requires a number (got {sys.argv[i + 1]})")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == '--save' and i + 1 < len(sys.argv):
+            save_file = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--output' and i + 1 < len(sys.argv):
+            output_file = sys.argv[i + 1]
+            i += 2
+        else:
+            profile_files.append(sys.argv[i])
+            i += 1
+
+    for filename in [translations_file] + profile_files:
+        if not os.path.exists(filename):
+            print(f"Error: {filename} not found")
+            sys.exit(1)
+
+    try:
+        hosts = load_profiles(profile_files)
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    translations = load_translations(translations_file)
+    patterns, automaton = merge_hosts(hosts)
+    demoted, unused = select_demoted(translations, patterns, min_attempts, min_time)
+
+    print(f"Merged {len(profile_files)} profiles")
+    print_report(hosts, translations, patterns, automaton, demoted, unused)
+
+    if save_file:
+        with open(save_file, 'w', encoding='utf-8') as file:
+            json.dump({'version': PROFILE_FORMAT_VERSION, 'hosts': hosts}, file, ensure_ascii=False, indent=2)
+        print(f"\nWrote {save_file}")
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as file:
+            json.dump({'version': DEMOTED_FORMAT_VERSION, 'patterns': sorted(demoted)}, file,
+                      ensure_ascii=False, indent=2)
+        print(f"\nWrote {output_file} ({len(demoted)} keys)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+"""
+content.js の翻訳処理のPython版（dictionary_engine.py）で、保存したビルドサイトのHTMLの処理速度を計測するパッケージ
+
+使い方（tools ディレクトリで実行）:
+    python -m translation_bench temp/fixtures/*.html
+"""
+
+from .engine import LegacyEngine, CompiledEngine, load_engine
+from .pages import extract_page
+
+__all__ = ['LegacyEngine', 'CompiledEngine', 'load_engine', 'extract_page']
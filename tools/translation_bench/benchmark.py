@@ -0,0 +1,304 @@
+"""
+保存したビルドサイトのHTMLを翻訳エンジンに通して処理速度を計測する
+
+使い方（tools ディレクトリで実行）:
+    python -m translation_bench [options] [fixture.html ...]
+
+HTMLを指定しない場合は ../temp/fixtures/ 以下の *.html を使う
+"""
+
+import glob
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+
+from dictionary_engine import new_stats
+
+from .engine import ENGINES, load_engine
+from .pages import extract_page
+
+# 結果ファイルの形式バージョン
+REPORT_FORMAT_VERSION = 1
+
+def file_digest(filename):
+    """ファイル内容のSHA-256（結果ファイルに辞書の版を記録するため）"""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def run_page(engine, page, pattern_times=None):
+    """1ページ分のテキストノードと title 属性を変換し、集計と変換結果のハッシュを返す"""
+    stats = new_stats()
+    title_stats = {'elements': len(page.titles), 'replaced': 0}
+    output = hashlib.sha256()
+
+    for text in page.texts:
+        stats['nodes'] += 1
+        stats['chars'] += len(text)
+        output.update(engine.translate(text, stats, pattern_times).encode('utf-8', 'surrogatepass'))
+        output.update(b'\0')
+
+    for title in page.titles:
+        new_title = engine.translate(title, None, pattern_times)
+        if new_title != title:
+            title_stats['replaced'] += 1
+        output.update(new_title.encode('utf-8', 'surrogatepass'))
+        output.update(b'\0')
+
+    return stats, title_stats, output.hexdigest()
+
+def measure_page(engine, page, repeat):
+    """repeat 回実行して最短時間を採用する"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stats, title_stats, digest = run_page(engine, page)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return summarize(stats, title_stats, best, engine.pattern_count, digest)
+
+def summarize(stats, title_stats, seconds, pattern_count, digest=None):
+    """集計値から表示・保存用の指標を計算"""
+    nodes = stats['nodes']
+    result = {
+        'nodes': nodes,
+        'chars': stats['chars'],
+        'attempts': stats['attempts'],
+        'replacements': stats['replacements'],
+        # 単語フィルタで照合せずに済ませたテキストノード
+        'rejected': stats['rejected'],
+        'titles': title_stats['elements'],
+        'titlesReplaced': title_stats['replaced'],
+        'seconds': seconds,
+        'nodesPerSec': nodes / seconds if seconds else 0.0,
+        'charsPerSec': stats['chars'] / seconds if seconds else 0.0,
+        'attemptsPerNode': stats['attempts'] / nodes if nodes else 0.0,
+        # 1パターンの評価にかかった平均時間（マイクロ秒）
+        'usPerAttempt': seconds * 1e6 / stats['attempts'] if stats['attempts'] else 0.0,
+        # 辞書の1パターンあたりのページ処理時間（マイクロ秒）
+        'usPerPattern': seconds * 1e6 / pattern_count if pattern_count else 0.0,
+    }
+    if digest is not None:
+        result['digest'] = digest
+    return result
+
+def combine(results, pattern_count):
+    """複数ページの結果を合算"""
+    stats = new_stats()
+    title_stats = {'elements': 0, 'replaced': 0}
+    seconds = 0.0
+    for result in results:
+        for key in stats:
+            stats[key] += result[key]
+        title_stats['elements'] += result['titles']
+        title_stats['replaced'] += result['titlesReplaced']
+        seconds += result['seconds']
+    return summarize(stats, title_stats, seconds, pattern_count)
+
+def profile_patterns(engine, pages):
+    """パターンごとの累積処理時間を計測（計測のオーバーヘッドがあるため速度の計測とは別に実行）"""
+    pattern_times = {}
+    for page in pages:
+        run_page(engine, page, pattern_times)
+    return sorted(pattern_times.items(), key=lambda item: -item[1])
+
+def format_row(label, result):
+    return (f"  {label:<40} {result['nodes']:>7} nodes {result['chars']:>9} chars "
+            f"{result['rejected']:>7} rejected {result['attemptsPerNode']:>8.1f} att/node {result['seconds'] * 1000:>9.1f} ms "
+            f"{result['nodesPerSec']:>10.0f} nodes/s {result['charsPerSec']:>11.0f} chars/s "
+            f"{result['usPerAttempt']:>7.2f} us/att {result['usPerPattern']:>8.2f} us/pattern")
+
+def print_report(engine_name, report, top_patterns):
+    print(f"\n[{engine_name}] {report['patterns']} patterns")
+    for filename, result in report['fixtures'].items():
+        print(format_row(f"{result['site']}/{filename}", result))
+    for site, result in report['sites'].items():
+        print(format_row(f"{site} (total)", result))
+    print(format_row('all', report['total']))
+
+    if top_patterns:
+        print("  Slowest patterns:")
+        for key, seconds in top_patterns:
+            print(f"    {seconds * 1000:>9.2f} ms  {key}")
+
+def compare_reports(report, baseline):
+    """前回保存した結果と比較して速度の変化と変換結果の差異を表示"""
+    print(f"\nComparison with baseline ({baseline.get('created', 'unknown')}):")
+    if baseline.get('dictionary') != report['dictionary']:
+        print("  Note: translations.json differs from the baseline")
+    changed = 0
+    for engine_name, engine_report in report['engines'].items():
+        base_engine = baseline.get('engines', {}).get(engine_name)
+        if not base_engine:
+            print(f"  [{engine_name}] not in baseline")
+            continue
+        for filename, result in engine_report['fixtures'].items():
+            base = base_engine['fixtures'].get(filename)
+            if not base:
+                continue
+            speedup = result['nodesPerSec'] / base['nodesPerSec'] if base['nodesPerSec'] else 0.0
+            marker = ''
+            if base.get('digest') != result.get('digest'):
+                marker = '  OUTPUT CHANGED'
+                changed += 1
+            print(f"  [{engine_name}] {filename}: {base['seconds'] * 1000:.1f} ms -> "
+                  f"{result['seconds'] * 1000:.1f} ms (x{speedup:.2f}){marker}")
+        base_total = base_engine['total']
+        total = engine_report['total']
+        speedup = total['nodesPerSec'] / base_total['nodesPerSec'] if base_total['nodesPerSec'] else 0.0
+        print(f"  [{engine_name}] all: {base_total['seconds'] * 1000:.1f} ms -> "
+              f"{total['seconds'] * 1000:.1f} ms (x{speedup:.2f})")
+    return changed
+
+def run_benchmark(engine_names, translations_file, compiled_dir, fixtures, repeat, top):
+    """すべてのエンジンで全フィクスチャを計測し、結果の辞書を返す"""
+    pages = []
+    for filename in fixtures:
+        page = extract_page(filename)
+        pages.append((os.path.basename(filename), page))
+        print(f"Loaded {filename}: {page.site}, {len(page.texts)} text nodes, {len(page.titles)} titles")
+
+    report = {
+        'version': REPORT_FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'dictionary': file_digest(translations_file),
+        'repeat': repeat,
+        'engines': {},
+    }
+
+    for engine_name in engine_names:
+        start = time.perf_counter()
+        engine = load_engine(engine_name, translations_file, compiled_dir)
+        print(f"\nBuilt {engine_name} engine in {time.perf_counter() - start:.2f}s")
+
+        engine_report = {'patterns': engine.pattern_count, 'fixtures': {}, 'sites': {}}
+        by_site = {}
+        for filename, page in pages:
+            result = measure_page(engine, page, repeat)
+            result['site'] = page.site
+            engine_report['fixtures'][filename] = result
+            by_site.setdefault(page.site, []).append(result)
+        for site, results in sorted(by_site.items()):
+            engine_report['sites'][site] = combine(results, engine.pattern_count)
+        engine_report['total'] = combine(engine_report['fixtures'].values(), engine.pattern_count)
+
+        top_patterns = profile_patterns(engine, [page for _, page in pages])[:top] if top else []
+        engine_report['slowestPatterns'] = [[key, seconds] for key, seconds in top_patterns]
+        report['engines'][engine_name] = engine_report
+        print_report(engine_name, engine_report, top_patterns)
+
+    # 同じ辞書であればエンジンが違っても変換結果は一致する
+    if len(engine_names) > 1:
+        for filename, _ in pages:
+            digests = {report['engines'][name]['fixtures'][filename]['digest'] for name in engine_names}
+            if len(digests) > 1:
+                print(f"Warning: engines produced different output for {filename}")
+
+    return report
+
+def print_usage(default_fixtures, translations_file, compiled_dir):
+    print("Usage: python -m translation_bench [options] [fixture.html ...]")
+    print("\nOptions:")
+    print(f"  --engine NAME        Engine to run: {', '.join(ENGINES)} or all (default: all)")
+    print(f"  --translations FILE  Dictionary (default: {translations_file})")
+    print(f"  --compiled DIR       Compiled dictionary directory (default: {compiled_dir})")
+    print("  --repeat N           Runs per fixture; the fastest is reported (default: 3)")
+    print("  --top N              Number of slowest patterns to show (default: 10, 0 to skip)")
+    print("  --save FILE          Save results as JSON")
+    print("  --baseline FILE      Compare with results saved by --save")
+    print(f"\nFixtures default to {default_fixtures}")
+    print("Save build pages (mobalytics, d4builds, maxroll) from the browser with the site name in the file name.")
+
+def main():
+    tools_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    repo_dir = os.path.dirname(tools_dir)
+    default_fixtures = os.path.join(repo_dir, 'temp', 'fixtures', '*.html')
+    translations_file = os.path.join(repo_dir, 'sources', 'translations.json')
+    compiled_dir = os.path.join(repo_dir, 'sources', 'compiled')
+
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print_usage(default_fixtures, translations_file, compiled_dir)
+        return
+
+    engine_option = 'all'
+    repeat = 3
+    top = 10
+    save_file = None
+    baseline_file = None
+    fixtures = []
+
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        if args[i] == '--engine' and i + 1 < len(args):
+            engine_option = args[i + 1]
+            i += 2
+        elif args[i] == '--translations' and i + 1 < len(args):
+            translations_file = args[i + 1]
+            i += 2
+        elif args[i] == '--compiled' and i + 1 < len(args):
+            compiled_dir = args[i + 1]
+            i += 2
+        elif args[i] == '--repeat' and i + 1 < len(args):
+            repeat = max(1, int(args[i + 1]))
+            i += 2
+        elif args[i] == '--top' and i + 1 < len(args):
+            top = max(0, int(args[i + 1]))
+            i += 2
+        elif args[i] == '--save' and i + 1 < len(args):
+            save_file = args[i + 1]
+            i += 2
+        elif args[i] == '--baseline' and i + 1 < len(args):
+            baseline_file = args[i + 1]
+            i += 2
+        else:
+            fixtures.append(args[i])
+            i += 1
+
+    if engine_option == 'all':
+        engine_names = list(ENGINES)
+        if not all(os.path.exists(os.path.join(compiled_dir, filename)) for filename in ('literals.json', 'patterns.json')):
+            print(f"Note: {compiled_dir} has no compiled dictionary; skipping compiled engine")
+            engine_names.remove('compiled')
+    elif engine_option in ENGINES:
+        engine_names = [engine_option]
+    else:
+        print(f"Error: unknown engine {engine_option}")
+        sys.exit(1)
+
+    if not fixtures:
+        fixtures = sorted(glob.glob(default_fixtures))
+    if not fixtures:
+        print(f"Error: no fixtures found ({default_fixtures})")
+        sys.exit(1)
+    if not os.path.exists(translations_file):
+        print(f"Error: {translations_file} not found")
+        sys.exit(1)
+
+    try:
+        report = run_benchmark(engine_names, translations_file, compiled_dir, fixtures, repeat, top)
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+
+    if baseline_file:
+        with open(baseline_file, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if compare_reports(report, baseline):
+            print("Warning: translated output differs from the baseline")
+
+    if save_file:
+        with open(save_file, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"\nSaved results to {save_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+計測に使うエンジンの一覧と読み込み
+
+エンジン自体（content.js の翻訳処理のPython版）は tools/dictionary_engine.py にある
+"""
+
+import json
+import os
+
+from dictionary_engine import CompiledEngine, LegacyEngine, text_digest
+
+ENGINES = {
+    LegacyEngine.name: LegacyEngine,
+    CompiledEngine.name: CompiledEngine,
+}
+
+def load_json(filename):
+    with open(filename, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def load_translations(filename):
+    """translations.json とその内容の要約（実行時辞書が同じ内容から生成されたかの確認に使う）"""
+    with open(filename, 'r', encoding='utf-8-sig', newline='') as file:
+        text = file.read()
+    return json.loads(text), text_digest(text)
+
+def load_engine(name, translations_file, compiled_dir=None):
+    """名前を指定してエンジンを作成（compiled は compiled_dir の literals.json と patterns.json を使う）"""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine: {name} (choose from {', '.join(ENGINES)})")
+    translations, digest = load_translations(translations_file)
+    if name == CompiledEngine.name:
+        compiled_files = [os.path.join(compiled_dir, filename) for filename in ('literals.json', 'patterns.json')]
+        for compiled_file in compiled_files:
+            if not os.path.exists(compiled_file):
+                raise ValueError(f"{compiled_file} not found; run compile_dictionary.py")
+        return CompiledEngine(*[load_json(compiled_file) for compiled_file in compiled_files], digest)
+    return LegacyEngine(translations)
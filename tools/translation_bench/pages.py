@@ -0,0 +1,89 @@
+"""
+保存したビルドサイトのHTMLから、content.js が変換するテキストを取り出す
+
+replaceText と同じく body 以下のテキストノードを対象とし、SCRIPT と STYLE の中身は除外する
+（template と noscript の中身もブラウザではテキストノードとして変換されないため除外する）
+replaceTitleAttributes と同じく title 属性を持つすべての要素の属性値も取り出す
+"""
+
+import os
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+
+# 既知のビルドサイト（ファイル名・canonical URLから判定）
+SITES = ('mobalytics', 'd4builds', 'maxroll')
+
+# 中身を変換しない要素
+SKIPPED_TAGS = {'script', 'style', 'template', 'noscript'}
+
+PageText = namedtuple('PageText', ['site', 'texts', 'titles'])
+
+SITE_URL_RE = re.compile(r'https?://(?:[\w-]+\.)*(' + '|'.join(SITES) + r')\.gg\b', re.IGNORECASE)
+
+class PageTextParser(HTMLParser):
+    """テキストノードと title 属性を文書順に集める"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.texts = []
+        self.titles = []
+        self.urls = []
+        self.in_head = False
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        if 'title' in attributes:
+            self.titles.append(attributes['title'] or '')
+        if tag == 'head':
+            self.in_head = True
+        elif tag == 'body':
+            self.in_head = False
+        elif tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag == 'link' and (attributes.get('rel') or '').lower() == 'canonical':
+            self.urls.append(attributes.get('href') or '')
+        elif tag == 'meta' and attributes.get('property') == 'og:url':
+            self.urls.append(attributes.get('content') or '')
+
+    def handle_startendtag(self, tag, attrs):
+        # <script /> などの自己終了タグは中身を持たない
+        if tag in SKIPPED_TAGS:
+            attributes = dict(attrs)
+            if 'title' in attributes:
+                self.titles.append(attributes['title'] or '')
+            return
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.in_head = False
+        elif tag in SKIPPED_TAGS and self.skip_depth > 0:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.in_head or self.skip_depth > 0:
+            return
+        self.texts.append(data)
+
+def detect_site(filename, urls):
+    """ファイル名または canonical URL からビルドサイトを判定（不明な場合は 'other'）"""
+    basename = os.path.basename(filename).lower()
+    for site in SITES:
+        if site in basename:
+            return site
+    for url in urls:
+        match = SITE_URL_RE.match(url)
+        if match:
+            return match.group(1).lower()
+    return 'other'
+
+def extract_page(filename):
+    """HTMLファイルを読み込んで PageText を返す"""
+    with open(filename, 'r', encoding='utf-8', errors='replace') as file:
+        html = file.read()
+    parser = PageTextParser()
+    parser.feed(html)
+    parser.close()
+    return PageText(detect_site(filename, parser.urls), parser.texts, parser.titles)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+translations.json の正規表現キーを検証するスクリプト（convert_stringlist_to_translations.py の検証段階）
+
+content.js はすべてのキーを 'gi' フラグでページ上の任意のテキストに適用するため、
+バックトラッキングが爆発するキーが1つあるだけでタブが固まる
+- JSONの重複したキー（json.load では後の値で黙って上書きされる）を object_pairs_hook で検出する
+- キーが content.js と同じ形（\\b...\\b、'gi'）でJavaScript互換の正規表現としてコンパイルできるかを確かめる
+- 正規表現の構造から、バックトラッキングが爆発しうるキーを検出する（処理時間は計測しないため、
+  結果は実行するマシンの負荷やワーカー数によらず常に同じになる）
+  - 上限のない量指定子を含むグループの繰り返し（(?:\\w+\\s?){1,2} など）
+  - 同じ文字に一致しうる上限のない量指定子が、空文字列に一致しうる要素だけを挟んで並ぶもの（(.*?)\\w+ など）
+  検出したキーは、文字列スロットの (.*?) の長さを制限して安全になるものは書き換え、それ以外は除外する
+  （--keep-unsafe を指定すると警告するだけで辞書に残す）
+"""
+
+import json
+import os
+import re
+import sys
+
+from compile_dictionary import is_literal_key
+from dictionary_engine import compile_key, flatten_sequence, sorted_entries
+
+try:
+    from re import _parser as sre_parse  # Python 3.11 以降
+except ImportError:
+    import sre_parse
+
+# レポートに表示するキーの数（種類ごと）
+EXAMPLE_COUNT = 10
+
+# create_regex_pattern が {sN} から作る文字列スロットと、問題のあるキーの書き換え先
+STRING_SLOT = '(.*?)'
+BOUNDED_STRING_SLOT = '(.{0,60}?)'
+
+# 量指定子の文字集合が重なるかを調べる文字（ASCIIの表示可能な文字と、ページによく現れる空白と非ASCII文字）
+SAMPLE_CHARS = ''.join(chr(code) for code in range(32, 127)) + '\t\u00a0\u3000\u00e9\u65e5'
+
+# 文字クラスの中の \d などのカテゴリ
+CATEGORY_RES = {
+    sre_parse.CATEGORY_DIGIT: re.compile(r'\d'),
+    sre_parse.CATEGORY_NOT_DIGIT: re.compile(r'\D'),
+    sre_parse.CATEGORY_SPACE: re.compile(r'\s'),
+    sre_parse.CATEGORY_NOT_SPACE: re.compile(r'\S'),
+    sre_parse.CATEGORY_WORD: re.compile(r'\w'),
+    sre_parse.CATEGORY_NOT_WORD: re.compile(r'\W'),
+}
+
+REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+
+def load_json_checked(filename):
+    """JSONファイルを読み込み、(内容, 重複したキーのリスト) を返す（重複したキーは後の値が残る）"""
+    duplicates = []
+
+    def collect_pairs(pairs):
+        result = {}
+        for key, value in pairs:
+            if key in result:
+                duplicates.append(key)
+            result[key] = value
+        return result
+
+    with open(filename, 'r', encoding='utf-8') as file:
+        data = json.load(file, object_pairs_hook=collect_pairs)
+    return data, duplicates
+
+def class_matches(items, char):
+    """文字クラス（IN の中身）が文字に一致するか（大文字と小文字は区別しない）"""
+    negate = False
+    matched = False
+    for op, value in items:
+        if op is sre_parse.NEGATE:
+            negate = True
+        elif op is sre_parse.LITERAL:
+            matched = matched or chr(value).casefold() == char.casefold()
+        elif op is sre_parse.RANGE:
+            matched = matched or any(value[0] <= ord(c) <= value[1] for c in (char, char.lower(), char.upper()))
+        elif op is sre_parse.CATEGORY:
+            matched = matched or CATEGORY_RES[value].match(char) is not None
+    return matched != negate
+
+def item_chars(op, value):
+    """要素が消費しうる文字（SAMPLE_CHARS のうち一致するもの）の集合"""
+    if op is sre_parse.LITERAL:
+        return frozenset(c for c in SAMPLE_CHARS if c.casefold() == chr(value).casefold())
+    if op is sre_parse.NOT_LITERAL:
+        return frozenset(c for c in SAMPLE_CHARS if c.casefold() != chr(value).casefold())
+    if op is sre_parse.ANY:
+        return frozenset(c for c in SAMPLE_CHARS if c not in '\n\r')
+    if op is sre_parse.IN:
+        return frozenset(c for c in SAMPLE_CHARS if class_matches(value, c))
+    if op in REPEATS:
+        return sequence_chars(value[2])
+    if op is sre_parse.SUBPATTERN:
+        return sequence_chars(value[-1])
+    if op is sre_parse.BRANCH:
+        return frozenset().union(*(sequence_chars(branch) for branch in value[1]))
+    # 位置の指定や先読み・後読みは文字を消費しない
+    return frozenset()
+
+def sequence_chars(items):
+    return frozenset().union(*(item_chars(op, value) for op, value in items))
+
+def is_unbounded(op, value):
+    return op in REPEATS and value[1] is sre_parse.MAXREPEAT
+
+def can_be_empty(op, value):
+    """要素が空文字列に一致しうるか"""
+    return sre_parse.SubPattern(sre_parse.State(), [(op, value)]).getwidth()[0] == 0
+
+def contains_unbounded(items):
+    for op, value in items:
+        if is_unbounded(op, value):
+            return True
+        if op in REPEATS and contains_unbounded(value[2]):
+            return True
+        if op is sre_parse.SUBPATTERN and contains_unbounded(value[-1]):
+            return True
+        if op is sre_parse.BRANCH and any(contains_unbounded(branch) for branch in value[1]):
+            return True
+    return False
+
+def check_sequence(items, hazards):
+    """要素の列とその中のグループを調べ、見つかった問題を hazards に加える"""
+    items = list(flatten_sequence(items))
+    for index, (op, value) in enumerate(items):
+        if op in REPEATS:
+            if value[1] > 1 and contains_unbounded(value[2]):
+                hazards.add('nested quantifier')
+            check_sequence(value[2], hazards)
+            if not is_unbounded(op, value):
+                continue
+            chars = item_chars(op, value)
+            for later_op, later_value in items[index + 1:]:
+                if is_unbounded(later_op, later_value) and chars & item_chars(later_op, later_value):
+                    hazards.add('adjacent quantifiers')
+                    break
+                if not can_be_empty(later_op, later_value):
+                    break
+        elif op is sre_parse.BRANCH:
+            for branch in value[1]:
+                check_sequence(branch, hazards)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            check_sequence(value[1], hazards)
+
+def find_hazards(regex):
+    """バックトラッキングが爆発しうる構造の一覧（ソート済み、なければ空のリスト）
+
+    'nested quantifier': 上限のない量指定子を含むグループを2回以上繰り返す
+    'adjacent quantifiers': 同じ文字に一致しうる上限のない量指定子が、空文字列に一致しうる要素だけを挟んで並ぶ
+    """
+    hazards = set()
+    check_sequence(sre_parse.parse(regex.pattern, regex.flags), hazards)
+    return sorted(hazards)
+
+def rewrite_pattern(key):
+    """問題のあるキーの書き換え（文字列スロットの長さを制限する）。書き換えられない場合はNone"""
+    if STRING_SLOT not in key:
+        return None
+    return key.replace(STRING_SLOT, BOUNDED_STRING_SLOT)
+
+def check_key(key, replacement):
+    """キーの問題の一覧を返す。正規表現としてコンパイルできない場合はエラーの文字列を返す"""
+    try:
+        pattern = compile_key(key, replacement)
+    except ValueError as error:
+        return str(error)
+    return find_hazards(pattern['regex'])
+
+def validate_translations(translations, reject_unsafe=True):
+    """正規表現キーを検証し、(検証後の辞書, レポート) を返す
+
+    コンパイルできないキーは除く。問題のあるキーは書き換え・除外してレポートに載せる
+    （reject_unsafe が False のときは辞書に残す）
+    検証後の辞書のキーの順序は元のまま（書き換えたキーは元のキーの位置に入る）
+    レポート: {'checked', 'reject_unsafe', 'invalid': [(キー, エラー)],
+              'unsafe': [(キー, 問題の一覧, 書き換え後のキーまたはNone)],
+              'rewritten': [(元のキー, 新しいキー)], 'rejected': [キー]}
+    """
+    items = [(key, value) for key, value in sorted_entries(translations) if not is_literal_key(key, value)]
+
+    invalid = []
+    unsafe = []
+    for key, value in items:
+        result = check_key(key, value)
+        if isinstance(result, str):
+            invalid.append((key, result))
+        elif result:
+            new_key = rewrite_pattern(key)
+            if new_key is not None and (new_key in translations or check_key(new_key, value) != []):
+                new_key = None
+            unsafe.append((key, result, new_key))
+
+    rewritten = []
+    rejected = []
+    if reject_unsafe:
+        for key, _, new_key in unsafe:
+            if new_key is not None:
+                rewritten.append((key, new_key))
+            else:
+                rejected.append(key)
+
+    renamed = dict(rewritten)
+    removed = {key for key, _ in invalid} | set(rejected)
+    validated = {}
+    for key, value in translations.items():
+        if key in removed:
+            continue
+        validated[renamed.get(key, key)] = value
+
+    report = {
+        'checked': len(items),
+        'reject_unsafe': reject_unsafe,
+        'invalid': invalid,
+        'unsafe': unsafe,
+        'rewritten': rewritten,
+        'rejected': rejected,
+    }
+    return validated, report
+
+def print_validation_report(report):
+    print(f"Checked {report['checked']} regex keys for nested and adjacent unbounded quantifiers")
+    for key, error in report['invalid'][:EXAMPLE_COUNT]:
+        print(f"  Invalid: {error}")
+    for key, hazards, new_key in report['unsafe'][:EXAMPLE_COUNT]:
+        suggestion = f" -> {new_key[:80]!r}" if new_key else ""
+        print(f"  Unsafe ({', '.join(hazards)}): {key[:80]!r}{suggestion}")
+    print(f"  {len(report['invalid'])} invalid (removed), {len(report['unsafe'])} unsafe")
+    if report['reject_unsafe']:
+        print(f"  {len(report['rewritten'])} unsafe keys rewritten, {len(report['rejected'])} removed")
+    elif report['unsafe']:
+        print("  Unsafe keys are kept (--keep-unsafe); remove the option to rewrite or remove them")
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    translations_file = os.path.join(os.path.dirname(script_dir), 'sources', 'translations.json')
+
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage: python validate_patterns.py [translations.json] [options]")
+        print("\nOptions:")
+        print("  --keep-unsafe    : Keep keys with nested or adjacent unbounded quantifiers (default: rewrite or remove them)")
+        print("  --output <file>  : Save the validated dictionary (without invalid keys)")
+        print(f"\nDefault dictionary: {translations_file}")
+        return
+
+    reject_unsafe = True
+    output_file = None
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '--keep-unsafe':
+            reject_unsafe = False
+            i += 1
+        elif sys.argv[i] == '--output' and i + 1 < len(sys.argv):
+            output_file = sys.argv[i + 1]
+            i += 2
+        else:
+            translations_file = sys.argv[i]
+            i += 1
+
+    if not os.path.exists(translations_file):
+        print(f"Error: {translations_file} not found")
+        sys.exit(1)
+
+    translations, duplicates = load_json_checked(translations_file)
+    print(f"Validating {translations_file} ({len(translations)} entries)...")
+    for key in duplicates:
+        print(f"  Duplicate key (the last value is used): {key[:80]!r}")
+    validated, report = validate_translations(translations, reject_unsafe)
+    print_validation_report(report)
+
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as file:
+            json.dump(validated, file, ensure_ascii=False, indent=4)
+        print(f"Wrote {output_file} ({len(validated)} entries)")
+    if duplicates or report['invalid'] or report['unsafe']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()